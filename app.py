@@ -1,18 +1,56 @@
 import os
 import logging
+import threading
 import traceback
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import (
+    Flask, Request, Response, current_app, render_template, request, jsonify, redirect, url_for, flash, send_file
+)
+from sqlalchemy import and_, case, func, or_
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 from config import Config
-from models import db, Order, OrderItem, FilterWord
-from excel_parser import parse_excel_file, validate_excel_file
-from voice_handler import generate_item_speech, generate_order_speech, prepare_items_for_assembly
+from models import db, Order, OrderItem, ArchivedOrder, FilterWord, Product, ORDER_STATUSES, ITEM_STATUSES, count_items, upgrade_schema
+from order_ingest import (
+    spool_upload, hash_upload, ingest_upload, ingest_bulk, discard_stale_loads,
+    LOADING_STATUS, RESULT_INVALID, RESULT_DUPLICATE
+)
+from voice_handler import (
+    prepare_items_for_assembly, collect_order_speech_texts,
+    build_item_speech_text, build_order_speech_text, find_cached_speech, stream_tts, get_audio_mimetype,
+    speech_cache_keys
+)
+from db_writer import configure_sqlite, run_write, get_db_stats
+from filter_matcher import bump_filter_version, get_filter_matcher, get_filter_stats
+from item_filters import ensure_order_filters, has_stale_products, refresh_products
+from item_search import create_search_index, search_items as find_items
+from product_catalog import link_products, has_unlinked_items, get_catalog_stats
+from item_status import apply_status_changes
+from order_archive import (
+    ARCHIVE_STATUS, archive_orders, archive_query, restore_order, get_archive_stats, register_search_functions
+)
+from tts_prefetch import schedule_order_prefetch, ensure_speech_ready
+from http_session import get_http_stats
+from tts_router import router as tts_router
+from audio_store import collect_garbage, get_store_stats
+import tts_cache
+import tts_jobs
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class UploadRequest(Request):
+    """Запрос с отдельным пределом размера тела для пакетной загрузки"""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'upload_bulk':
+            return current_app.config['BULK_UPLOAD_MAX_BYTES']
+        return super().max_content_length
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config.from_object(Config)
 
 # Поддержка префикса URL (для развертывания на icesmoke.store/voice/)
@@ -24,20 +62,59 @@ db.init_app(app)
 # Создание директорий
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('static/audio', exist_ok=True)
+os.makedirs(app.config['TTS_CACHE_DIR'], exist_ok=True)
+
+
+def run_product_link():
+    """Привязка к каталогу товаров, загруженных до его появления (вызывается в фоновом потоке)"""
+    with app.app_context():
+        try:
+            return link_products()
+        except Exception as e:
+            logger.error(f"Ошибка привязки товаров к каталогу: {e}")
+            logger.error(traceback.format_exc())
+            return None
+
+
+def run_filter_refresh():
+    """Переразметка товаров каталога после изменения фильтров (вызывается в фоновом потоке)"""
+    with app.app_context():
+        try:
+            return refresh_products()
+        except Exception as e:
+            logger.error(f"Ошибка переразметки товаров фильтром слов: {e}")
+            logger.error(traceback.format_exc())
+            return None
+
 
 # Создание таблиц БД при первом запуске
 def init_database():
     """Инициализация базы данных"""
     with app.app_context():
         try:
+            # До первого подключения: функции регистрируются при подключении
+            register_search_functions(db.engine)
+            if configure_sqlite(db.engine):
+                logger.info("✓ SQLite: WAL журнал, ожидание блокировок, сериализованная запись")
             db.create_all()
+            for change in upgrade_schema():
+                logger.info(f"✓ {change}")
+            if create_search_index(db.engine):
+                logger.info("✓ Полнотекстовый поиск товаров (FTS5)")
+            discarded = discard_stale_loads()
+            if discarded:
+                logger.info(f"✓ Удалено незавершенных загрузок заказов: {discarded}")
+            if has_unlinked_items():
+                threading.Thread(target=run_product_link, name='product-link', daemon=True).start()
+            if has_stale_products():
+                threading.Thread(target=run_filter_refresh, name='filter-refresh', daemon=True).start()
             logger.info("✓ База данных инициализирована")
         except Exception as e:
             logger.error(f"✗ Ошибка при инициализации БД: {e}")
             logger.error(traceback.format_exc())
 
-# Инициализируем БД при импорте модуля
-init_database()
+# БД инициализирует точка входа (wsgi.py, запуск app.py), а не импорт модуля: процессы
+# пула разбора книг (spawn) заново импортируют главный модуль
 
 
 def allowed_file(filename):
@@ -46,11 +123,105 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 
+def order_speech_texts(order):
+    """
+    Все фразы, которые прозвучат при сборке заказа (с учетом фильтров)
+    
+    Озвучиваемые товары читаются по колонкам (наименование, количество) без повторов
+    и без загрузки объектов OrderItem: после потокового приема большого заказа
+    его товары не поднимаются в сессию. Решение фильтра - из товара каталога, а для
+    наименований, записанных в файле иначе, - проверкой наименования (OrderItem.filter_match).
+    """
+    ensure_order_filters(order)
+    matcher = get_filter_matcher()
+    name = func.coalesce(OrderItem.name_override, Product.name)
+    # Наименование каталога, которое фильтр уже пропустил
+    announced = and_(OrderItem.name_override.is_(None), Product.should_announce.is_(True))
+    items = (
+        db.session.query(name, OrderItem.quantity, func.max(case((announced, 1), else_=0)))
+        .outerjoin(Product, OrderItem.product_id == Product.id)
+        .filter(OrderItem.order_id == order.id)
+        .filter(or_(OrderItem.name_override.is_not(None), Product.id.is_(None), Product.should_announce.is_(True)))
+        .group_by(name, OrderItem.quantity)
+        # Порядок озвучивания - по первой строке товара в заказе
+        .order_by(func.min(OrderItem.row_number))
+    )
+    texts = [build_order_speech_text(order.order_number)]
+    texts.extend(
+        build_item_speech_text(name, quantity)
+        for name, quantity, checked in items
+        if checked or matcher.match(name) is None
+    )
+    return list(dict.fromkeys(texts))
+
+
+def live_audio_cache_keys():
+    """Ключи кэша всех фраз заказов, которые есть в БД (для сборки мусора аудио)"""
+    lang, slow = app.config['TTS_LANGUAGE'], app.config['TTS_SLOW']
+    texts = {build_order_speech_text(number) for (number,) in db.session.query(Order.order_number)}
+    name = func.coalesce(OrderItem.name_override, Product.name)
+    texts.update(
+        build_item_speech_text(name, quantity)
+        for name, quantity in
+        db.session.query(name, OrderItem.quantity).outerjoin(Product, OrderItem.product_id == Product.id).distinct()
+    )
+    return {
+        cache_key
+        for text in texts
+        for cache_key, _ in speech_cache_keys(text, lang, slow, all_providers=True)
+    }
+
+
+def run_audio_gc():
+    """Сборка мусора аудио (вызывается в фоновом потоке)"""
+    with app.app_context():
+        try:
+            return collect_garbage(live_audio_cache_keys())
+        except Exception as e:
+            logger.error(f"Ошибка сборки мусора аудио: {e}")
+            logger.error(traceback.format_exc())
+            return None
+
+
+def run_archive():
+    """Перенос заказов со статусом в_архив в архивные таблицы (вызывается в фоновом потоке)"""
+    with app.app_context():
+        try:
+            return archive_orders()
+        except Exception as e:
+            logger.error(f"Ошибка переноса заказов в архив: {e}")
+            logger.error(traceback.format_exc())
+            return None
+
+
 @app.route('/')
 def index():
-    """Главная страница со списком заказов"""
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template('index.html', orders=orders)
+    """
+    Главная страница со списком заказов: по страницам, с фильтром по статусу
+    
+    Число запросов не зависит от числа заказов: подсчет и страница заказов
+    плюс один сгруппированный запрос числа товаров заказов страницы.
+    """
+    status = request.args.get('status')
+    if status not in ORDER_STATUSES:
+        status = None
+    
+    query = db.select(Order).order_by(Order.created_at.desc(), Order.id.desc())
+    # Заказ, товары которого еще пишутся потоковым приемом, в списке не показываем
+    query = query.where(Order.status != LOADING_STATUS)
+    if status:
+        query = query.filter_by(status=status)
+    pagination = db.paginate(query, per_page=app.config['ORDERS_PER_PAGE'], error_out=False)
+    items_counts = count_items(order.id for order in pagination.items)
+    
+    return render_template(
+        'index.html',
+        orders=pagination.items,
+        pagination=pagination,
+        items_counts=items_counts,
+        status=status,
+        statuses=ORDER_STATUSES
+    )
 
 
 @app.route('/upload', methods=['POST'])
@@ -77,60 +248,51 @@ def upload_file():
             return redirect(url_for('index'))
         
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        logger.info(f"Сохранение файла: {filepath}")
-        file.save(filepath)
-        
-        # Валидация файла
-        logger.info("Валидация файла")
-        is_valid, error_message = validate_excel_file(filepath)
-        if not is_valid:
-            logger.error(f"Ошибка валидации: {error_message}")
-            try:
-                os.remove(filepath)
-            except Exception as e:
-                logger.warning(f"Не удалось удалить файл: {e}")
-            flash(f'Ошибка в файле: {error_message}', 'error')
-            return redirect(url_for('index'))
         
-        # Парсинг файла
-        logger.info("Парсинг файла")
-        order = parse_excel_file(filepath, filename)
-        logger.info(f"Заказ распарсен: {order.order_number}, товаров: {len(order.items)}")
+        with spool_upload(file.stream) as buffer:
+            # Повторная загрузка того же файла - отказ без разбора книги
+            content_hash = hash_upload(buffer)
+            duplicate_order = Order.query.filter_by(content_hash=content_hash).first()
+            if duplicate_order:
+                logger.warning(f"Файл {filename} уже загружен как заказ {duplicate_order.order_number}")
+                flash(f'Этот файл уже загружен: заказ № {duplicate_order.order_number}', 'warning')
+                return redirect(url_for('index'))
+            
+            # Валидация и парсинг за одну загрузку книги, без записи на диск
+            # (большие файлы - потоково, товары пишутся в БД пачками); оригинал
+            # сохраняется и заказ записывается в БД, только если файл принят
+            logger.info("Валидация и парсинг файла")
+            status, order, items_count, error_message = ingest_upload(buffer, filename, content_hash)
+            if status == RESULT_INVALID:
+                logger.error(f"Ошибка валидации: {error_message}")
+                flash(f'Ошибка в файле: {error_message}', 'error')
+                return redirect(url_for('index'))
+            
+            # Проверка на дублирование заказа
+            if status == RESULT_DUPLICATE:
+                logger.warning(error_message)
+                flash(error_message, 'warning')
+                return redirect(url_for('index'))
         
-        # Проверка на дублирование заказа
-        existing_order = Order.query.filter_by(order_number=order.order_number).first()
-        if existing_order:
-            logger.warning(f"Заказ {order.order_number} уже существует")
-            try:
-                os.remove(filepath)
-            except Exception as e:
-                logger.warning(f"Не удалось удалить файл: {e}")
-            flash(f'Заказ № {order.order_number} уже существует', 'warning')
-            return redirect(url_for('index'))
+        logger.info(f"Заказ {order.order_number} успешно сохранен, товаров: {items_count}, файл: {order.filename}")
         
-        # Сохранение в БД
-        logger.info("Сохранение в БД")
-        db.session.add(order)
-        db.session.commit()
-        logger.info(f"Заказ {order.order_number} успешно сохранен")
+        # Запускаем фоновый синтез озвучки, чтобы к началу сборки аудио было готово
+        try:
+            schedule_order_prefetch(order.id, order_speech_texts(order))
+        except Exception as e:
+            logger.warning(f"Не удалось запустить фоновый синтез для заказа {order.order_number}: {e}")
         
-        flash(f'Заказ № {order.order_number} успешно загружен ({len(order.items)} товаров)', 'success')
+        flash(f'Заказ № {order.order_number} успешно загружен ({items_count} товаров)', 'success')
         return redirect(url_for('index'))
         
+    except RequestEntityTooLarge:
+        # Ответ формирует request_too_large
+        raise
     except Exception as e:
         logger.error(f"КРИТИЧЕСКАЯ ОШИБКА при загрузке файла: {e}")
         logger.error(traceback.format_exc())
         
-        # Пытаемся удалить файл если он был создан
-        if 'filepath' in locals() and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except Exception as del_error:
-                logger.warning(f"Не удалось удалить файл: {del_error}")
-        
-        # Откатываем транзакцию БД если она была начата
+        # Оригинал и незавершенный заказ удаляет ingest_upload; откатываем транзакцию БД если она была начата
         try:
             db.session.rollback()
         except Exception as rollback_error:
@@ -140,6 +302,39 @@ def upload_file():
         return redirect(url_for('index'))
 
 
+@app.errorhandler(413)
+def request_too_large(error):
+    """Тело запроса больше MAX_CONTENT_LENGTH (для пакетной загрузки - BULK_UPLOAD_MAX_BYTES)"""
+    limit_mb = request.max_content_length // (1024 * 1024)
+    if request.endpoint == 'upload_bulk':
+        return jsonify({'error': f'Пакет слишком большой: допустимо не больше {limit_mb} МБ'}), 413
+    flash(f'Файл слишком большой: допустимо не больше {limit_mb} МБ', 'error')
+    return redirect(url_for('index'))
+
+
+@app.route('/upload/bulk', methods=['POST'])
+def upload_bulk():
+    """Пакетная загрузка: несколько .xlsx и/или ZIP архивы, отчет по каждому файлу"""
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'Файлы не выбраны'}), 400
+    
+    try:
+        report, orders = ingest_bulk(files)
+    except Exception as e:
+        logger.error(f"Ошибка пакетной загрузки: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'Ошибка при обработке файлов: {str(e)}'}), 500
+    
+    for order in orders:
+        try:
+            schedule_order_prefetch(order.id, order_speech_texts(order))
+        except Exception as e:
+            logger.warning(f"Не удалось запустить фоновый синтез для заказа {order.order_number}: {e}")
+    
+    return jsonify(report)
+
+
 @app.route('/order/<int:order_id>')
 def view_order(order_id):
     """Просмотр деталей заказа"""
@@ -152,29 +347,58 @@ def order_assembly(order_id):
     """Страница сборки заказа"""
     order = Order.query.get_or_404(order_id)
     
-    # Получаем фильтры слов
-    filter_words = FilterWord.query.all()
+    # Решение фильтра слов уже сохранено в товарах (переразметка - только если фильтры сменились)
+    ensure_order_filters(order)
+    prepared_items = prepare_items_for_assembly(order.items, get_filter_matcher())
     
-    # Подготавливаем товары с учетом фильтров
-    prepared_items = prepare_items_for_assembly(order.items, filter_words)
+    # Досинтезируем то, чего нет в кэше (например, заказ загружен до перезапуска)
+    try:
+        schedule_order_prefetch(order.id, collect_order_speech_texts(order.order_number, prepared_items))
+    except Exception as e:
+        logger.warning(f"Не удалось запустить фоновый синтез для заказа {order.order_number}: {e}")
     
     return render_template('order_assembly.html', order=order, items=prepared_items)
 
 
 @app.route('/api/order/<int:order_id>/item/<int:item_id>/status', methods=['POST'])
 def update_item_status(order_id, item_id):
-    """API для обновления статуса товара"""
-    data = request.get_json()
+    """API для обновления статуса товара: {"status", "client_seq"} (без client_seq номер назначит сервер, см. item_status)"""
+    data = request.get_json(silent=True) or {}
     status = data.get('status')
     
-    if status not in ['pending', 'completed', 'skipped']:
+    if status not in ITEM_STATUSES:
         return jsonify({'error': 'Недопустимый статус'}), 400
     
-    item = OrderItem.query.filter_by(id=item_id, order_id=order_id).first_or_404()
-    item.status = status
-    db.session.commit()
+    try:
+        result = apply_status_changes(order_id, [
+            {'item_id': item_id, 'status': status, 'client_seq': data.get('client_seq')}
+        ])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result['unknown']:
+        return jsonify({'error': 'Товар не найден'}), 404
     
-    return jsonify({'success': True, 'status': status})
+    return jsonify({'success': True, 'status': result['items'][str(item_id)]['status']})
+
+
+@app.route('/api/order/<int:order_id>/items/status', methods=['POST'])
+def update_items_status(order_id):
+    """
+    API пакетного обновления статусов товаров: {"changes": [{item_id, status, client_seq}, ...]}
+    
+    Все изменения применяются одной транзакцией, уже примененные client_seq
+    пропускаются; в ответе - итоговые статусы всех товаров заказа.
+    """
+    Order.query.get_or_404(order_id)
+    # sendBeacon при закрытии страницы может прислать JSON без заголовка application/json
+    data = request.get_json(silent=True, force=True) or {}
+    
+    try:
+        result = apply_status_changes(order_id, data.get('changes', []))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'success': True, **result})
 
 
 @app.route('/api/order/<int:order_id>/complete', methods=['POST'])
@@ -186,9 +410,15 @@ def complete_order(order_id):
     if status not in ['собран', 'в_архив']:
         return jsonify({'error': 'Недопустимый статус'}), 400
     
-    order = Order.query.get_or_404(order_id)
-    order.status = status
-    db.session.commit()
+    def set_order_status():
+        order = Order.query.get_or_404(order_id)
+        order.status = status
+    
+    run_write(set_order_status)
+    
+    # Убираем заказ из рабочих таблиц
+    if status == ARCHIVE_STATUS:
+        threading.Thread(target=run_archive, name='order-archive', daemon=True).start()
     
     return jsonify({'success': True, 'status': status})
 
@@ -203,12 +433,99 @@ def delete_order(order_id):
     if os.path.exists(filepath):
         os.remove(filepath)
     
-    db.session.delete(order)
-    db.session.commit()
+    run_write(lambda: db.session.delete(Order.query.get_or_404(order_id)))
+    
+    # Удаляем аудио, которое больше не нужно ни одному заказу
+    threading.Thread(target=run_audio_gc, name='audio-gc', daemon=True).start()
     
     return jsonify({'success': True})
 
 
+def paginate_item_search():
+    """Страница результатов поиска товаров из параметров запроса (q, page, per_page)"""
+    search = request.args.get('q', '').strip()
+    per_page = request.args.get('per_page', app.config['SEARCH_RESULTS_PER_PAGE'], type=int)
+    return search, find_items(search, per_page=per_page, max_per_page=200)
+
+
+@app.route('/search')
+def search_items():
+    """Поиск товаров по наименованию и коду во всех заказах"""
+    search, pagination = paginate_item_search()
+    return render_template('search.html', search=search, pagination=pagination,
+                           items=pagination.items if pagination else [])
+
+
+@app.route('/api/search/items')
+def api_search_items():
+    """API поиска товаров: самые релевантные первыми, с заказом каждого товара"""
+    search, pagination = paginate_item_search()
+    if pagination is None:
+        return jsonify({'error': 'Пустой запрос'}), 400
+    
+    matcher = get_filter_matcher()
+    return jsonify({
+        'query': search,
+        'page': pagination.page,
+        'pages': pagination.pages,
+        'total': pagination.total,
+        'items': [
+            {
+                **item.to_dict(),
+                'filter_match': item.filter_match(matcher),
+                'order': {
+                    'id': item.order.id,
+                    'order_number': item.order.order_number,
+                    'order_date': item.order.order_date.isoformat(),
+                    'status': item.order.status,
+                }
+            }
+            for item in pagination.items
+        ]
+    })
+
+
+@app.route('/archive')
+def archive():
+    """Архив заказов: просмотр по страницам и поиск по номеру заказа или товару"""
+    search = request.args.get('q', '').strip()
+    pagination = db.paginate(archive_query(search), per_page=app.config['ORDERS_PER_PAGE'], error_out=False)
+    return render_template('archive.html', orders=pagination.items, pagination=pagination, search=search)
+
+
+@app.route('/archive/<int:archived_id>')
+def view_archived_order(archived_id):
+    """Просмотр заказа из архива (только чтение)"""
+    order = ArchivedOrder.query.get_or_404(archived_id)
+    return render_template('archive_order.html', order=order)
+
+
+@app.route('/api/archive/<int:archived_id>/restore', methods=['POST'])
+def restore_archived_order(archived_id):
+    """API для возврата заказа из архива в рабочие таблицы"""
+    ArchivedOrder.query.get_or_404(archived_id)
+    order, error_message = restore_order(archived_id)
+    if order is None:
+        return jsonify({'error': error_message}), 409
+    
+    try:
+        schedule_order_prefetch(order.id, order_speech_texts(order))
+    except Exception as e:
+        logger.warning(f"Не удалось запустить фоновый синтез для заказа {order.order_number}: {e}")
+    
+    return jsonify({'success': True, 'order_id': order.id,
+                    'url': url_for('view_order', order_id=order.id)})
+
+
+@app.route('/api/archive/run', methods=['POST'])
+def run_archive_now():
+    """API ручного переноса заказов со статусом в_архив в архив"""
+    moved = run_archive()
+    if moved is None:
+        return jsonify({'error': 'Ошибка переноса заказов в архив'}), 500
+    return jsonify({'success': True, 'moved': moved, **get_archive_stats()})
+
+
 @app.route('/settings')
 def settings():
     """Страница настроек фильтров"""
@@ -231,8 +548,9 @@ def add_filter():
         return jsonify({'error': 'Это слово уже в списке фильтров'}), 400
     
     filter_word = FilterWord(word=word)
-    db.session.add(filter_word)
-    db.session.commit()
+    run_write(db.session.add, filter_word)
+    bump_filter_version()
+    threading.Thread(target=run_filter_refresh, name='filter-refresh', daemon=True).start()
     
     return jsonify({'success': True, 'filter': filter_word.to_dict()})
 
@@ -240,38 +558,162 @@ def add_filter():
 @app.route('/api/filter/<int:filter_id>', methods=['DELETE'])
 def delete_filter(filter_id):
     """API для удаления фильтра"""
-    filter_word = FilterWord.query.get_or_404(filter_id)
-    db.session.delete(filter_word)
-    db.session.commit()
+    run_write(lambda: db.session.delete(FilterWord.query.get_or_404(filter_id)))
+    bump_filter_version()
+    threading.Thread(target=run_filter_refresh, name='filter-refresh', daemon=True).start()
     
     return jsonify({'success': True})
 
 
+def speech_job_response(text):
+    """
+    Ответ API TTS без ожидания синтеза: готовое аудио из кэша
+    или ID задачи в очереди синтеза для опроса статуса
+    """
+    cached_path = find_cached_speech(text, app.config['TTS_LANGUAGE'], app.config['TTS_SLOW'])
+    if cached_path:
+        tts_cache.record_hit()
+        # Возвращаем относительный путь для frontend
+        return jsonify({'success': True, 'status': 'done', 'audio_url': '/' + cached_path})
+    
+    job = tts_jobs.enqueue(text)
+    return jsonify({
+        'success': True,
+        'status': job.state,
+        'job_id': job.job_id,
+        'status_url': url_for('tts_job_status', job_id=job.job_id),
+    }), 202
+
+
 @app.route('/api/tts/item/<int:item_id>')
 def generate_item_tts(item_id):
-    """API для генерации TTS для товара"""
+    """API для генерации TTS для товара (синтез в очереди, ответ сразу)"""
     item = OrderItem.query.get_or_404(item_id)
-    
-    audio_path = generate_item_speech(item.name, item.quantity, item.id)
-    
-    if audio_path:
-        # Возвращаем относительный путь для frontend
-        return jsonify({'success': True, 'audio_url': '/' + audio_path})
-    else:
-        return jsonify({'error': 'Ошибка генерации аудио'}), 500
+    return speech_job_response(build_item_speech_text(item.name, item.quantity))
 
 
 @app.route('/api/tts/order/<int:order_id>')
 def generate_order_tts(order_id):
-    """API для генерации TTS для номера заказа"""
+    """API для генерации TTS для номера заказа (синтез в очереди, ответ сразу)"""
     order = Order.query.get_or_404(order_id)
+    return speech_job_response(build_order_speech_text(order.order_number))
+
+
+@app.route('/api/tts/jobs/<job_id>')
+def tts_job_status(job_id):
+    """API статуса задачи синтеза"""
+    status = tts_jobs.get_job_status(job_id)
+    if status['status'] == tts_jobs.JOB_UNKNOWN:
+        return jsonify(status), 404
+    return jsonify(status)
+
+
+def speech_stream_response(text):
+    """
+    Аудио фразы одним HTTP ответом: из кэша файлом, иначе чанками по мере синтеза
+    """
+    cached_path = find_cached_speech(text, app.config['TTS_LANGUAGE'], app.config['TTS_SLOW'])
+    if cached_path:
+        tts_cache.record_hit()
+        response = send_file(os.path.abspath(cached_path), mimetype=get_audio_mimetype(cached_path), conditional=True)
+        response.headers['X-TTS-Cache'] = 'hit'
+        return response
     
-    audio_path = generate_order_speech(order.order_number)
-    
-    if audio_path:
-        return jsonify({'success': True, 'audio_url': '/' + audio_path})
-    else:
+    stream = stream_tts(text, lang=app.config['TTS_LANGUAGE'], slow=app.config['TTS_SLOW'])
+    if stream is None:
         return jsonify({'error': 'Ошибка генерации аудио'}), 500
+    
+    mimetype, chunks = stream
+    return Response(chunks, mimetype=mimetype, headers={
+        'Cache-Control': 'no-store',
+        'X-TTS-Cache': 'miss',
+    })
+
+
+@app.route('/api/tts/item/<int:item_id>/stream')
+def stream_item_tts(item_id):
+    """API потокового TTS для товара: звук начинается до окончания синтеза"""
+    item = OrderItem.query.get_or_404(item_id)
+    return speech_stream_response(build_item_speech_text(item.name, item.quantity))
+
+
+@app.route('/api/tts/order/<int:order_id>/stream')
+def stream_order_tts(order_id):
+    """API потокового TTS для номера заказа"""
+    order = Order.query.get_or_404(order_id)
+    return speech_stream_response(build_order_speech_text(order.order_number))
+
+
+@app.route('/api/tts/order/<int:order_id>/manifest')
+def order_tts_manifest(order_id):
+    """
+    API манифеста озвучки заказа: URL аудио для номера заказа и всех озвучиваемых товаров
+    одним запросом. Недостающее синтезируется параллельно; то, что не успело
+    за TTS_MANIFEST_WAIT секунд, помечается как pending (ready=false).
+    """
+    order = Order.query.get_or_404(order_id)
+    ensure_order_filters(order)
+    prepared_items = prepare_items_for_assembly(order.items, get_filter_matcher())
+    
+    order_text = build_order_speech_text(order.order_number)
+    item_texts = {
+        item['id']: build_item_speech_text(item['name'], item['quantity'])
+        for item in prepared_items if item['should_announce']
+    }
+    
+    timeout = min(request.args.get('wait', app.config['TTS_MANIFEST_WAIT'], type=float),
+                  app.config['TTS_MANIFEST_WAIT'])
+    paths = ensure_speech_ready([order_text, *item_texts.values()], timeout)
+    
+    def manifest_entry(text, stream_url):
+        path = paths.get(text)
+        return {
+            'ready': path is not None,
+            'audio_url': '/' + path if path else None,
+            'job_id': None if path else tts_jobs.make_job_id(text),
+            'stream_url': stream_url,
+        }
+    
+    entries = [
+        dict(item_id=item_id, **manifest_entry(text, url_for('stream_item_tts', item_id=item_id)))
+        for item_id, text in item_texts.items()
+    ]
+    order_entry = manifest_entry(order_text, url_for('stream_order_tts', order_id=order.id))
+    ready = sum(1 for entry in entries if entry['ready']) + int(order_entry['ready'])
+    
+    return jsonify({
+        'success': True,
+        'order_id': order.id,
+        'order': order_entry,
+        'items': entries,
+        'ready': ready,
+        'pending': len(entries) + 1 - ready,
+    })
+
+
+@app.route('/api/tts/stats')
+def tts_stats():
+    """API статистики TTS: провайдеры, соединения к Yandex Cloud и хранилище аудио"""
+    return jsonify({
+        'providers': tts_router.get_stats(),
+        'http': get_http_stats(),
+        'store': get_store_stats(),
+    })
+
+
+@app.route('/api/db/stats')
+def db_stats():
+    """API статистики БД: повторы записи при блокировках, ожидание блокировки записи, пересборки фильтра слов"""
+    return jsonify({**get_db_stats(), 'filters': get_filter_stats(), 'catalog': get_catalog_stats()})
+
+
+@app.route('/api/audio/gc', methods=['POST'])
+def audio_gc():
+    """API ручного запуска сборки мусора аудио"""
+    result = run_audio_gc()
+    if result is None:
+        return jsonify({'error': 'Ошибка сборки мусора аудио'}), 500
+    return jsonify({'success': True, **result, 'store': get_store_stats()})
 
 
 def check_tts_config():
@@ -302,6 +744,7 @@ def check_tts_config():
 
 
 if __name__ == '__main__':
+    init_database()
     # Проверяем конфигурацию TTS перед запуском сервера
     check_tts_config()
     app.run(debug=True, host='0.0.0.0', port=5000)
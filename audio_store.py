@@ -0,0 +1,192 @@
+"""
+Управление хранилищем аудио
+- квота на размер кэша TTS с вытеснением давно не использованных файлов (LRU по atime);
+- сборка мусора: удаление аудио, на которое не ссылается ни один заказ,
+  и старых файлов item_{id}/order_{n} от прежней схемы именования
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from config import Config
+import tts_cache
+
+logger = logging.getLogger(__name__)
+
+# Файлы старой схемы именования (до кэша по хэшу) в корне static/audio
+LEGACY_AUDIO_PATTERN = re.compile(r'^(item|order)_[^.]+\.(ogg|mp3|wav)$')
+
+# Недописанные временные файлы старше этого возраста (сек) считаются брошенными
+STALE_TMP_AGE = 3600
+
+# Свежие файлы (сек) сборка мусора не трогает: их мог синтезировать только что загруженный заказ
+GC_GRACE_PERIOD = 600
+
+_stats = {
+    'evictions': 0,
+    'evicted_bytes': 0,
+    'gc_removed': 0,
+    'gc_removed_bytes': 0,
+    'last_quota_check': 0.0,
+    'last_gc': None,
+}
+_stats_lock = threading.Lock()
+_quota_lock = threading.Lock()
+
+
+def _scan_cache():
+    """Файлы кэша: список (path, size, atime, mtime, name)"""
+    entries = []
+    try:
+        with os.scandir(Config.TTS_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_atime, stat.st_mtime, entry.name))
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _remove(path):
+    """Удаляет файл, если он еще существует (его мог удалить другой воркер)"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def get_store_size():
+    """Суммарный размер и количество файлов кэша"""
+    entries = _scan_cache()
+    return sum(entry[1] for entry in entries), len(entries)
+
+
+def enforce_quota():
+    """
+    Вытесняет давно не использованные файлы, пока кэш не уложится в квоту
+
+    Чистим до AUDIO_STORE_LOW_WATERMARK от квоты, чтобы не запускать
+    вытеснение после каждого нового файла.
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    quota = Config.AUDIO_STORE_MAX_BYTES
+    if quota <= 0:
+        return 0
+
+    with _quota_lock:
+        entries = [entry for entry in _scan_cache() if not entry[4].endswith('.tmp')]
+        total = sum(entry[1] for entry in entries)
+        if total <= quota:
+            return 0
+
+        target = int(quota * Config.AUDIO_STORE_LOW_WATERMARK)
+        evicted = 0
+        evicted_bytes = 0
+        for path, size, _, _, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= target:
+                break
+            if _remove(path):
+                evicted += 1
+                evicted_bytes += size
+            total -= size
+
+    with _stats_lock:
+        _stats['evictions'] += evicted
+        _stats['evicted_bytes'] += evicted_bytes
+    logger.info(f"Квота аудио: вытеснено {evicted} файлов ({evicted_bytes} байт)")
+    return evicted
+
+
+def maybe_enforce_quota():
+    """Проверка квоты после записи нового аудио, не чаще AUDIO_STORE_CHECK_INTERVAL"""
+    now = time.time()
+    with _stats_lock:
+        if now - _stats['last_quota_check'] < Config.AUDIO_STORE_CHECK_INTERVAL:
+            return 0
+        _stats['last_quota_check'] = now
+    try:
+        return enforce_quota()
+    except Exception as e:
+        logger.warning(f"Ошибка проверки квоты аудио: {e}")
+        return 0
+
+
+def collect_garbage(live_cache_keys):
+    """
+    Удаляет аудио, на которое не ссылается ни один заказ
+
+    Args:
+        live_cache_keys: Множество ключей кэша фраз всех заказов в БД
+
+    Returns:
+        dict: removed, removed_bytes
+    """
+    removed = 0
+    removed_bytes = 0
+    now = time.time()
+
+    for path, size, _, mtime, name in _scan_cache():
+        if name.endswith('.tmp'):
+            # Брошенные временные файлы оборванного синтеза; свежие, возможно, еще пишутся
+            if now - mtime < STALE_TMP_AGE:
+                continue
+        elif name.split('.', 1)[0] in live_cache_keys or now - mtime < GC_GRACE_PERIOD:
+            continue
+        if _remove(path):
+            removed += 1
+            removed_bytes += size
+
+    # Файлы старой схемы item_{id}.ogg / order_{n}.wav и т.п. больше не используются
+    legacy_dir = os.path.dirname(os.path.normpath(Config.TTS_CACHE_DIR))
+    try:
+        with os.scandir(legacy_dir) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False) and LEGACY_AUDIO_PATTERN.match(entry.name):
+                    size = entry.stat(follow_symlinks=False).st_size
+                    if _remove(entry.path):
+                        removed += 1
+                        removed_bytes += size
+    except FileNotFoundError:
+        pass
+
+    # Фразы задач синтеза (tts_jobs), которые не убрал завершившийся воркер
+    jobs_dir = os.path.join(Config.TTS_CACHE_DIR, tts_cache.JOBS_DIR)
+    try:
+        with os.scandir(jobs_dir) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False) and now - entry.stat().st_mtime > Config.TTS_JOB_TTL:
+                    _remove(entry.path)
+    except FileNotFoundError:
+        pass
+
+    with _stats_lock:
+        _stats['gc_removed'] += removed
+        _stats['gc_removed_bytes'] += removed_bytes
+        _stats['last_gc'] = now
+    logger.info(f"Сборка мусора аудио: удалено {removed} файлов ({removed_bytes} байт)")
+    return {'removed': removed, 'removed_bytes': removed_bytes}
+
+
+def get_store_stats():
+    """Размер хранилища, попадания в кэш и счетчики вытеснения/сборки мусора"""
+    size, files = get_store_size()
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.pop('last_quota_check', None)
+    return {
+        'size_bytes': size,
+        'files': files,
+        'quota_bytes': Config.AUDIO_STORE_MAX_BYTES,
+        **tts_cache.get_stats(),
+        **stats,
+    }
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк парсера Excel заказов: время разбора в зависимости от числа строк
+Сравнивает быстрый разбор XML листа (fast_read_order_data), потоковый iter_rows
+openpyxl (parse_excel_file) и прежний доступ к ячейкам через ws.cell()
+
+Использование:
+    python benchmark_excel_parser.py                 # 100 ... 20000 строк
+    python benchmark_excel_parser.py 1000 10000      # свои размеры
+    python benchmark_excel_parser.py --no-legacy 50000
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import zipfile
+
+import openpyxl
+
+from excel_parser import (
+    COLUMNS_ROW, DATA_START_ROW, COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT,
+    parse_excel_file, fast_read_order_data
+)
+
+DEFAULT_SIZES = [100, 250, 500, 1000, 5000, 20000]
+
+# Прежний разбор с ws.cell() в read-only режиме квадратичен (500 строк - около минуты),
+# для больших файлов не запускаем
+LEGACY_MAX_ROWS = 500
+
+PRODUCT_WORDS = ['Табак', 'для кальяна', 'Чай', 'черный', 'Уголь', 'кокосовый', 'Смесь', 'мятная', 'Вишня', 'Лимон']
+
+
+INLINE_STRING_CELL = re.compile(r'<c r="([A-Z]+[0-9]+)"((?: s="[0-9]+")?) t="inlineStr"><is><t(?: [^>]*)?>(.*?)</t></is></c>')
+
+SHARED_STRINGS_REL = (
+    '<Relationship Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml" Id="rIdSharedStrings" />'
+)
+SHARED_STRINGS_CONTENT_TYPE = (
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml" />'
+)
+
+
+def convert_to_shared_strings(path):
+    """
+    Переводит строки листа из inline (так пишет openpyxl) в таблицу общих строк (так пишет 1С)
+    """
+    with zipfile.ZipFile(path) as archive:
+        parts = {info.filename: archive.read(info) for info in archive.infolist()}
+
+    strings = {}
+
+    def replace(match):
+        index = strings.setdefault(match.group(3), len(strings))
+        return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{index}</v></c>'
+
+    for name in [name for name in parts if name.startswith('xl/worksheets/')]:
+        parts[name] = INLINE_STRING_CELL.sub(replace, parts[name].decode('utf-8')).encode('utf-8')
+
+    items = ''.join(f'<si><t xml:space="preserve">{text}</t></si>' for text in strings)
+    parts['xl/sharedStrings.xml'] = (
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">{items}</sst>'
+    ).encode('utf-8')
+    parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+        b'</Relationships>', SHARED_STRINGS_REL.encode() + b'</Relationships>')
+    parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(
+        b'</Types>', SHARED_STRINGS_CONTENT_TYPE.encode() + b'</Types>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+
+
+def write_order_file(path, rows, shared_strings=True):
+    """Пишет файл заказа в раскладке 1С с заданным числом строк товаров"""
+    # Обычный (не write_only) режим: как и 1С, записывает размеры листа (dimension)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    width = COL_UNIT
+    for row_index in range(1, DATA_START_ROW):
+        row = [None] * width
+        if row_index == 3:
+            row[1] = 'Заказ покупателя № 2351 от 8 декабря 2025 г.'
+        elif row_index == COLUMNS_ROW:
+            row[COL_ROW_NUMBER - 1] = '№'
+            row[COL_NAME - 1] = 'Товары (работы, услуги)'
+            row[COL_CODE - 1] = 'Код'
+            row[COL_QUANTITY - 1] = 'Кол-во'
+            row[COL_UNIT - 1] = 'Ед.'
+        ws.append(row)
+    rnd = random.Random(rows)
+    for i in range(1, rows + 1):
+        row = [None] * width
+        row[COL_ROW_NUMBER - 1] = i
+        row[COL_NAME - 1] = ' '.join(rnd.sample(PRODUCT_WORDS, 4)) + f' {i}'
+        row[COL_CODE - 1] = f'УТ-{i:08d}'
+        row[COL_QUANTITY - 1] = rnd.randint(1, 50)
+        row[COL_UNIT - 1] = 'шт'
+        ws.append(row)
+    wb.save(path)
+    if shared_strings:
+        convert_to_shared_strings(path)
+
+
+def parse_with_cell_access(filepath):
+    """Прежний разбор: пять вызовов ws.cell() на строку"""
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    ws = wb.active
+    count = 0
+    row_num = DATA_START_ROW
+    while row_num <= ws.max_row:
+        if ws.cell(row=row_num, column=COL_ROW_NUMBER).value:
+            name = ws.cell(row=row_num, column=COL_NAME).value
+            quantity = ws.cell(row=row_num, column=COL_QUANTITY).value
+            ws.cell(row=row_num, column=COL_UNIT)
+            ws.cell(row=row_num, column=COL_CODE)
+            if name and quantity:
+                count += 1
+        row_num += 1
+    wb.close()
+    return count
+
+
+def measure(func, *args):
+    """Время выполнения и результат"""
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк парсера Excel заказов')
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES, help='Количество строк товаров')
+    parser.add_argument('--no-legacy', action='store_true', help='Не запускать прежний разбор через ws.cell()')
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} | {'быстрый, с':>10} | {'iter_rows, с':>12} | {'ускорение':>9} | {'ws.cell(), с':>12}")
+    print('-' * 65)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.sizes:
+            path = os.path.join(tmp_dir, f'order_{rows}.xlsx')
+            write_order_file(path, rows)
+
+            fast_time, (data, _) = measure(fast_read_order_data, path)
+            assert len(data['items']) == rows, f'ожидалось {rows} товаров, получено {len(data["items"])}'
+
+            streaming_time, order = measure(parse_excel_file, path, os.path.basename(path))
+            assert len(order.items) == rows, f'ожидалось {rows} товаров, получено {len(order.items)}'
+
+            speedup = f'{streaming_time / fast_time:.1f}x'
+            if args.no_legacy or rows > LEGACY_MAX_ROWS:
+                legacy = '-'
+            else:
+                legacy_time, legacy_count = measure(parse_with_cell_access, path)
+                assert legacy_count == rows
+                legacy = f'{legacy_time:.3f}'
+            print(f'{rows:>8} | {fast_time:>10.3f} | {streaming_time:>12.3f} | {speedup:>9} | {legacy:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк приема заказов: время и пиковая память (RSS) по этапам
+- validate: validate_excel_file
+- parse: parse_excel_file (openpyxl, модели Order/OrderItem)
+- ingest: load_order - проверка и разбор за одну загрузку книги, как в /upload
+- insert: сохранение разобранного заказа в БД (SQLite во временной папке) одним commit
+- stream: потоковый прием (stream_order) - разбор и вставка товаров пачками вместе
+
+Файлы создает order_generator. Каждый этап запускается в отдельном процессе,
+чтобы пиковая память одного этапа не влияла на другой. Результаты сохраняются
+в JSON; с --compare они сравниваются с прошлым запуском.
+
+Использование:
+    python benchmark_ingest.py                               # 10, 100, 1000, 10000 строк
+    python benchmark_ingest.py 100000 --output before.json
+    python benchmark_ingest.py --compare before.json         # после изменений
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from order_generator import generate_order_file
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+STAGES = ['validate', 'parse', 'ingest', 'insert', 'stream']
+
+# Замедление больше этого порога отмечается при сравнении
+REGRESSION_THRESHOLD = 1.2
+
+
+def _peak_rss_mb():
+    """Пиковый RSS процесса в МБ (ru_maxrss: КБ в Linux, байты в macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_stage(stage, path, db_path):
+    """
+    Выполняет один этап в чистом процессе
+
+    Returns:
+        dict: seconds, peak_rss_mb, rss_growth_mb (прирост пика за время этапа), items
+    """
+    from excel_parser import load_order, parse_excel_file, validate_excel_file
+
+    filename = os.path.basename(path)
+    items = None
+    if stage in ('insert', 'stream'):
+        from flask import Flask
+        from models import db
+        from order_ingest import RESULT_ACCEPTED, stream_order
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            if stage == 'insert':
+                order = parse_excel_file(path, filename)
+                rss_before = _peak_rss_mb()
+                started = time.perf_counter()
+                db.session.add(order)
+                db.session.commit()
+                seconds = time.perf_counter() - started
+                items = len(order.items)
+            else:
+                rss_before = _peak_rss_mb()
+                started = time.perf_counter()
+                status, _, items, message = stream_order(path, filename)
+                assert status == RESULT_ACCEPTED, message
+                db.session.commit()
+                seconds = time.perf_counter() - started
+    else:
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        if stage == 'validate':
+            is_valid, message = validate_excel_file(path)
+            assert is_valid, message
+        elif stage == 'parse':
+            items = len(parse_excel_file(path, filename).items)
+        elif stage == 'ingest':
+            order, message = load_order(path, filename)
+            assert order is not None, message
+            items = len(order.items)
+        seconds = time.perf_counter() - started
+
+    peak = _peak_rss_mb()
+    return {
+        'seconds': seconds,
+        'peak_rss_mb': round(peak, 1),
+        'rss_growth_mb': round(peak - rss_before, 1),
+        'items': items,
+    }
+
+
+def in_fresh_process(func, *args):
+    """
+    Выполняет функцию в новом процессе (spawn)
+    
+    В Linux пиковый RSS наследуется дочерним процессом от родителя, поэтому
+    и файлы генерируются не в основном процессе - иначе его память попала бы
+    в пик каждого этапа.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run_stage(stage, path, db_path):
+    """Запускает этап в новом процессе"""
+    return in_fresh_process(_run_stage, stage, path, db_path)
+
+
+def _git_revision():
+    """Текущий коммит (для сравнения версий), если это git репозиторий"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes, stages, repeat):
+    """
+    Прогоняет этапы на файлах заданных размеров
+
+    Returns:
+        list: Словари rows, file_kb, stage, seconds (медиана), peak_rss_mb и rss_growth_mb (максимум), items
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            path = os.path.join(tmp_dir, f'order_{rows}.xlsx')
+            info = in_fresh_process(generate_order_file, path, rows)
+            file_kb = round(os.path.getsize(path) / 1024, 1)
+
+            for stage in stages:
+                runs = [
+                    run_stage(stage, path, os.path.join(tmp_dir, f'bench_{rows}_{stage}_{attempt}.db'))
+                    for attempt in range(repeat)
+                ]
+                result = {
+                    'rows': rows,
+                    'file_kb': file_kb,
+                    'stage': stage,
+                    'seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+                    'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+                    'rss_growth_mb': max(run['rss_growth_mb'] for run in runs),
+                    'items': runs[0]['items'],
+                }
+                if result['items'] is not None:
+                    assert result['items'] == info['expected_items'], \
+                        f"{stage}: ожидалось {info['expected_items']} товаров, получено {result['items']}"
+                results.append(result)
+                print(f"{rows:>8} | {stage:<8} | {result['seconds']:>9.3f} | "
+                      f"{result['peak_rss_mb']:>9.1f} | {result['rss_growth_mb']:>7.1f} | {file_kb:>8.1f}",
+                      flush=True)
+    return results
+
+
+def compare(results, baseline_path):
+    """Печатает сравнение времени этапов с прошлым запуском"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(item['rows'], item['stage']): item for item in baseline['results']}
+
+    print(f"\nСравнение с {baseline_path} ({baseline.get('revision') or 'без ревизии'}):")
+    print(f"{'строк':>8} | {'этап':<8} | {'было, с':>9} | {'стало, с':>9} | {'время':>7} | {'RSS, МБ':>15}")
+    print('-' * 72)
+    regressions = 0
+    for item in results:
+        old = previous.get((item['rows'], item['stage']))
+        if old is None:
+            continue
+        ratio = item['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        mark = ' !' if ratio > REGRESSION_THRESHOLD else ''
+        regressions += bool(mark)
+        print(f"{item['rows']:>8} | {item['stage']:<8} | {old['seconds']:>9.3f} | {item['seconds']:>9.3f} | "
+              f"{ratio:>6.2f}x | {old['peak_rss_mb']:>6.1f} -> {item['peak_rss_mb']:>6.1f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк приема заказов по этапам')
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES, help='Количество строк товаров')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Этапы')
+    parser.add_argument('--repeat', type=int, default=1, help='Повторов каждого этапа (время - медиана)')
+    parser.add_argument('--output', help='Файл результатов JSON (по умолчанию benchmark_ingest_<время>.json)')
+    parser.add_argument('--compare', help='JSON прошлого запуска для сравнения')
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} | {'этап':<8} | {'время, с':>9} | {'RSS, МБ':>9} | {'+RSS':>7} | {'файл, КБ':>8}")
+    print('-' * 63)
+    results = run_benchmark(args.sizes, args.stages, max(args.repeat, 1))
+
+    output = args.output or f"benchmark_ingest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': _git_revision(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f'\nРезультаты сохранены: {output}')
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
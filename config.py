@@ -14,15 +14,60 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///order_assistant.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite для нескольких воркеров: WAL, ожидание блокировки (мс), повторы записи с паузой (сек, удваивается)
+    SQLITE_CONCURRENCY = os.environ.get('SQLITE_CONCURRENCY', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    DB_WRITE_RETRIES = int(os.environ.get('DB_WRITE_RETRIES', '5'))
+    DB_WRITE_RETRY_DELAY = float(os.environ.get('DB_WRITE_RETRY_DELAY', '0.05'))
     
     # Upload settings
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'xlsx'}
+    # Загрузка до этого размера (байт) разбирается в памяти, больше - во временном файле
+    UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', str(4 * 1024 * 1024)))
+    # Быстрый разбор XML листа для раскладки 1С (при неожиданностях в файле - openpyxl)
+    EXCEL_FAST_READER = os.environ.get('EXCEL_FAST_READER', 'true').lower() == 'true'
+    # Пакетная загрузка: процессы разбора (0 - по числу ядер), лимит файлов и распакованного размера
+    INGEST_PROCESS_WORKERS = int(os.environ.get('INGEST_PROCESS_WORKERS', '0'))
+    BULK_UPLOAD_MAX_FILES = int(os.environ.get('BULK_UPLOAD_MAX_FILES', '500'))
+    BULK_UPLOAD_MAX_BYTES = int(os.environ.get('BULK_UPLOAD_MAX_BYTES', str(256 * 1024 * 1024)))
+    # Файлы от этого размера (байт) принимаются потоково: товары пишутся в БД пачками по INGEST_BATCH_SIZE
+    STREAMING_INGEST_MIN_BYTES = int(os.environ.get('STREAMING_INGEST_MIN_BYTES', str(2 * 1024 * 1024)))
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', '1000'))
+    # Товаров каталога в кэше процесса (ключ товара -> id)
+    PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', '50000'))
+    # Заказов на странице списка
+    ORDERS_PER_PAGE = int(os.environ.get('ORDERS_PER_PAGE', '50'))
+    # Заказы со статусом в_архив переносятся в архивные таблицы пачками по столько заказов
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '100'))
+    # Результатов поиска товаров на странице
+    SEARCH_RESULTS_PER_PAGE = int(os.environ.get('SEARCH_RESULTS_PER_PAGE', '50'))
+    
+    # Файл-метка версии фильтров слов: меняется при добавлении/удалении фильтра,
+    # по нему воркеры узнают, что скомпилированный фильтр пора пересобрать
+    FILTER_WORDS_STAMP = os.environ.get('FILTER_WORDS_STAMP', 'instance/filter_words.stamp')
+    # После изменения фильтров товары каталога переразмечаются пачками по столько товаров
+    FILTER_REFRESH_BATCH_SIZE = int(os.environ.get('FILTER_REFRESH_BATCH_SIZE', '1000'))
     
     # Audio settings
     TTS_LANGUAGE = 'ru'
     TTS_SLOW = False
+    # Кэш синтезированных фраз (имя файла = хэш текста, голоса, провайдера и формата)
+    TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', 'static/audio/tts')
+    # Количество потоков фонового синтеза озвучки после загрузки заказа
+    TTS_PREFETCH_WORKERS = int(os.environ.get('TTS_PREFETCH_WORKERS', '4'))
+    # Манифест озвучки заказа: параллельность досинтеза и сколько секунд ждать его в запросе
+    TTS_BATCH_CONCURRENCY = int(os.environ.get('TTS_BATCH_CONCURRENCY', '4'))
+    TTS_MANIFEST_WAIT = float(os.environ.get('TTS_MANIFEST_WAIT', '3'))
+    # Очередь задач синтеза из API: число потоков и сколько секунд помнить завершенную задачу
+    TTS_JOB_WORKERS = int(os.environ.get('TTS_JOB_WORKERS', '2'))
+    TTS_JOB_TTL = int(os.environ.get('TTS_JOB_TTL', '600'))
+    # Квота на размер кэша аудио (байт, 0 - без ограничения); при превышении старые файлы
+    # вытесняются до LOW_WATERMARK от квоты; проверка не чаще CHECK_INTERVAL сек
+    AUDIO_STORE_MAX_BYTES = int(os.environ.get('AUDIO_STORE_MAX_BYTES', str(512 * 1024 * 1024)))
+    AUDIO_STORE_LOW_WATERMARK = float(os.environ.get('AUDIO_STORE_LOW_WATERMARK', '0.9'))
+    AUDIO_STORE_CHECK_INTERVAL = int(os.environ.get('AUDIO_STORE_CHECK_INTERVAL', '60'))
     
     # Yandex SpeechKit settings
     # OAuth токен для получения IAM токена (рекомендуется, как в рабочем примере)
@@ -32,6 +77,21 @@ class Config:
     YANDEX_TTS_FOLDER_ID = os.environ.get('YANDEX_TTS_FOLDER_ID', '')
     YANDEX_TTS_VOICE = os.environ.get('YANDEX_TTS_VOICE', 'jane')  # jane, oksana, omazh, zahar, ermil
     YANDEX_TTS_ENABLED = os.environ.get('YANDEX_TTS_ENABLED', 'false').lower() == 'true'
+    # Общий для всех воркеров файл с IAM токеном и запас времени (сек), за который токен обновляется заранее
+    YANDEX_IAM_TOKEN_CACHE = os.environ.get('YANDEX_IAM_TOKEN_CACHE', 'instance/yandex_iam_token.json')
+    YANDEX_IAM_REFRESH_MARGIN = int(os.environ.get('YANDEX_IAM_REFRESH_MARGIN', '3600'))
+    # Выбор провайдера TTS: окно статистики (запросов), ошибок подряд до отключения провайдера,
+    # время остывания (сек) до пробного запроса, штраф к задержке непредпочтительного провайдера
+    TTS_ROUTER_WINDOW = int(os.environ.get('TTS_ROUTER_WINDOW', '20'))
+    TTS_BREAKER_FAILURES = int(os.environ.get('TTS_BREAKER_FAILURES', '3'))
+    TTS_BREAKER_COOLDOWN = float(os.environ.get('TTS_BREAKER_COOLDOWN', '30'))
+    TTS_ROUTER_FALLBACK_PENALTY = float(os.environ.get('TTS_ROUTER_FALLBACK_PENALTY', '1.5'))
+    # HTTP: размер пула keep-alive соединений, таймауты подключения/чтения (сек), повторы для 429/5xx
+    YANDEX_HTTP_POOL_SIZE = int(os.environ.get('YANDEX_HTTP_POOL_SIZE', '10'))
+    YANDEX_HTTP_CONNECT_TIMEOUT = float(os.environ.get('YANDEX_HTTP_CONNECT_TIMEOUT', '3.05'))
+    YANDEX_HTTP_READ_TIMEOUT = float(os.environ.get('YANDEX_HTTP_READ_TIMEOUT', '15'))
+    YANDEX_HTTP_RETRIES = int(os.environ.get('YANDEX_HTTP_RETRIES', '2'))
+    YANDEX_HTTP_BACKOFF = float(os.environ.get('YANDEX_HTTP_BACKOFF', '0.3'))
 
 
 
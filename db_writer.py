@@ -0,0 +1,167 @@
+"""
+Режим SQLite для нескольких воркеров gunicorn
+WAL журнал (чтение не блокируется записью) и busy_timeout задаются при каждом
+подключении. Записи идут через run_write: внутри процесса по одной, транзакция
+открывается BEGIN IMMEDIATE (блокировка записи берется сразу, с ожиданием
+busy_timeout, а не при первом UPDATE, где SQLite отвечает "database is locked"
+без ожидания), при блокировке - ограниченные повторы с экспоненциальной паузой.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Опция выполнения соединения: транзакция для записи (BEGIN IMMEDIATE)
+WRITE_OPTION = 'sqlite_write'
+
+_configured_engines = set()
+_configured_lock = threading.Lock()
+
+# Записи этого процесса - по одной
+_write_lock = threading.Lock()
+
+_stats = {
+    'writes': 0,
+    'retries': 0,
+    'failures': 0,
+    'lock_wait_ms': 0.0,
+    'max_lock_wait_ms': 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def configure_sqlite(engine):
+    """
+    Включает режим нескольких воркеров для SQLite (SQLITE_CONCURRENCY)
+    
+    Returns:
+        bool: Режим включен (False для других СУБД или если он выключен)
+    """
+    if engine.dialect.name != 'sqlite' or not Config.SQLITE_CONCURRENCY:
+        return False
+    with _configured_lock:
+        if engine not in _configured_engines:
+            event.listen(engine, 'connect', _on_connect)
+            event.listen(engine, 'begin', _on_begin)
+            _configured_engines.add(engine)
+    return True
+
+
+def _on_connect(dbapi_connection, connection_record):
+    """Настройки каждого нового подключения SQLite"""
+    # Транзакции открывает _on_begin: pysqlite сам начинает их только перед записью
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}')
+    # В WAL режиме NORMAL не теряет согласованность, fsync только на checkpoint
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _on_begin(connection):
+    """Начало транзакции: для записи сразу берем блокировку записи"""
+    if connection.get_execution_options().get(WRITE_OPTION):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        connection.exec_driver_sql('BEGIN')
+
+
+def is_lock_error(error):
+    """Ошибка блокировки SQLite (database is locked / busy)"""
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _record_write(wait_ms, retried=False, failed=False):
+    with _stats_lock:
+        _stats['writes'] += not failed and not retried
+        _stats['retries'] += retried
+        _stats['failures'] += failed
+        _stats['lock_wait_ms'] += wait_ms
+        _stats['max_lock_wait_ms'] = max(_stats['max_lock_wait_ms'], wait_ms)
+
+
+def end_read_transaction():
+    """
+    Завершает открытую читающую транзакцию сессии перед долгой работой без БД
+    
+    В WAL режиме транзакция, которая читала из старого снимка, не может начать
+    запись, если с тех пор кто-то записал: SQLite сразу отвечает "database is locked",
+    busy_timeout не помогает. Поэтому после долгого разбора файла запись должна
+    начинаться в новой транзакции.
+    """
+    db.session.commit()
+
+
+def run_write(func, *args, **kwargs):
+    """
+    Выполняет запись в БД: func меняет объекты сессии, затем commit
+    
+    Открытая до вызова транзакция (например, чтение в обработчике запроса)
+    фиксируется, поэтому func должна сама загрузить объекты, которые меняет.
+    При блокировке БД транзакция откатывается и func вызывается снова
+    (до DB_WRITE_RETRIES раз, пауза DB_WRITE_RETRY_DELAY удваивается).
+    
+    Returns:
+        Результат func
+    
+    Raises:
+        OperationalError: БД так и осталась заблокированной
+    """
+    db.session.commit()
+    # Сериализация внутри процесса нужна только SQLite: у нее одна блокировка записи на файл
+    write_lock = _write_lock if db.engine in _configured_engines else nullcontext()
+    delay = Config.DB_WRITE_RETRY_DELAY
+    for attempt in range(Config.DB_WRITE_RETRIES + 1):
+        wait_started = time.perf_counter()
+        with write_lock:
+            wait_ms = 0.0
+            try:
+                # Транзакция записи начинается с BEGIN IMMEDIATE - здесь и ждем блокировку
+                db.session.connection(execution_options={WRITE_OPTION: True})
+                wait_ms = (time.perf_counter() - wait_started) * 1000
+                result = func(*args, **kwargs)
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                wait_ms = wait_ms or (time.perf_counter() - wait_started) * 1000
+                if not is_lock_error(e) or attempt == Config.DB_WRITE_RETRIES:
+                    _record_write(wait_ms, failed=True)
+                    logger.error(f"Запись в БД не выполнена: {e}")
+                    raise
+                _record_write(wait_ms, retried=True)
+                logger.warning(f"БД заблокирована, повтор записи через {delay:.2f} с (попытка {attempt + 1})")
+            except Exception:
+                db.session.rollback()
+                raise
+            else:
+                _record_write(wait_ms)
+                return result
+        time.sleep(delay * (1 + random.random()))
+        delay *= 2
+
+
+def get_db_stats():
+    """Режим БД и счетчики записей этого процесса"""
+    engine = db.engine
+    with _stats_lock:
+        stats = dict(_stats)
+    attempts = stats['writes'] + stats['retries'] + stats['failures']
+    stats['avg_lock_wait_ms'] = round(stats['lock_wait_ms'] / attempts, 2) if attempts else 0.0
+    stats['lock_wait_ms'] = round(stats['lock_wait_ms'], 1)
+    stats['max_lock_wait_ms'] = round(stats['max_lock_wait_ms'], 1)
+    return {
+        'dialect': engine.dialect.name,
+        'sqlite_concurrency': engine in _configured_engines,
+        **stats,
+    }
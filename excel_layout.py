@@ -0,0 +1,250 @@
+"""
+Раскладка файла заказа: в какой строке заголовок заказа, с какой строки идут
+товары и в каких колонках номер, наименование, код, количество и единица
+
+Раскладка определяется по строке заголовков колонок ("№", "Товар", "Кол-во"...)
+и кэшируется по отпечатку этой строки: для уже встречавшегося шаблона
+поиск заголовков не выполняется. Файлы без распознанной строки заголовков
+читаются в стандартной раскладке 1С.
+"""
+import hashlib
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Стандартная раскладка файла заказа из 1С (номера строк и колонок с 1, как в Excel)
+HEADER_ROW = 3          # Заголовок с номером и датой заказа
+HEADER_COLUMN = 2       # Колонка B
+COLUMNS_ROW = 9         # Заголовки колонок
+DATA_START_ROW = 11     # Первая строка товаров
+COL_ROW_NUMBER = 2      # Колонка B (№ строки)
+COL_NAME = 7            # Колонка G (наименование)
+COL_CODE = 18           # Колонка R (код)
+COL_QUANTITY = 21       # Колонка U (количество)
+COL_UNIT = 24           # Колонка X (единица)
+
+# Строка заголовков колонок ищется в первых строках листа
+LAYOUT_SCAN_ROWS = 30
+
+# Не больше стольких шаблонов держим в кэше
+LAYOUT_CACHE_SIZE = 64
+
+# Названия колонок (после normalize_header) для полей товара
+FIELD_PATTERNS = {
+    'row_number': re.compile(r'^(№|n|no|номер)( п п| строки)?$'),
+    'name': re.compile(r'^(товар|наименование|номенклатура)'),
+    'code': re.compile(r'^(код|артикул)'),
+    'quantity': re.compile(r'^(кол|количество)'),
+    'unit': re.compile(r'^(ед|единица)'),
+}
+REQUIRED_FIELDS = ('row_number', 'name', 'quantity')
+
+# Заголовок заказа: "Заказ покупателя № 2351 от 8 декабря 2025 г."
+TITLE_PATTERN = re.compile(r'№\s*\d+')
+
+
+class OrderLayout:
+    """Раскладка листа заказа"""
+
+    def __init__(self, title_row, title_column, data_start_row,
+                 row_number, name, quantity, code=None, unit=None, columns_row=None):
+        self.title_row = title_row
+        self.title_column = title_column
+        self.columns_row = columns_row
+        self.data_start_row = data_start_row
+        self.row_number = row_number
+        self.name = name
+        self.quantity = quantity
+        self.code = code
+        self.unit = unit
+
+    @property
+    def item_columns(self):
+        """Колонки, которые читаются в строках товаров"""
+        return frozenset(
+            column for column in (self.row_number, self.name, self.quantity, self.code, self.unit)
+            if column is not None
+        )
+
+    @property
+    def max_column(self):
+        """Последняя нужная колонка строк товаров"""
+        return max(self.item_columns)
+
+    def title_text(self, top_rows):
+        """Текст заголовка заказа из верхних строк листа"""
+        for row_index, row in top_rows:
+            if row_index == self.title_row:
+                return row_value(row, self.title_column)
+        return None
+
+    def to_dict(self):
+        """Преобразование в словарь для JSON и логов"""
+        return {
+            'title_row': self.title_row,
+            'title_column': self.title_column,
+            'columns_row': self.columns_row,
+            'data_start_row': self.data_start_row,
+            'row_number': self.row_number,
+            'name': self.name,
+            'quantity': self.quantity,
+            'code': self.code,
+            'unit': self.unit,
+        }
+
+    def __repr__(self):
+        return f'<OrderLayout {self.to_dict()}>'
+
+
+DEFAULT_LAYOUT = OrderLayout(
+    HEADER_ROW, HEADER_COLUMN, DATA_START_ROW,
+    row_number=COL_ROW_NUMBER, name=COL_NAME, quantity=COL_QUANTITY,
+    code=COL_CODE, unit=COL_UNIT, columns_row=COLUMNS_ROW
+)
+
+# Отпечаток строки заголовков -> OrderLayout
+_layouts = {}
+_layouts_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'detections': 0,
+    'defaults': 0,
+}
+
+
+def row_value(row, column):
+    """Значение колонки из кортежа строки (строка может быть короче раскладки)"""
+    index = column - 1
+    return row[index] if column is not None and index < len(row) else None
+
+
+def normalize_header(value):
+    """Название колонки для сравнения: нижний регистр, ё -> е, без знаков препинания"""
+    text = str(value).casefold().replace('ё', 'е')
+    return ' '.join(re.sub(r'[^\w№]+', ' ', text).split())
+
+
+def header_fingerprint(row_index, row):
+    """
+    Отпечаток строки листа: номер строки и тексты ячеек с их колонками
+
+    Returns:
+        str: sha1 в hex или None, если в строке меньше двух текстовых ячеек
+    """
+    cells = [
+        f'{column}:{normalize_header(value)}'
+        for column, value in enumerate(row, start=1)
+        if isinstance(value, str) and value.strip()
+    ]
+    if len(cells) < 2:
+        return None
+    payload = f'{row_index}|' + '|'.join(cells)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _map_columns(row):
+    """Поля товара по названиям колонок строки: {поле: колонка}, первое совпадение слева"""
+    fields = {}
+    for column, value in enumerate(row, start=1):
+        if not isinstance(value, str):
+            continue
+        text = normalize_header(value)
+        for field, pattern in FIELD_PATTERNS.items():
+            if field not in fields and pattern.match(text):
+                fields[field] = column
+                break
+    return fields
+
+
+def _is_item_row(row, fields):
+    """Похожа ли строка на товар: есть номер и текстовое наименование (не нумерация колонок)"""
+    name = row_value(row, fields['name'])
+    return bool(row_value(row, fields['row_number'])) and \
+        isinstance(name, str) and not name.strip().isdigit()
+
+
+def detect_layout(top_rows):
+    """
+    Определяет раскладку по строке заголовков колонок
+
+    Args:
+        top_rows: Верхние строки листа - список (номер строки, кортеж значений)
+
+    Returns:
+        OrderLayout: Раскладка или None, если строка заголовков не найдена
+    """
+    for position, (row_index, row) in enumerate(top_rows):
+        fields = _map_columns(row)
+        if not all(field in fields for field in REQUIRED_FIELDS):
+            continue
+
+        # Товары начинаются с первой похожей на товар строки после заголовков
+        data_start_row = next(
+            (index for index, data_row in top_rows[position + 1:] if _is_item_row(data_row, fields)),
+            row_index + 1
+        )
+
+        # Заголовок заказа - ячейка с "№ <число>" выше заголовков колонок
+        title_row, title_column = next(
+            (
+                (index, column)
+                for index, title_row_values in top_rows[:position]
+                for column, value in enumerate(title_row_values, start=1)
+                if isinstance(value, str) and TITLE_PATTERN.search(value)
+            ),
+            (HEADER_ROW, HEADER_COLUMN)
+        )
+
+        return OrderLayout(
+            title_row, title_column, data_start_row,
+            row_number=fields['row_number'], name=fields['name'], quantity=fields['quantity'],
+            code=fields.get('code'), unit=fields.get('unit'), columns_row=row_index
+        )
+    return None
+
+
+def resolve_layout(top_rows):
+    """
+    Раскладка листа: из кэша по отпечатку строки заголовков, иначе определение
+    по названиям колонок, иначе стандартная раскладка 1С
+
+    Args:
+        top_rows: Верхние строки листа (до LAYOUT_SCAN_ROWS) - список (номер строки, кортеж значений)
+
+    Returns:
+        OrderLayout: Раскладка листа
+    """
+    fingerprints = [
+        (row_index, header_fingerprint(row_index, row)) for row_index, row in top_rows
+    ]
+    with _layouts_lock:
+        for _, fingerprint in fingerprints:
+            layout = _layouts.get(fingerprint) if fingerprint else None
+            if layout is not None:
+                _stats['hits'] += 1
+                return layout
+
+    layout = detect_layout(top_rows)
+    if layout is None:
+        with _layouts_lock:
+            _stats['defaults'] += 1
+        return DEFAULT_LAYOUT
+
+    fingerprint = dict(fingerprints).get(layout.columns_row)
+    with _layouts_lock:
+        _stats['detections'] += 1
+        if fingerprint and fingerprint not in _layouts:
+            if len(_layouts) >= LAYOUT_CACHE_SIZE:
+                # Вытесняем самый старый шаблон
+                del _layouts[next(iter(_layouts))]
+            _layouts[fingerprint] = layout
+    logger.info(f"Новая раскладка файла заказа: {layout.to_dict()}")
+    return layout
+
+
+def get_layout_stats():
+    """Количество известных шаблонов и счетчики кэша раскладок этого процесса"""
+    with _layouts_lock:
+        return {'templates': len(_layouts), **_stats}
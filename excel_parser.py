@@ -1,8 +1,24 @@
+import logging
+import posixpath
 import re
+import zipfile
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+from itertools import chain
+from xml.etree.ElementTree import iterparse
 import openpyxl
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from config import Config
+from excel_layout import (
+    HEADER_ROW, HEADER_COLUMN, COLUMNS_ROW, DATA_START_ROW,
+    COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT,
+    DEFAULT_LAYOUT, LAYOUT_SCAN_ROWS, resolve_layout, row_value
+)
 from models import Order, OrderItem
 
+logger = logging.getLogger(__name__)
+
 
 def parse_order_number(text):
     """
@@ -53,67 +69,38 @@ def parse_order_date(text):
     return datetime.now().date()
 
 
-def parse_excel_file(filepath, filename):
+def read_layout(ws):
     """
-    Парсит Excel файл заказа из 1С
-    
-    Структура файла:
-    - Строка 3: Заголовок с номером и датой заказа
-    - Строка 9: Заголовки колонок
-    - Строки 11+: Данные товаров
-      - Колонка 1 (индекс 0): № строки
-      - Колонка 6 (индекс 5): Наименование товара
-      - Колонка 17 (индекс 16): Код товара
-      - Колонка 20 (индекс 19): Количество
-      - Колонка 23 (индекс 22): Единица измерения
+    Раскладка листа по его верхним строкам
     
     Returns:
-        Order: Объект заказа с товарами
+        tuple: (OrderLayout, список (номер строки, кортеж значений) верхних строк)
     """
-    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
-    ws = wb.active
-    
-    # Извлекаем информацию о заказе из строки 3
-    header_cell = ws.cell(row=3, column=2)  # Колонка B, строка 3
-    header_text = header_cell.value
-    
-    order_number = parse_order_number(header_text)
-    order_date = parse_order_date(header_text)
-    
-    if not order_number:
-        order_number = f"ORDER_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    # Создаем заказ
-    order = Order(
-        order_number=order_number,
-        order_date=order_date,
-        filename=filename,
-        status='новый'
-    )
-    
-    # Парсим товары начиная со строки 11
-    items = []
-    row_num = 11
+    top_rows = list(enumerate(
+        ws.iter_rows(max_row=min(LAYOUT_SCAN_ROWS, ws.max_row), values_only=True),
+        start=1
+    ))
+    return resolve_layout(top_rows), top_rows
+
+
+def items_from_rows(rows, layout=DEFAULT_LAYOUT):
+    """
+    Товары из строк листа (кортежи значений колонок начиная с первой строки товаров)
     
-    while row_num <= ws.max_row:
-        # Проверяем есть ли номер строки (колонка 1)
-        row_number_cell = ws.cell(row=row_num, column=2)  # Колонка B
-        if not row_number_cell.value:
-            row_num += 1
+    Yields:
+        tuple: (row_number, name, quantity, unit, code)
+    """
+    for row in rows:
+        # Проверяем есть ли номер строки
+        row_number = row_value(row, layout.row_number)
+        if not row_number:
             continue
         
-        # Извлекаем данные товара
-        name_cell = ws.cell(row=row_num, column=7)  # Колонка G (наименование)
-        quantity_cell = ws.cell(row=row_num, column=21)  # Колонка U (количество)
-        unit_cell = ws.cell(row=row_num, column=24)  # Колонка X (единица)
-        code_cell = ws.cell(row=row_num, column=18)  # Колонка R (код)
-        
-        name = name_cell.value
-        quantity = quantity_cell.value
+        name = row_value(row, layout.name)
+        quantity = row_value(row, layout.quantity)
         
         # Пропускаем строки без наименования или количества
         if not name or not quantity:
-            row_num += 1
             continue
         
         try:
@@ -121,51 +108,321 @@ def parse_excel_file(filepath, filename):
         except (ValueError, TypeError):
             quantity = 1
         
-        unit = unit_cell.value if unit_cell.value else 'шт'
-        code = code_cell.value if code_cell.value else None
+        unit = row_value(row, layout.unit) or 'шт'
+        code = row_value(row, layout.code) or None
         
-        # Создаем товар
-        item = OrderItem(
-            row_number=int(row_number_cell.value),
-            name=str(name).strip(),
+        yield (
+            int(row_number),
+            str(name).strip(),
+            quantity,
+            str(unit).strip(),
+            str(code).strip() if code else None,
+        )
+
+
+def iter_item_rows(ws, layout=DEFAULT_LAYOUT):
+    """
+    Один потоковый проход по строкам товаров
+    
+    В read-only режиме openpyxl каждый ws.cell() заново читает XML листа,
+    поэтому строки читаются только через iter_rows(values_only=True).
+    
+    Yields:
+        tuple: (row_number, name, quantity, unit, code)
+    """
+    return items_from_rows(
+        ws.iter_rows(min_row=layout.data_start_row, max_col=layout.max_column, values_only=True),
+        layout
+    )
+
+
+def order_header(header_text):
+    """
+    Номер и дата заказа из текста заголовка
+    
+    Returns:
+        dict: order_number, order_date
+    """
+    order_number = parse_order_number(header_text)
+    order_date = parse_order_date(header_text)
+    
+    if not order_number:
+        order_number = f"ORDER_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    
+    return {
+        'order_number': order_number,
+        'order_date': order_date,
+    }
+
+
+def order_data_from_rows(header_text, rows, layout=DEFAULT_LAYOUT):
+    """
+    Данные заказа из текста заголовка и строк товаров
+    
+    Returns:
+        dict: order_number, order_date, items - список кортежей
+        (row_number, name, quantity, unit, code)
+    """
+    return {
+        **order_header(header_text),
+        'items': list(items_from_rows(rows, layout)),
+    }
+
+
+def read_order_data(ws):
+    """
+    Читает заказ из открытого листа в простые структуры
+    (их можно вернуть из пула процессов без моделей БД)
+    
+    Returns:
+        dict: order_number, order_date, items - список кортежей
+        (row_number, name, quantity, unit, code)
+    """
+    layout, top_rows = read_layout(ws)
+    return _read_order_data(ws, layout, top_rows)
+
+
+def _read_order_data(ws, layout, top_rows):
+    """Заголовок из верхних строк, товары одним проходом с первой строки товаров"""
+    return order_data_from_rows(
+        layout.title_text(top_rows),
+        ws.iter_rows(min_row=layout.data_start_row, max_col=layout.max_column, values_only=True),
+        layout
+    )
+
+
+def order_from_data(data, filename):
+    """
+    Создает заказ с товарами из результата read_order_data
+    
+    Returns:
+        Order: Объект заказа с товарами
+    """
+    order = Order(
+        order_number=data['order_number'],
+        order_date=data['order_date'],
+        filename=filename,
+        status='новый'
+    )
+    order.items = [
+        OrderItem(
+            row_number=row_number,
+            name=name,
             quantity=quantity,
-            unit=str(unit).strip(),
-            code=str(code).strip() if code else None,
+            unit=unit,
+            code=code,
             status='pending'
         )
-        items.append(item)
-        
-        row_num += 1
+        for row_number, name, quantity, unit, code in data['items']
+    ]
+    return order
+
+
+def build_order(ws, filename):
+    """
+    Собирает заказ с товарами из открытого листа
     
-    # Добавляем товары к заказу
-    order.items = items
+    Returns:
+        Order: Объект заказа с товарами
+    """
+    return order_from_data(read_order_data(ws), filename)
+
+
+def check_order_sheet(max_row, layout, title_text):
+    """
+    Проверяет структуру листа заказа
     
-    # Закрываем файл Excel
-    wb.close()
+    Args:
+        max_row: Последняя строка листа
+        layout: Раскладка листа
+        title_text: Текст заголовка заказа
     
-    return order
+    Returns:
+        str: Сообщение об ошибке или None, если лист корректен
+    """
+    # Проверяем есть ли данные
+    if max_row < layout.data_start_row:
+        return "Файл не содержит достаточно строк"
+    
+    # Проверяем наличие заголовка
+    if not title_text:
+        return f"Не найден заголовок заказа в строке {layout.title_row}"
+    
+    return None
 
 
-def validate_excel_file(filepath):
+def check_worksheet(ws):
     """
-    Проверяет корректность Excel файла
+    Проверяет структуру открытого листа заказа
     
     Returns:
-        tuple: (bool, str) - (валиден ли файл, сообщение об ошибке)
+        str: Сообщение об ошибке или None, если лист корректен
     """
-    wb = None
+    layout, top_rows = read_layout(ws)
+    return check_order_sheet(ws.max_row, layout, layout.title_text(top_rows))
+
+
+def parse_excel_file(source, filename):
+    """
+    Парсит Excel файл заказа из 1С
+    
+    Структура файла (стандартная раскладка; другие шаблоны определяются
+    по строке заголовков колонок, см. excel_layout):
+    - Строка 3: Заголовок с номером и датой заказа
+    - Строка 9: Заголовки колонок
+    - Строки 11+: Данные товаров
+      - Колонка B: № строки
+      - Колонка G: Наименование товара
+      - Колонка R: Код товара
+      - Колонка U: Количество
+      - Колонка X: Единица измерения
+    
+    Args:
+        source: Путь к файлу или файловый объект
+        filename: Имя файла для заказа
+    
+    Returns:
+        Order: Объект заказа с товарами
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        return build_order(wb.active, filename)
+    finally:
+        # Закрываем файл Excel
+        wb.close()
+
+
+def load_order_data(source):
+    """
+    Проверяет и читает файл заказа за одну загрузку книги
+    
+    Сначала пробует быстрый разбор XML листа (EXCEL_FAST_READER), при любой
+    неожиданности в файле читает его через openpyxl.
+    
+    Args:
+        source: Путь к файлу или файловый объект
+    
+    Returns:
+        tuple: (dict, None) или (None, str) - данные read_order_data или сообщение об ошибке
+    """
+    if Config.EXCEL_FAST_READER:
+        try:
+            return fast_read_order_data(source)
+        except Exception as e:
+            logger.debug(f"Быстрый разбор недоступен, читаем через openpyxl: {e}")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+    
+    return read_order_data_openpyxl(source)
+
+
+def read_order_data_openpyxl(source):
+    """Проверка и чтение файла заказа через openpyxl (результат как у load_order_data)"""
+    try:
+        with openpyxl_order_stream(source) as (data, error_message):
+            if data is not None:
+                data['items'] = list(data['items'])
+            return data, error_message
+    
+    except Exception as e:
+        return None, f"Ошибка чтения файла: {str(e)}"
+
+
+@contextmanager
+def openpyxl_order_stream(source):
+    """
+    Открывает файл заказа через openpyxl для потокового чтения товаров
+    
+    Yields:
+        tuple: (dict, None) или (None, str) - в dict order_number, order_date и items -
+        итератор кортежей (row_number, name, quantity, unit, code), читающий лист
+        по мере обхода; книга закрывается при выходе из блока
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
     try:
-        wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
         ws = wb.active
+        layout, top_rows = read_layout(ws)
+        title_text = layout.title_text(top_rows)
+        error_message = check_order_sheet(ws.max_row, layout, title_text)
+        if error_message:
+            yield None, error_message
+        else:
+            yield {**order_header(title_text), 'items': iter_item_rows(ws, layout)}, None
+    finally:
+        wb.close()
+
+
+@contextmanager
+def open_order_stream(source, fast_reader=None):
+    """
+    Открывает файл заказа для потокового чтения: товары не собираются в список,
+    а читаются из листа по мере обхода data['items']
+    
+    Быстрый разбор (по умолчанию - EXCEL_FAST_READER) пробуется первым; если файл
+    не подходит для него еще до первой строки товаров, читаем через openpyxl.
+    Неподходящая ячейка в середине товаров выбрасывает FastReaderUnsupported
+    из итератора - вызывающий код откатывает прочитанное и открывает файл
+    снова с fast_reader=False.
+    
+    Args:
+        source: Путь к файлу или файловый объект
+        fast_reader: Пробовать ли быстрый разбор
+    
+    Yields:
+        tuple: (dict, None) или (None, str) - данные заказа или сообщение об ошибке
+    """
+    if fast_reader is None:
+        fast_reader = Config.EXCEL_FAST_READER
+    
+    with ExitStack() as stack:
+        opened = None
+        if fast_reader:
+            try:
+                opened = stack.enter_context(fast_order_stream(source))
+            except Exception as e:
+                logger.debug(f"Быстрый разбор недоступен, читаем через openpyxl: {e}")
+                if hasattr(source, 'seek'):
+                    source.seek(0)
         
-        # Проверяем есть ли данные
-        if ws.max_row < 11:
-            return False, "Файл не содержит достаточно строк"
+        if opened is None:
+            try:
+                opened = stack.enter_context(openpyxl_order_stream(source))
+            except Exception as e:
+                opened = None, f"Ошибка чтения файла: {str(e)}"
         
-        # Проверяем наличие заголовка
-        header_cell = ws.cell(row=3, column=2)
-        if not header_cell.value:
-            return False, "Не найден заголовок заказа в строке 3"
+        yield opened
+
+
+def load_order(source, filename):
+    """
+    Проверяет и парсит файл заказа за одну загрузку книги
+    
+    Args:
+        source: Путь к файлу или файловый объект (например, буфер загрузки)
+        filename: Имя файла для заказа
+    
+    Returns:
+        tuple: (Order, None) или (None, str) - заказ или сообщение об ошибке
+    """
+    data, error_message = load_order_data(source)
+    if data is None:
+        return None, error_message
+    return order_from_data(data, filename), None
+
+
+def validate_excel_file(source):
+    """
+    Проверяет корректность Excel файла
+    
+    Returns:
+        tuple: (bool, str) - (валиден ли файл, сообщение об ошибке)
+    """
+    wb = None
+    try:
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        error_message = check_worksheet(wb.active)
+        if error_message:
+            return False, error_message
         
         return True, "OK"
     
@@ -178,4 +435,363 @@ def validate_excel_file(filepath):
             wb.close()
 
 
+# Быстрый разбор xlsx: XML листа читается потоково, из строк товаров берутся
+# только колонки раскладки, без объектов ячеек и стилей openpyxl
+SHEET_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_ROW_TAG = f'{{{SHEET_MAIN_NS}}}row'
+_CELL_TAG = f'{{{SHEET_MAIN_NS}}}c'
+_VALUE_TAG = f'{{{SHEET_MAIN_NS}}}v'
+_INLINE_STRING_TAG = f'{{{SHEET_MAIN_NS}}}is'
+_DIMENSION_TAG = f'{{{SHEET_MAIN_NS}}}dimension'
+_SHEET_DATA_TAG = f'{{{SHEET_MAIN_NS}}}sheetData'
+_STRING_ITEM_TAG = f'{{{SHEET_MAIN_NS}}}si'
+_TEXT_TAG = f'{{{SHEET_MAIN_NS}}}t'
+_RUN_TAG = f'{{{SHEET_MAIN_NS}}}r'
+
+# Дата в верхних строках: openpyxl вернул бы datetime - если ячейка окажется нужной, читаем через openpyxl
+_DATE_CELL = object()
+
+
+class FastReaderUnsupported(Exception):
+    """Файл не подходит для быстрого разбора - читаем через openpyxl"""
+
+
+def _text_content(element):
+    """Текст строки (t или r/t, без фонетики rPh) - как Text.content в openpyxl"""
+    plain = element.find(_TEXT_TAG)
+    snippets = [plain.text or ''] if plain is not None else []
+    for run in element.findall(_RUN_TAG):
+        text = run.find(_TEXT_TAG)
+        if text is not None:
+            snippets.append(text.text or '')
+    return ''.join(snippets)
+
+
+def _cast_number(value):
+    """Число из текста ячейки: int или float, как в openpyxl"""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+class _SharedStrings:
+    """
+    Общие строки книги, читаются лениво: XML разбирается только
+    до самого большого запрошенного индекса
+    """
+
+    def __init__(self, archive, path):
+        self._source = archive.open(path) if path else None
+        self._items = iterparse(self._source, events=('start', 'end')) if self._source else iter(())
+        self._root = None
+        self._strings = []
+
+    def __getitem__(self, index):
+        while index >= len(self._strings):
+            for event, element in self._items:
+                if self._root is None:
+                    self._root = element
+                if event == 'end' and element.tag == _STRING_ITEM_TAG:
+                    self._strings.append(_text_content(element).replace('x005F_', ''))
+                    # Разобранные элементы не копятся в дереве: в памяти только тексты
+                    self._root.remove(element)
+                    break
+            else:
+                raise FastReaderUnsupported(f'нет общей строки {index}')
+        return self._strings[index]
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+
+
+class _DateStyles:
+    """Индексы стилей ячеек с форматом даты (styles.xml читается при первом обращении)"""
+
+    def __init__(self, archive, path):
+        self._archive = archive
+        self._path = path
+        self._date_styles = None
+
+    def __contains__(self, style_id):
+        if self._date_styles is None:
+            self._date_styles = self._load()
+        return style_id in self._date_styles
+
+    def _load(self):
+        if not self._path:
+            return frozenset()
+        custom_formats = {}
+        cell_formats = []
+        with self._archive.open(self._path) as source:
+            in_cell_xfs = False
+            for event, element in iterparse(source, events=('start', 'end')):
+                tag = element.tag.rsplit('}', 1)[-1]
+                if tag == 'cellXfs':
+                    in_cell_xfs = event == 'start'
+                elif event == 'end' and tag == 'numFmt':
+                    custom_formats[int(element.get('numFmtId'))] = element.get('formatCode')
+                elif event == 'end' and tag == 'xf' and in_cell_xfs:
+                    cell_formats.append(int(element.get('numFmtId', 0)))
+        return frozenset(
+            style_id for style_id, format_id in enumerate(cell_formats)
+            if is_date_format(custom_formats.get(format_id) or BUILTIN_FORMATS.get(format_id))
+        )
+
+
+def _resolve_part(base_dir, target):
+    """Путь части пакета по Target из файла связей"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _locate_parts(archive):
+    """
+    Пути активного листа, общих строк и стилей по workbook.xml и его связям
+    
+    Returns:
+        tuple: (sheet_path, shared_strings_path, styles_path)
+    """
+    with archive.open('_rels/.rels') as source:
+        workbook_path = None
+        for _, element in iterparse(source):
+            if element.get('Type', '').endswith('/officeDocument'):
+                workbook_path = _resolve_part('', element.get('Target'))
+    if not workbook_path:
+        raise FastReaderUnsupported('не найден workbook.xml')
+    
+    base_dir = posixpath.dirname(workbook_path)
+    rels_path = posixpath.join(base_dir, '_rels', posixpath.basename(workbook_path) + '.rels')
+    targets = {}
+    shared_strings_path = styles_path = None
+    with archive.open(rels_path) as source:
+        for _, element in iterparse(source):
+            if element.tag != f'{{{PACKAGE_REL_NS}}}Relationship':
+                continue
+            rel_type = element.get('Type', '')
+            target = _resolve_part(base_dir, element.get('Target'))
+            targets[element.get('Id')] = (rel_type, target)
+            if rel_type.endswith('/sharedStrings'):
+                shared_strings_path = target
+            elif rel_type.endswith('/styles'):
+                styles_path = target
+    
+    sheets = []
+    active = None
+    with archive.open(workbook_path) as source:
+        for _, element in iterparse(source):
+            if element.tag == f'{{{SHEET_MAIN_NS}}}workbookView':
+                # Как openpyxl: активный лист - из первого представления, где он указан
+                if active is None and element.get('activeTab') is not None:
+                    active = int(element.get('activeTab'))
+            elif element.tag == f'{{{SHEET_MAIN_NS}}}sheet':
+                sheets.append((element.get('state', 'visible'), element.get(f'{{{REL_NS}}}id')))
+    
+    active = active or 0
+    if not 0 <= active < len(sheets):
+        raise FastReaderUnsupported('активный лист вне списка листов')
+    state, rel_id = sheets[active]
+    rel_type, sheet_path = targets.get(rel_id, ('', None))
+    if state != 'visible' or not rel_type.endswith('/worksheet'):
+        raise FastReaderUnsupported('активный лист не является обычным листом')
+    return sheet_path, shared_strings_path, styles_path
+
+
+def _cell_value(cell, shared_strings, date_styles):
+    """
+    Значение ячейки с теми же типами, что дает openpyxl в режиме data_only
+    (для числа в формате даты - _DATE_CELL)
+    """
+    data_type = cell.get('t', 'n')
+    if data_type == 'inlineStr':
+        inline = cell.find(_INLINE_STRING_TAG)
+        return _text_content(inline) if inline is not None else None
+    
+    value = cell.findtext(_VALUE_TAG) or None
+    if value is None:
+        return None
+    if data_type == 'n':
+        if int(cell.get('s', 0)) in date_styles:
+            return _DATE_CELL
+        return _cast_number(value)
+    if data_type == 's':
+        return shared_strings[int(value)]
+    if data_type == 'b':
+        return bool(int(value))
+    if data_type in ('str', 'e'):
+        return value
+    raise FastReaderUnsupported(f'тип ячейки {data_type}')
+
+
+def _iter_sheet_rows(source, max_row, shared_strings, date_styles, columns_for):
+    """
+    Потоковый проход по строкам листа
+    
+    Args:
+        columns_for: Функция номер строки -> множество нужных колонок (None - все колонки)
+    
+    Yields:
+        tuple: (номер строки, {колонка: значение})
+    """
+    sheet_data = None
+    for event, element in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == _SHEET_DATA_TAG:
+                sheet_data = element
+            continue
+        if element.tag == _SHEET_DATA_TAG:
+            # После sheetData строк нет, а объединения ячеек и прочее читать незачем
+            break
+        if element.tag != _ROW_TAG:
+            continue
+        row_index = element.get('r')
+        if row_index is None:
+            raise FastReaderUnsupported('строка без номера')
+        row_index = int(row_index)
+        if row_index > max_row:
+            # openpyxl тоже не читает строки за пределами размеров листа
+            break
+        
+        columns = columns_for(row_index)
+        values = {}
+        for cell in element.iter(_CELL_TAG):
+            coordinate = cell.get('r')
+            if coordinate is None:
+                raise FastReaderUnsupported('ячейка без адреса')
+            column = column_index_from_string(coordinate.rstrip('0123456789'))
+            if columns is None or column in columns:
+                values[column] = _cell_value(cell, shared_strings, date_styles)
+        # Прочитанная строка удаляется из дерева, чтобы память не росла с числом строк
+        if sheet_data is not None:
+            sheet_data.remove(element)
+        else:
+            element.clear()
+        yield row_index, values
+
+
+def _row_tuple(values, width):
+    """Словарь {колонка: значение} в кортеж колонок 1..width, как строка iter_rows"""
+    return tuple(values.get(column) for column in range(1, width + 1))
+
+
+def _item_row_tuple(values, layout):
+    """Строка товара в кортеж; дата в нужной колонке - в openpyxl"""
+    row = _row_tuple(values, layout.max_column)
+    if any(row_value(row, column) is _DATE_CELL for column in layout.item_columns):
+        raise FastReaderUnsupported('дата в колонке товара')
+    return row
+
+
+def _read_dimension_max_row(archive, sheet_path):
+    """Последняя строка листа по элементу dimension (None, если размеров нет)"""
+    with archive.open(sheet_path) as source:
+        for _, element in iterparse(source):
+            if element.tag == _DIMENSION_TAG:
+                return range_boundaries(element.get('ref'))[3]
+            if element.tag == _SHEET_DATA_TAG:
+                break
+    return None
+
+
+def fast_read_order_data(source):
+    """
+    Быстрый разбор файла заказа без openpyxl
+    
+    Читает из zip архива XML активного листа одним потоковым проходом, общие строки
+    разбираются лениво. Результат и ошибки проверки совпадают с read_order_data_openpyxl.
+    
+    Args:
+        source: Путь к файлу или файловый объект
+    
+    Returns:
+        tuple: (dict, None) или (None, str) - данные заказа или сообщение об ошибке
+    
+    Raises:
+        FastReaderUnsupported: Файл устроен не так, как ожидается (даты, листы диаграмм и т.п.)
+    """
+    with fast_order_stream(source) as (data, error_message):
+        if data is not None:
+            data['items'] = list(data['items'])
+        return data, error_message
+
+
+@contextmanager
+def fast_order_stream(source):
+    """
+    Быстрый разбор с потоковым чтением товаров (см. open_order_stream)
+    
+    Верхние строки читаются целиком для определения раскладки и проверки
+    заголовка, строки товаров после них - только по колонкам раскладки
+    и только по мере обхода data['items'].
+    
+    Yields:
+        tuple: (dict, None) или (None, str) - данные заказа или сообщение об ошибке
+    
+    Raises:
+        FastReaderUnsupported: Файл устроен не так, как ожидается (в том числе
+            при обходе товаров)
+    """
+    with zipfile.ZipFile(source) as archive:
+        sheet_path, shared_strings_path, styles_path = _locate_parts(archive)
+        
+        max_row = _read_dimension_max_row(archive, sheet_path)
+        if max_row is None:
+            raise FastReaderUnsupported('нет размеров листа')
+        
+        layout = None
+        
+        def columns_for(row_index):
+            return None if layout is None else layout.item_columns
+        
+        shared_strings = _SharedStrings(archive, shared_strings_path)
+        date_styles = _DateStyles(archive, styles_path)
+        try:
+            with archive.open(sheet_path) as sheet:
+                sheet_rows = _iter_sheet_rows(sheet, max_row, shared_strings, date_styles, columns_for)
+                
+                # Верхние строки; первая строка после них уже прочитана целиком
+                top_rows = []
+                next_row = None
+                for row_index, values in sheet_rows:
+                    if row_index > LAYOUT_SCAN_ROWS:
+                        next_row = (row_index, values)
+                        break
+                    top_rows.append((row_index, values))
+                layout, rows = _resolve_top_rows(top_rows)
+                
+                title_text = layout.title_text([(index, _row_tuple(values, max(values, default=0)))
+                                                for index, values in top_rows])
+                if title_text is _DATE_CELL:
+                    raise FastReaderUnsupported('дата в заголовке заказа')
+                error_message = check_order_sheet(max_row, layout, title_text)
+                if error_message:
+                    yield None, error_message
+                    return
+                
+                def item_rows():
+                    yield from rows
+                    remaining = sheet_rows if next_row is None else chain([next_row], sheet_rows)
+                    for row_index, values in remaining:
+                        if row_index >= layout.data_start_row and values:
+                            yield _item_row_tuple(values, layout)
+                
+                yield {**order_header(title_text), 'items': items_from_rows(item_rows(), layout)}, None
+        finally:
+            shared_strings.close()
+
 
+def _resolve_top_rows(top_rows):
+    """Раскладка по верхним строкам и уже прочитанные среди них строки товаров"""
+    layout = resolve_layout([
+        (row_index, _row_tuple(values, max(values, default=0))) for row_index, values in top_rows
+    ])
+    rows = [
+        _item_row_tuple(values, layout)
+        for row_index, values in top_rows
+        if row_index >= layout.data_start_row and values
+    ]
+    return layout, rows
@@ -0,0 +1,133 @@
+"""
+Скомпилированный фильтр слов
+Все фильтры собираются в одно регулярное выражение по тексту в casefold:
+проверка товара - один проход по названию вместо цикла по всем словам.
+Фильтр кэшируется в процессе и пересобирается только при смене версии:
+add_filter/delete_filter вызывают bump_filter_version, которая увеличивает
+счетчик процесса и перезаписывает файл-метку (его видят остальные воркеры).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+from config import Config
+from models import db, FilterWord
+
+logger = logging.getLogger(__name__)
+
+_matcher = None
+_matcher_version = None
+_local_version = 0
+_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'rebuilds': 0,
+}
+
+
+class FilterMatcher:
+    """Проверка названий товаров на вхождение фильтруемых слов"""
+
+    def __init__(self, words):
+        # Исходное написание слова по его casefold (для ответа, какое слово сработало)
+        self.words = {}
+        for word in words:
+            word = word.strip()
+            if word:
+                self.words.setdefault(word.casefold(), word)
+        
+        # Отпечаток набора слов: по нему видно, с какими фильтрами размечены товары каталога
+        self.signature = hashlib.sha1('\n'.join(sorted(self.words)).encode('utf-8')).hexdigest()
+        
+        # Длинные слова первыми: из "Табак" и "Табак для кальяна" в одной позиции сработает более точное
+        alternatives = sorted(self.words, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(map(re.escape, alternatives))) if alternatives else None
+
+    def __len__(self):
+        return len(self.words)
+
+    def match(self, text):
+        """
+        Первое фильтруемое слово в тексте
+        
+        Returns:
+            str: Слово фильтра, как оно записано в настройках, или None
+        """
+        if self._pattern is None or not text:
+            return None
+        found = self._pattern.search(text.casefold())
+        return self.words[found.group(0)] if found else None
+
+    def decision(self, text):
+        """
+        Решение фильтра для товара каталога (колонки products, см. item_filters)
+        
+        Returns:
+            dict: should_announce, filter_match, filters_signature
+        """
+        filter_match = self.match(text)
+        return {
+            'should_announce': filter_match is None,
+            'filter_match': filter_match,
+            'filters_signature': self.signature,
+        }
+
+
+def _read_stamp():
+    """Содержимое файла-метки (пустая строка, если фильтры еще не менялись)"""
+    try:
+        with open(Config.FILTER_WORDS_STAMP) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def bump_filter_version():
+    """Отмечает изменение фильтров (вызывать после commit)"""
+    global _local_version
+    with _lock:
+        _local_version += 1
+    
+    try:
+        os.makedirs(os.path.dirname(Config.FILTER_WORDS_STAMP) or '.', exist_ok=True)
+        tmp_path = f'{Config.FILTER_WORDS_STAMP}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f'{time.time_ns()}-{os.getpid()}')
+        os.replace(tmp_path, Config.FILTER_WORDS_STAMP)
+    except OSError as e:
+        # Этот процесс пересоберет фильтр по счетчику, остальные - после перезапуска
+        logger.warning(f"Не удалось обновить метку фильтров {Config.FILTER_WORDS_STAMP}: {e}")
+
+
+def get_filter_matcher():
+    """
+    Скомпилированный фильтр текущих слов (пересобирается при смене версии)
+    
+    Returns:
+        FilterMatcher
+    """
+    global _matcher, _matcher_version
+    # Версию берем до чтения слов: изменение во время сборки пересоберет фильтр еще раз
+    version = (_local_version, _read_stamp())
+    with _lock:
+        if _matcher is not None and _matcher_version == version:
+            _stats['hits'] += 1
+            return _matcher
+    
+    started = time.perf_counter()
+    words = [word for (word,) in db.session.query(FilterWord.word).order_by(FilterWord.id)]
+    matcher = FilterMatcher(words)
+    with _lock:
+        _matcher, _matcher_version = matcher, version
+        _stats['rebuilds'] += 1
+    logger.info(f"Фильтр слов собран: {len(matcher)} слов за {(time.perf_counter() - started) * 1000:.1f} мс")
+    return matcher
+
+
+def get_filter_stats():
+    """Размер текущего фильтра и счетчики пересборок этого процесса"""
+    with _lock:
+        return {'words': len(_matcher) if _matcher is not None else None, **_stats}
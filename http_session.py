@@ -0,0 +1,120 @@
+"""
+Общая HTTP сессия для Yandex Cloud
+Пул keep-alive соединений (без нового TCP+TLS рукопожатия на каждый синтез),
+раздельные таймауты подключения и чтения, ограниченные повторы с джиттером
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_stats = {
+    'retries': 0,
+}
+_stats_lock = threading.Lock()
+
+
+class CountingRetry(Retry):
+    """Retry, который считает каждую повторную попытку"""
+
+    def increment(self, *args, **kwargs):
+        # Если попытки исчерпаны, super().increment бросит исключение и повтора не будет
+        new_retry = super().increment(*args, **kwargs)
+        with _stats_lock:
+            _stats['retries'] += 1
+        return new_retry
+
+
+def build_retry():
+    """Политика повторов: 429/5xx и сетевые ошибки, экспоненциальная пауза с джиттером"""
+    retry_kwargs = dict(
+        total=Config.YANDEX_HTTP_RETRIES,
+        connect=Config.YANDEX_HTTP_RETRIES,
+        read=Config.YANDEX_HTTP_RETRIES,
+        status=Config.YANDEX_HTTP_RETRIES,
+        backoff_factor=Config.YANDEX_HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        # Синтез и выдача IAM токена идемпотентны, поэтому повторяем и POST
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True,
+        # После исчерпания попыток отдаем последний ответ, чтобы вызывающий код залогировал ошибку
+        raise_on_status=False,
+    )
+    try:
+        return CountingRetry(backoff_jitter=Config.YANDEX_HTTP_BACKOFF, **retry_kwargs)
+    except TypeError:
+        # urllib3 < 2.0 не поддерживает backoff_jitter
+        return CountingRetry(**retry_kwargs)
+
+
+def get_session():
+    """
+    Сессия процесса с пулом соединений
+
+    Создается заново после fork воркера gunicorn: сокеты родителя не переиспользуются.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=Config.YANDEX_HTTP_POOL_SIZE,
+                pool_maxsize=Config.YANDEX_HTTP_POOL_SIZE,
+                max_retries=build_retry(),
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def get_timeout():
+    """Таймауты (подключение, чтение) в секундах"""
+    return (Config.YANDEX_HTTP_CONNECT_TIMEOUT, Config.YANDEX_HTTP_READ_TIMEOUT)
+
+
+def get_http_stats():
+    """
+    Статистика сессии: повторы и переиспользование соединений
+
+    Returns:
+        dict: requests, connections_opened, connections_reused, retries
+    """
+    requests_count = 0
+    connections_opened = 0
+
+    with _session_lock:
+        session = _session if _session_pid == os.getpid() else None
+
+    if session is not None:
+        adapter = session.get_adapter('https://')
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            connections_opened += pool.num_connections
+
+    with _stats_lock:
+        retries = _stats['retries']
+
+    return {
+        'requests': requests_count,
+        'connections_opened': connections_opened,
+        'connections_reused': max(requests_count - connections_opened, 0),
+        'retries': retries,
+        'pool_size': Config.YANDEX_HTTP_POOL_SIZE,
+    }
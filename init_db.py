@@ -1,14 +1,14 @@
 """
 Скрипт для инициализации базы данных
 """
-from app import app, db
+from app import app, db, init_database as init_app_database
 from models import Order, OrderItem, FilterWord
 
 def init_database():
     """Создает таблицы в базе данных"""
+    # Создаем все таблицы (и обновляем схему существующей БД)
+    init_app_database()
     with app.app_context():
-        # Создаем все таблицы
-        db.create_all()
         print("✓ Таблицы базы данных созданы успешно")
         
         # Добавляем примеры фильтров (опционально)
@@ -0,0 +1,128 @@
+"""
+Разметка товаров фильтром слов
+Решение "озвучивать или пропустить" и сработавшее слово хранятся в товаре
+каталога (products.should_announce, filter_match): наименование проверяется
+один раз на товар, а не в каждом заказе. Новые товары каталога размечаются
+при вставке (product_catalog.resolve_products), страница сборки только читает
+колонки. Товар помнит отпечаток фильтров, с которыми принято решение
+(products.filters_signature).
+Решение относится к наименованию товара каталога: товар заказа, записанный
+в файле иначе (name_override), проверяется по своему наименованию при чтении
+(OrderItem.filter_match) - в БД такие решения не хранятся.
+
+После добавления или удаления фильтра фоновый проход переразмечает товары
+каталога пачками (ищет их по индексу отпечатка) и пишет только изменившиеся
+решения. Товары заказа, открытого раньше, чем до них дошел проход,
+переразмечаются при открытии.
+"""
+import logging
+import threading
+
+from sqlalchemy import bindparam, or_, select, update
+
+from config import Config
+from db_writer import run_write
+from filter_matcher import get_filter_matcher
+from models import db, OrderItem, Product
+from product_catalog import has_unlinked_items, link_order_items
+
+logger = logging.getLogger(__name__)
+
+_refresh_lock = threading.Lock()
+
+
+def _is_stale(matcher):
+    """Условие: товар каталога размечен другими фильтрами (диапазоны по индексу filters_signature)"""
+    # != индекс не использует: SQLite просмотрел бы весь каталог, даже если все товары размечены
+    signature = Product.filters_signature
+    return or_(signature.is_(None), signature < matcher.signature, signature > matcher.signature)
+
+
+def _refresh_products(product_ids, matcher):
+    """Переразмечает товары каталога (без commit); число изменившихся решений"""
+    products = db.session.execute(
+        select(Product.id, Product.name, Product.should_announce, Product.filter_match)
+        .where(Product.id.in_(product_ids))
+    ).all()
+    changes = []
+    for product_id, name, should_announce, filter_match in products:
+        decision = matcher.decision(name)
+        if (should_announce, filter_match) != (decision['should_announce'], decision['filter_match']):
+            changes.append({'product_id': product_id, **decision})
+
+    table = Product.__table__
+    if changes:
+        db.session.execute(update(table).where(table.c.id == bindparam('product_id')), changes)
+    db.session.execute(
+        update(table).where(table.c.id.in_(product_ids)).values(filters_signature=matcher.signature)
+    )
+    return len(changes)
+
+
+def ensure_order_filters(order):
+    """
+    Привязывает товары заказа к каталогу и переразмечает их товары каталога,
+    если они размечены другими фильтрами (фоновый проход до них еще не дошел)
+
+    Транзакция записи открывается, только если есть что менять: страница сборки
+    и манифест озвучки обычно только читают.
+
+    Args:
+        order: Order; после изменений его товары перечитываются из БД
+    """
+    linked = link_order_items(order.id) if has_unlinked_items(order.id) else 0
+    matcher = get_filter_matcher()
+    product_ids = [
+        product_id for (product_id,) in
+        db.session.query(Product.id).join(OrderItem, OrderItem.product_id == Product.id)
+        .filter(OrderItem.order_id == order.id, _is_stale(matcher))
+        .distinct()
+    ]
+    changed = run_write(_refresh_products, product_ids, matcher) if product_ids else 0
+    if linked or product_ids:
+        db.session.expire(order, ['items'])
+        logger.info(
+            f"Заказ {order.order_number}: привязано к каталогу товаров {linked}, "
+            f"переразмечено товаров каталога {len(product_ids)}, изменилось решений {changed}"
+        )
+
+
+def has_stale_products():
+    """Есть ли товары каталога, размеченные другими фильтрами"""
+    matcher = get_filter_matcher()
+    return db.session.query(Product.id).filter(_is_stale(matcher)).first() is not None
+
+
+def refresh_products(batch_size=None):
+    """
+    Переразмечает товары каталога, размеченные другими фильтрами
+
+    Args:
+        batch_size: Товаров в одной транзакции (по умолчанию FILTER_REFRESH_BATCH_SIZE)
+
+    Returns:
+        tuple: (переразмечено товаров, изменилось решений)
+    """
+    batch_size = batch_size or Config.FILTER_REFRESH_BATCH_SIZE
+    products_count = changed = 0
+    with _refresh_lock:
+        while True:
+            # Фильтры могли смениться еще раз: каждая пачка размечается актуальными
+            matcher = get_filter_matcher()
+            product_ids = [
+                product_id for (product_id,) in
+                # Без order_by: пачка ищется по индексу, размеченные товары в следующую не попадут
+                db.session.query(Product.id).filter(_is_stale(matcher)).limit(batch_size)
+            ]
+            if not product_ids:
+                break
+
+            changed += run_write(_refresh_products, product_ids, matcher)
+            products_count += len(product_ids)
+
+            if len(product_ids) < batch_size:
+                break
+
+    if products_count:
+        logger.info(f"Фильтр слов: переразмечено товаров каталога {products_count}, изменилось решений {changed}")
+    return products_count, changed
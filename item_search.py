@@ -0,0 +1,201 @@
+"""
+Полнотекстовый поиск товаров заказов по наименованию и коду
+В SQLite индекс - виртуальная таблица FTS5 order_items_fts (rowid = order_items.id),
+ее синхронизируют триггеры на вставку, удаление и изменение order_items: новые,
+удаленные и перенесенные в архив товары попадают в индекс и уходят из него
+в той же транзакции. Индексируется итоговое наименование: из товара, а если
+оно совпадает с каталогом (NULL) - из products (наименование товара каталога
+не меняется, поэтому удаление из индекса видит то же значение, что вставка).
+
+Токенизатор unicode61 приводит регистр для кириллицы; ё заменяется на е
+при индексации и в запросе (сам токенизатор ее не сводит). Каждое слово
+запроса ищется по началу (prefix-индекс на 2 и 3 символа), результаты
+ранжируются bm25: совпадение в коде весит больше, чем в наименовании.
+bm25 считается для всех совпадений, поэтому для широких запросов (больше
+RANKED_MATCHES_MAX совпадений) результаты идут от новых товаров к старым
+в порядке индекса, без сортировки. Общее число совпадений считается
+по одному индексу, без соединения с order_items.
+
+Для других СУБД поиск идет через LIKE по всем словам запроса.
+"""
+import logging
+import re
+
+from sqlalchemy import column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import contains_eager
+
+from db_writer import WRITE_OPTION
+from models import db, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'order_items_fts'
+
+# Веса колонок для bm25 (name, code)
+NAME_WEIGHT = 1.0
+CODE_WEIGHT = 4.0
+
+# Слов запроса не больше
+MAX_QUERY_TOKENS = 8
+
+# При большем числе совпадений результаты не ранжируются (bm25 25 мс на 4 тыс. совпадений)
+RANKED_MATCHES_MAX = 5000
+
+_fts_table = table(FTS_TABLE, column('rowid'))
+_fts_enabled = False
+
+
+def _normalized(value):
+    """SQL-выражение текста для индекса: ё -> е"""
+    return f"replace(replace({value}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# Таблица без собственной копии текста (content=''): индекс хранит только токены,
+# удаление - командой 'delete' с теми же значениями, что были вставлены
+CREATE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, code, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+def _item_name(row):
+    """SQL-выражение итогового наименования строки order_items"""
+    return f"coalesce({row}.name, (SELECT name FROM products WHERE products.id = {row}.product_id))"
+
+
+FILL_FTS_SQL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, code) "
+    f"SELECT id, {_normalized(_item_name('order_items'))}, {_normalized('code')} FROM order_items"
+)
+_INDEX_NEW = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, code) "
+    f"VALUES (new.id, {_normalized(_item_name('new'))}, {_normalized('new.code')});"
+)
+_INDEX_DELETE_OLD = (
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, code) "
+    f"VALUES ('delete', old.id, {_normalized(_item_name('old'))}, {_normalized('old.code')});"
+)
+TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"AFTER INSERT ON order_items BEGIN {_INDEX_NEW} END",
+    f'{FTS_TABLE}_delete': f"AFTER DELETE ON order_items BEGIN {_INDEX_DELETE_OLD} END",
+    f'{FTS_TABLE}_update': (
+        f"AFTER UPDATE OF name, code, product_id ON order_items BEGIN {_INDEX_DELETE_OLD} {_INDEX_NEW} END"
+    ),
+}
+
+
+def _pending_index_changes(connection):
+    """
+    Чего не хватает поиску в БД
+
+    Returns:
+        tuple: (нужно создать индекс FTS5, имена триггеров, которых нет или текст которых устарел)
+    """
+    existing = dict(connection.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE (type = 'table' AND name = ?) OR type = 'trigger'", (FTS_TABLE,)
+    ).all())
+    triggers = [
+        name for name, definition in TRIGGERS.items()
+        if existing.get(name) != f'CREATE TRIGGER {name} {definition}'
+    ]
+    return FTS_TABLE not in existing, triggers
+
+
+def create_search_index(engine):
+    """
+    Создает индекс FTS5 (при первом создании индексирует все товары)
+    и триггеры; триггер пересоздается, если его текст изменился вместе с моделью товара
+
+    Транзакция записи открывается, только если индекса или триггеров не хватает.
+
+    Returns:
+        bool: Полнотекстовый поиск доступен (False для других СУБД или SQLite без FTS5)
+    """
+    global _fts_enabled
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    try:
+        with engine.connect() as connection:
+            create_fts, triggers = _pending_index_changes(connection)
+        if create_fts or triggers:
+            with engine.connect() as connection:
+                connection = connection.execution_options(**{WRITE_OPTION: True})
+                with connection.begin():
+                    # Другой воркер мог успеть раньше: проверяем еще раз под блокировкой записи
+                    create_fts, triggers = _pending_index_changes(connection)
+                    if create_fts:
+                        connection.exec_driver_sql(CREATE_FTS_SQL)
+                        indexed = connection.exec_driver_sql(FILL_FTS_SQL).rowcount
+                        logger.info(f"Создан полнотекстовый индекс товаров: {indexed} строк")
+                    for name in triggers:
+                        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+                        connection.exec_driver_sql(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+    except OperationalError as e:
+        logger.warning(f"Полнотекстовый поиск недоступен ({e}), поиск товаров через LIKE")
+        _fts_enabled = False
+        return False
+
+    _fts_enabled = True
+    return True
+
+
+def search_tokens(query):
+    """Слова запроса в нижнем регистре, ё -> е (как их режет токенизатор unicode61)"""
+    normalized = query.casefold().replace('ё', 'е')
+    return re.findall(r'[^\W_]+', normalized)[:MAX_QUERY_TOKENS]
+
+
+def _like_pattern(token):
+    """Слово запроса для LIKE без спецсимволов % и _"""
+    return token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_items(query, page=None, per_page=None, max_per_page=None):
+    """
+    Товары, в наименовании или коде которых есть все слова запроса (по началу слова)
+
+    Args:
+        query: Текст запроса
+        page, per_page, max_per_page: Как в db.paginate (по умолчанию из параметров запроса)
+
+    Returns:
+        Pagination: Страница OrderItem с загруженным заказом или None для запроса без слов
+    """
+    tokens = search_tokens(query or '')
+    if not tokens:
+        return None
+
+    statement = select(OrderItem).join(OrderItem.order).options(contains_eager(OrderItem.order))
+    if not _fts_enabled:
+        for token in tokens:
+            pattern = f'%{_like_pattern(token)}%'
+            statement = statement.where(or_(
+                OrderItem.name.ilike(pattern, escape='\\'),
+                OrderItem.code.ilike(pattern, escape='\\')
+            ))
+        statement = statement.order_by(Order.created_at.desc(), OrderItem.row_number)
+        return db.paginate(statement, page=page, per_page=per_page, max_per_page=max_per_page, error_out=False)
+
+    # Слова в кавычках: операторы FTS5 (AND, NEAR, -...) из запроса не разбираются
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    matches = db.session.execute(
+        text(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match'), {'match': match}
+    ).scalar()
+
+    statement = (
+        statement
+        .join(_fts_table, _fts_table.c.rowid == OrderItem.id)
+        .where(text(f'{FTS_TABLE} MATCH :match').bindparams(match=match))
+    )
+    if matches <= RANKED_MATCHES_MAX:
+        statement = statement.order_by(
+            text(f'bm25({FTS_TABLE}, {NAME_WEIGHT}, {CODE_WEIGHT})'), Order.created_at.desc()
+        )
+    else:
+        statement = statement.order_by(_fts_table.c.rowid.desc())
+
+    pagination = db.paginate(statement, page=page, per_page=per_page, max_per_page=max_per_page,
+                             error_out=False, count=False)
+    # У каждого товара есть заказ: число совпадений индекса и есть число результатов
+    pagination.total = matches
+    return pagination
@@ -0,0 +1,105 @@
+"""
+Статусы товаров при сборке
+Страница сборки копит изменения статусов и отправляет их пачкой: все изменения
+пачки применяются одной транзакцией. Каждое изменение несет client_seq
+(монотонный номер, время в мс у клиента); изменение применяется, только если
+его номер больше уже сохраненного, поэтому повторная отправка той же пачки
+(обрыв Wi-Fi после записи) и запоздавшие изменения ничего не портят.
+
+Номера сравниваются с номерами других устройств, поэтому страница поднимает свой
+счетчик не ниже наибольшего номера из ответа сервера (часы устройств могут
+расходиться). Изменению без client_seq (прежние клиенты одиночного API) номер
+назначает сервер: на единицу больше сохраненного у товара, время сервера
+с часами клиентов не сравнивается.
+"""
+from db_writer import run_write
+from models import db, OrderItem, ITEM_STATUSES
+
+
+def parse_status_changes(changes):
+    """
+    Проверяет изменения и оставляет по каждому товару самое позднее
+    
+    Args:
+        changes: Список словарей item_id, status, client_seq (без client_seq - номер назначит сервер)
+    
+    Returns:
+        dict: {item_id: (status, client_seq или None)}
+    
+    Raises:
+        ValueError: Некорректное изменение
+    """
+    if not isinstance(changes, list):
+        raise ValueError('Ожидается список изменений')
+    
+    latest = {}
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError('Некорректное изменение статуса')
+        status = change.get('status')
+        if status not in ITEM_STATUSES:
+            raise ValueError(f'Недопустимый статус: {status}')
+        try:
+            item_id = int(change['item_id'])
+            seq = None if change.get('client_seq') is None else int(change['client_seq'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Некорректный или отсутствующий item_id или client_seq')
+        if seq is not None and seq <= 0:
+            raise ValueError('client_seq должен быть положительным')
+        
+        # Изменение без номера новее всех изменений товара, пришедших до него
+        if item_id not in latest or seq is None or (latest[item_id][1] is not None and seq > latest[item_id][1]):
+            latest[item_id] = (status, seq)
+    return latest
+
+
+def _next_seq(item, seq):
+    """Номер изменения: client_seq или, если его нет, следующий после сохраненного у товара"""
+    return (item.status_seq or 0) + 1 if seq is None else seq
+
+
+def apply_status_changes(order_id, changes):
+    """
+    Применяет пачку изменений статусов товаров заказа одной транзакцией
+    
+    Args:
+        order_id: ID заказа
+        changes: Список словарей item_id, status, client_seq
+    
+    Returns:
+        dict: applied, ignored (повторы и устаревшие), unknown (товары не из этого заказа)
+        и items - итоговые статусы всех товаров заказа {id: {status, seq}}
+    
+    Raises:
+        ValueError: Некорректное изменение (пачка не применяется)
+    """
+    latest = parse_status_changes(changes)
+    
+    def apply():
+        items = OrderItem.query.filter(OrderItem.order_id == order_id, OrderItem.id.in_(latest)).all()
+        applied = 0
+        for item in items:
+            status, seq = latest[item.id]
+            seq = _next_seq(item, seq)
+            if seq > (item.status_seq or 0):
+                item.status = status
+                item.status_seq = seq
+                applied += 1
+        return applied, len(items)
+    
+    applied, found = run_write(apply) if latest else (0, 0)
+    return {
+        'applied': applied,
+        'ignored': len(changes) - applied - (len(latest) - found),
+        'unknown': len(latest) - found,
+        'items': get_item_states(order_id),
+    }
+
+
+def get_item_states(order_id):
+    """Статусы товаров заказа: {id: {status, seq}}"""
+    return {
+        str(item_id): {'status': status, 'seq': seq or 0}
+        for item_id, status, seq in
+        db.session.query(OrderItem.id, OrderItem.status, OrderItem.status_seq).filter_by(order_id=order_id)
+    }
@@ -1,19 +1,32 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.schema import CreateTable
 
 db = SQLAlchemy()
 
+# Статусы заказа (фильтр списка заказов)
+ORDER_STATUSES = ('новый', 'собран', 'в_архив')
+# Статусы товара при сборке
+ITEM_STATUSES = ('pending', 'completed', 'skipped')
+
 
 class Order(db.Model):
     """Модель заказа"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Список заказов: фильтр по статусу с сортировкой по дате загрузки
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(100), nullable=False, unique=True)
     order_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='новый')  # новый, собран, в_архив
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    content_hash = db.Column(db.String(64), index=True)  # sha256 исходного файла
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
@@ -21,8 +34,16 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.order_number}>'
     
-    def to_dict(self):
-        """Преобразование в словарь для JSON"""
+    def to_dict(self, items_count=None):
+        """
+        Преобразование в словарь для JSON
+        
+        Args:
+            items_count: Число товаров, если уже известно (см. count_items);
+                иначе считается запросом COUNT без загрузки товаров
+        """
+        if items_count is None:
+            items_count = count_items([self.id]).get(self.id, 0)
         return {
             'id': self.id,
             'order_number': self.order_number,
@@ -30,22 +51,92 @@ class Order(db.Model):
             'status': self.status,
             'filename': self.filename,
             'created_at': self.created_at.isoformat(),
-            'items_count': len(self.items)
+            'items_count': items_count
         }
 
 
-class OrderItem(db.Model):
+def _catalog_value(override, product_column, product_id):
+    """SQL-выражение: значение из файла заказа, а если оно совпадает с каталогом (NULL) - из товара каталога"""
+    return func.coalesce(
+        override,
+        select(product_column).where(Product.id == product_id).correlate_except(Product).scalar_subquery()
+    )
+
+
+class CatalogItemMixin:
+    """
+    Наименование и единица товара заказа
+    
+    В строке товара хранятся только отличия от товара каталога (колонки name и unit,
+    NULL - как в каталоге, см. product_catalog.item_overrides). Атрибуты name и unit
+    отдают итоговое значение, в запросах - coalesce с колонкой товара каталога.
+    """
+    
+    @hybrid_property
+    def name(self):
+        if self.name_override is not None or self.product is None:
+            return self.name_override
+        return self.product.name
+    
+    @name.setter
+    def name(self, value):
+        self.name_override = value
+    
+    @name.expression
+    def name(cls):
+        return _catalog_value(cls.name_override, Product.name, cls.product_id)
+    
+    @hybrid_property
+    def unit(self):
+        if self.unit_override is not None or self.product is None:
+            return self.unit_override
+        return self.product.unit
+    
+    @unit.setter
+    def unit(self, value):
+        self.unit_override = value
+    
+    @unit.expression
+    def unit(cls):
+        return _catalog_value(cls.unit_override, Product.unit, cls.product_id)
+    
+    def filter_match(self, matcher):
+        """
+        Сработавшее слово фильтра для товара заказа (None - озвучивать)
+        
+        Решение товара каталога принято для его наименования; наименование,
+        записанное в файле иначе, проверяется фильтром отдельно.
+        
+        Args:
+            matcher: FilterMatcher текущих фильтров
+        
+        Returns:
+            str: Слово фильтра или None
+        """
+        if self.name_override is None and self.product is not None:
+            return self.product.filter_match
+        return matcher.match(self.name)
+
+
+class OrderItem(CatalogItemMixin, db.Model):
     """Модель товара в заказе"""
     __tablename__ = 'order_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
     row_number = db.Column(db.Integer, nullable=False)  # Номер строки в заказе
-    name = db.Column(db.String(500), nullable=False)
+    # Наименование и единица из файла заказа, если отличаются от каталога (см. CatalogItemMixin)
+    name_override = db.Column('name', db.String(500))
     quantity = db.Column(db.Integer, nullable=False)
-    unit = db.Column(db.String(50), default='шт')
+    unit_override = db.Column('unit', db.String(50))
     code = db.Column(db.String(100))  # Код товара (если есть)
+    # Товар каталога (см. product_catalog): от него наименование, единица и решение фильтра слов
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), index=True)
     status = db.Column(db.String(50), nullable=False, default='pending')  # pending, completed, skipped
+    # client_seq последнего примененного изменения статуса (повторы и устаревшие изменения отбрасываются)
+    status_seq = db.Column(db.BigInteger, default=0)
+    
+    product = db.relationship('Product', lazy='joined')
     
     def __repr__(self):
         return f'<OrderItem {self.name} x{self.quantity}>'
@@ -60,10 +151,141 @@ class OrderItem(db.Model):
             'quantity': self.quantity,
             'unit': self.unit,
             'code': self.code,
+            'product_id': self.product_id,
             'status': self.status
         }
 
 
+def count_items(order_ids):
+    """
+    Число товаров заказов одним сгруппированным запросом (без загрузки строк товаров)
+    
+    Args:
+        order_ids: id заказов
+    
+    Returns:
+        dict: {id заказа: число товаров}; заказов без товаров в словаре нет
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return {}
+    return dict(
+        db.session.query(OrderItem.order_id, func.count(OrderItem.id))
+        .filter(OrderItem.order_id.in_(order_ids))
+        .group_by(OrderItem.order_id)
+    )
+
+
+class ArchivedOrder(db.Model):
+    """
+    Заказ в архиве: перенесен из orders после статуса в_архив (см. order_archive),
+    только для просмотра, поиска и восстановления
+    """
+    __tablename__ = 'archived_orders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    original_id = db.Column(db.Integer, nullable=False)  # id в orders до переноса
+    order_number = db.Column(db.String(100), nullable=False, index=True)
+    order_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    items_count = db.Column(db.Integer, nullable=False, default=0)  # заказ в архиве не меняется
+    
+    items = db.relationship('ArchivedOrderItem', backref='order', lazy=True,
+                            order_by='ArchivedOrderItem.row_number')
+    
+    def __repr__(self):
+        return f'<ArchivedOrder {self.order_number}>'
+    
+    def to_dict(self):
+        """Преобразование в словарь для JSON"""
+        return {
+            'id': self.id,
+            'original_id': self.original_id,
+            'order_number': self.order_number,
+            'order_date': self.order_date.isoformat() if self.order_date else None,
+            'status': self.status,
+            'filename': self.filename,
+            'created_at': self.created_at.isoformat(),
+            'archived_at': self.archived_at.isoformat(),
+            'items_count': self.items_count
+        }
+
+
+class ArchivedOrderItem(CatalogItemMixin, db.Model):
+    """Товар заказа в архиве"""
+    __tablename__ = 'archived_order_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    archived_order_id = db.Column(db.Integer, db.ForeignKey('archived_orders.id'), nullable=False, index=True)
+    row_number = db.Column(db.Integer, nullable=False)
+    name_override = db.Column('name', db.String(500))
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_override = db.Column('unit', db.String(50))
+    code = db.Column(db.String(100))
+    product_id = db.Column(db.Integer)
+    status = db.Column(db.String(50), nullable=False)
+    
+    product = db.relationship(
+        'Product', lazy='joined', primaryjoin='foreign(ArchivedOrderItem.product_id) == Product.id'
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedOrderItem {self.name} x{self.quantity}>'
+    
+    def to_dict(self):
+        """Преобразование в словарь для JSON"""
+        return {
+            'id': self.id,
+            'archived_order_id': self.archived_order_id,
+            'row_number': self.row_number,
+            'name': self.name,
+            'quantity': self.quantity,
+            'unit': self.unit,
+            'code': self.code,
+            'status': self.status
+        }
+
+
+class Product(db.Model):
+    """
+    Товар каталога: одна строка на товар, который повторяется в заказах
+    Ключ - код 1С, для товаров без кода - нормализованное наименование
+    """
+    __tablename__ = 'products'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(100), unique=True)  # Код товара
+    name_key = db.Column(db.String(500), unique=True)  # Только для товаров без кода
+    name = db.Column(db.String(500), nullable=False)  # Наименование из первого заказа с товаром
+    unit = db.Column(db.String(50))
+    # Решение фильтра слов (см. item_filters): озвучивать ли товар и какое слово сработало
+    should_announce = db.Column(db.Boolean, default=True)
+    filter_match = db.Column(db.String(200))
+    # Отпечаток фильтров слов, с которыми принято решение (FilterMatcher.signature);
+    # по индексу находятся товары, размеченные другими фильтрами (item_filters)
+    filters_signature = db.Column(db.String(40), index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Product {self.code or self.name}>'
+    
+    def to_dict(self):
+        """Преобразование в словарь для JSON"""
+        return {
+            'id': self.id,
+            'code': self.code,
+            'name': self.name,
+            'unit': self.unit,
+            'should_announce': self.should_announce,
+            'filter_match': self.filter_match,
+            'created_at': self.created_at.isoformat()
+        }
+
+
 class FilterWord(db.Model):
     """Модель фильтра слов для пропуска при озвучивании"""
     __tablename__ = 'filter_words'
@@ -84,4 +306,116 @@ class FilterWord(db.Model):
         }
 
 
+# Колонки, добавленные после первого релиза: db.create_all() не меняет существующие таблицы
+ADDED_COLUMNS = {
+    'orders': ['content_hash'],
+    'order_items': ['status_seq', 'product_id'],
+}
+
+# Колонки, ставшие необязательными: в товарах заказов хранятся только отличия от каталога
+RELAXED_COLUMNS = {
+    'order_items': ['name'],
+}
+
+
+def _column_changes(inspector):
+    """
+    Отличия колонок таблиц первого релиза от моделей
+    
+    Returns:
+        tuple: ({таблица: недостающие колонки}, {таблица: колонки RELAXED_COLUMNS с NOT NULL})
+    """
+    added, relaxed = {}, {}
+    for table_name in {**ADDED_COLUMNS, **RELAXED_COLUMNS}:
+        existing = {column['name']: column for column in inspector.get_columns(table_name)}
+        missing = [name for name in ADDED_COLUMNS.get(table_name, ()) if name not in existing]
+        not_null = [name for name in RELAXED_COLUMNS.get(table_name, ()) if not existing[name]['nullable']]
+        if missing:
+            added[table_name] = missing
+        if not_null:
+            relaxed[table_name] = not_null
+    return added, relaxed
 
+
+def _missing_indexes(inspector):
+    """Индексы моделей, которых нет в БД"""
+    missing = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def upgrade_schema():
+    """
+    Приводит таблицы первого релиза к моделям: добавляет колонки из ADDED_COLUMNS,
+    снимает NOT NULL с RELAXED_COLUMNS, создает недостающие индексы всех таблиц
+    
+    Схема сначала сверяется только чтением: если она актуальна, транзакция
+    записи не открывается. SQLite не умеет снимать NOT NULL: такая таблица
+    пересоздается по модели с копированием строк (один раз).
+    
+    Returns:
+        list: Описания изменений схемы (пустой, если схема актуальна)
+    """
+    # Запись схемы - под блокировкой записи (несколько воркеров стартуют одновременно)
+    from db_writer import WRITE_OPTION
+    
+    with db.engine.connect() as connection:
+        inspector = inspect(connection)
+        if not any(_column_changes(inspector)) and not _missing_indexes(inspector):
+            return []
+    
+    changes = []
+    with db.engine.connect() as connection:
+        connection = connection.execution_options(**{WRITE_OPTION: True})
+        with connection.begin():
+            # Другой воркер мог обновить схему раньше: отличия определяются заново
+            inspector = inspect(connection)
+            added, relaxed = _column_changes(inspector)
+            rebuilt = set(relaxed) if connection.dialect.name == 'sqlite' else set()
+            
+            for table_name, column_names in added.items():
+                if table_name in rebuilt:
+                    # Колонки появятся при пересоздании таблицы
+                    continue
+                table = db.metadata.tables[table_name]
+                for column_name in column_names:
+                    column_type = table.c[column_name].type.compile(dialect=connection.dialect)
+                    connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+                    changes.append(f'Добавлена колонка {table_name}.{column_name}')
+            
+            for table_name, column_names in relaxed.items():
+                if table_name in rebuilt:
+                    existing = {column['name'] for column in inspector.get_columns(table_name)}
+                    _rebuild_sqlite_table(connection, db.metadata.tables[table_name], existing)
+                    changes.append(f'Пересоздана таблица {table_name}')
+                    continue
+                for column_name in column_names:
+                    connection.execute(text(f'ALTER TABLE {table_name} ALTER COLUMN {column_name} DROP NOT NULL'))
+                    changes.append(f'Колонка {table_name}.{column_name} стала необязательной')
+            
+            # Новый инспектор: у пересозданных таблиц индексов еще нет
+            for index in _missing_indexes(inspect(connection)):
+                index.create(bind=connection)
+                changes.append(f'Создан индекс {index.name}')
+    return changes
+
+
+def _rebuild_sqlite_table(connection, table, existing):
+    """
+    Пересоздает таблицу SQLite по модели с копированием строк (id сохраняются)
+    
+    Индексы создает upgrade_schema, триггеры поиска - item_search.create_search_index.
+    
+    Args:
+        existing: Имена колонок таблицы в БД (лишние колонки не копируются)
+    """
+    new_name = f'{table.name}__new'
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {new_name}')
+    create_sql = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.exec_driver_sql(create_sql.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {new_name} ', 1))
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    connection.exec_driver_sql(f'INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}')
+    connection.exec_driver_sql(f'DROP TABLE {table.name}')
+    connection.exec_driver_sql(f'ALTER TABLE {new_name} RENAME TO {table.name}')
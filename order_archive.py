@@ -0,0 +1,233 @@
+"""
+Архив заказов
+Заказы со статусом в_архив переносятся из orders/order_items в archived_orders/
+archived_order_items пачками (одна транзакция на пачку), чтобы в рабочих
+таблицах оставались только активные заказы. Архив доступен только для
+просмотра и поиска; заказ можно вернуть в рабочие таблицы.
+
+Поиск по товарам архива не зависит от регистра: в SQLite lower() и LIKE
+приводят регистр только латиницы, поэтому наименования сравниваются через
+функцию fold_text, зарегистрированную в подключениях (register_search_functions).
+"""
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, literal, or_, select, update
+
+from config import Config
+from db_writer import run_write
+from models import db, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+logger = logging.getLogger(__name__)
+
+# Статус, после которого заказ уходит в архив
+ARCHIVE_STATUS = 'в_архив'
+# Статус заказа, возвращенного из архива (чтобы он сразу не ушел обратно)
+RESTORED_STATUS = 'собран'
+# Заказ занят переносом (только внутри транзакции переноса, наружу не виден)
+ARCHIVING_STATUS = 'архивируется'
+
+ITEM_COLUMNS = ('row_number', 'name', 'quantity', 'unit', 'code', 'product_id', 'status')
+
+# Переносы внутри процесса не пересекаются; между процессами заказ
+# переносится только той транзакцией, которая перевела его в статус архивируется
+_archive_lock = threading.Lock()
+
+_search_engines = set()
+_search_engines_lock = threading.Lock()
+
+
+def archive_orders(batch_size=None):
+    """
+    Переносит все заказы со статусом в_архив в архивные таблицы
+    
+    Args:
+        batch_size: Заказов в одной транзакции (по умолчанию ARCHIVE_BATCH_SIZE)
+    
+    Returns:
+        int: Количество перенесенных заказов
+    """
+    batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+    moved = 0
+    with _archive_lock:
+        while True:
+            order_ids = [
+                order_id for (order_id,) in
+                db.session.query(Order.id).filter_by(status=ARCHIVE_STATUS).order_by(Order.id).limit(batch_size)
+            ]
+            if not order_ids:
+                break
+            
+            batch_moved = run_write(lambda: sum(_move_order(order_id) for order_id in order_ids))
+            moved += batch_moved
+            
+            if len(order_ids) < batch_size or not batch_moved:
+                break
+    
+    if moved:
+        logger.info(f"В архив перенесено заказов: {moved}")
+    return moved
+
+
+def _move_order(order_id):
+    """Копирует заказ с товарами в архив и удаляет из рабочих таблиц (без commit); 1 или 0"""
+    # Занимаем заказ первым: если его уже перенес другой процесс или статус изменился, строк не будет
+    claimed = db.session.execute(
+        update(Order.__table__).where(Order.id == order_id, Order.status == ARCHIVE_STATUS)
+        .values(status=ARCHIVING_STATUS)
+    ).rowcount
+    if not claimed:
+        return 0
+    order = db.session.execute(select(Order.__table__).where(Order.id == order_id)).mappings().one()
+    
+    items_count = db.session.execute(
+        select(func.count(OrderItem.id)).where(OrderItem.order_id == order_id)
+    ).scalar()
+    archived_id = db.session.execute(
+        insert(ArchivedOrder.__table__).values(
+            original_id=order_id,
+            order_number=order['order_number'],
+            order_date=order['order_date'],
+            status=ARCHIVE_STATUS,
+            filename=order['filename'],
+            content_hash=order['content_hash'],
+            created_at=order['created_at'],
+            archived_at=datetime.utcnow(),
+            items_count=items_count
+        )
+    ).inserted_primary_key[0]
+    
+    db.session.execute(
+        insert(ArchivedOrderItem.__table__).from_select(
+            ('archived_order_id',) + ITEM_COLUMNS,
+            select(literal(archived_id), *(OrderItem.__table__.c[name] for name in ITEM_COLUMNS))
+            .where(OrderItem.order_id == order_id)
+        )
+    )
+    # Товары удаляются раньше заказа: на них ссылается внешний ключ order_items.order_id
+    db.session.execute(delete(OrderItem.__table__).where(OrderItem.order_id == order_id))
+    db.session.execute(delete(Order.__table__).where(Order.id == order_id))
+    return 1
+
+
+def restore_order(archived_id):
+    """
+    Возвращает заказ из архива в рабочие таблицы со статусом собран
+    
+    Args:
+        archived_id: id заказа в archived_orders
+    
+    Returns:
+        tuple: (Order, None) или (None, str) - восстановленный заказ или причина отказа
+    """
+    archived = db.session.get(ArchivedOrder, archived_id)
+    if archived is None:
+        return None, 'Заказ не найден в архиве'
+    
+    if Order.query.filter_by(order_number=archived.order_number).first():
+        return None, f'Заказ № {archived.order_number} уже есть среди активных заказов'
+    
+    order = run_write(_restore_order, archived_id)
+    if order is None:
+        return None, 'Заказ не найден в архиве'
+    logger.info(f"Заказ {order.order_number} восстановлен из архива")
+    return order, None
+
+
+def _restore_order(archived_id):
+    """Копирует заказ из архива в рабочие таблицы и удаляет из архива (без commit)"""
+    archived = db.session.get(ArchivedOrder, archived_id)
+    if archived is None:
+        return None
+    
+    order = Order(
+        order_number=archived.order_number,
+        order_date=archived.order_date,
+        status=RESTORED_STATUS,
+        filename=archived.filename,
+        content_hash=archived.content_hash,
+        created_at=archived.created_at
+    )
+    db.session.add(order)
+    db.session.flush()
+    
+    db.session.execute(
+        insert(OrderItem.__table__).from_select(
+            ('order_id',) + ITEM_COLUMNS,
+            select(literal(order.id), *(ArchivedOrderItem.__table__.c[name] for name in ITEM_COLUMNS))
+            .where(ArchivedOrderItem.archived_order_id == archived_id)
+        )
+    )
+    db.session.execute(
+        delete(ArchivedOrderItem.__table__).where(ArchivedOrderItem.archived_order_id == archived_id)
+    )
+    db.session.execute(delete(ArchivedOrder.__table__).where(ArchivedOrder.id == archived_id))
+    db.session.expunge(archived)
+    return order
+
+
+def _like_pattern(text):
+    """Текст для LIKE без спецсимволов % и _"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def fold_text(value):
+    """Текст для сравнения без учета регистра: casefold, ё -> е"""
+    return value.casefold().replace('ё', 'е') if value is not None else None
+
+
+def register_search_functions(engine):
+    """Регистрирует fold_text в каждом новом подключении SQLite (для других СУБД ничего не делает)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with _search_engines_lock:
+        if engine not in _search_engines:
+            event.listen(engine, 'connect', _on_connect)
+            _search_engines.add(engine)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    """Функции поиска для нового подключения SQLite"""
+    dbapi_connection.create_function('fold_text', 1, fold_text, deterministic=True)
+
+
+def _contains(column, text):
+    """Условие: колонка содержит текст без учета регистра"""
+    if db.engine.dialect.name == 'sqlite':
+        return func.fold_text(column).like(f'%{_like_pattern(fold_text(text))}%', escape='\\')
+    return column.ilike(f'%{_like_pattern(text)}%', escape='\\')
+
+
+def archive_query(search=None):
+    """
+    Запрос заказов архива (новые переносы первыми)
+    
+    Args:
+        search: Начало номера заказа или часть наименования/кода товара
+    
+    Returns:
+        Select: Запрос для db.paginate
+    """
+    query = select(ArchivedOrder).order_by(ArchivedOrder.archived_at.desc(), ArchivedOrder.id.desc())
+    search = (search or '').strip()
+    if search:
+        matching_items = select(ArchivedOrderItem.archived_order_id).where(or_(
+            _contains(ArchivedOrderItem.name, search),
+            _contains(ArchivedOrderItem.code, search)
+        ))
+        query = query.where(or_(
+            ArchivedOrder.order_number.like(f'{_like_pattern(search)}%', escape='\\'),
+            ArchivedOrder.id.in_(matching_items)
+        ))
+    return query
+
+
+def get_archive_stats():
+    """Размер рабочих таблиц и архива"""
+    return {
+        'active_orders': db.session.query(func.count(Order.id)).scalar(),
+        'pending_archive': db.session.query(func.count(Order.id)).filter_by(status=ARCHIVE_STATUS).scalar(),
+        'archived_orders': db.session.query(func.count(ArchivedOrder.id)).scalar(),
+        'archived_items': db.session.query(func.count(ArchivedOrderItem.id)).scalar(),
+    }
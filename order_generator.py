@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических заказов в раскладке 1С (xlsx) для бенчмарков
+Пишет части xlsx напрямую, как и 1С: таблица общих строк, размеры листа,
+объединенные ячейки. openpyxl для этого слишком медленный на 100 тыс. строк
+(объединение ячеек в нем квадратично).
+
+Что есть в файле:
+- шапка: заголовок заказа в B3, поставщик и покупатель, заголовки колонок в строке 9;
+- товары с 11 строки: длинные наименования на кириллице, коды, количества
+  (часть пропущена), единицы, цены и суммы;
+- объединенные ячейки по колонкам, как в печатной форме 1С;
+- строки итогов после товаров.
+
+Использование:
+    python order_generator.py 1000                      # orders/order_1000.xlsx
+    python order_generator.py 10 1000 100000 --out /tmp/orders
+    python order_generator.py 500 --missing 0.05 --no-merge
+"""
+import argparse
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+from excel_layout import (
+    HEADER_ROW, HEADER_COLUMN, COLUMNS_ROW, DATA_START_ROW,
+    COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT
+)
+
+# Колонки печатной формы: (первая, последняя) - объединяются в каждой строке
+COLUMN_SPANS = {
+    COL_ROW_NUMBER: (COL_ROW_NUMBER, COL_NAME - 1),
+    COL_NAME: (COL_NAME, COL_CODE - 1),
+    COL_CODE: (COL_CODE, COL_QUANTITY - 1),
+    COL_QUANTITY: (COL_QUANTITY, COL_UNIT - 1),
+    COL_UNIT: (COL_UNIT, COL_UNIT + 2),
+}
+COL_PRICE = COL_UNIT + 3
+COL_SUM = COL_PRICE + 3
+COLUMN_SPANS[COL_PRICE] = (COL_PRICE, COL_PRICE + 2)
+COLUMN_SPANS[COL_SUM] = (COL_SUM, COL_SUM + 2)
+LAST_COLUMN = COL_SUM + 2
+
+COLUMN_TITLES = {
+    COL_ROW_NUMBER: '№',
+    COL_NAME: 'Товары (работы, услуги)',
+    COL_CODE: 'Код',
+    COL_QUANTITY: 'Кол-во',
+    COL_UNIT: 'Ед.',
+    COL_PRICE: 'Цена',
+    COL_SUM: 'Сумма',
+}
+
+MONTHS = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня', 'июля',
+          'августа', 'сентября', 'октября', 'ноября', 'декабря']
+
+BRANDS = ['Адалия', 'Сербетли', 'Дарксайд', 'Мустанг', 'Спектрум', 'Северный ветер', 'Черная метка',
+          'Бонче', 'Хулиган', 'Трофимов и сыновья']
+PRODUCTS = ['Табак для кальяна', 'Бестабачная смесь для кальяна', 'Уголь кокосовый', 'Чай черный листовой',
+            'Смесь для нагревания', 'Чаша глиняная', 'Шланг силиконовый', 'Калауд алюминиевый']
+FLAVORS = ['двойное яблоко', 'мята со льдом', 'виноград и малина', 'лимонный пирог', 'черника',
+           'персиковый чай', 'дыня', 'грейпфрут с розмарином', 'вишневый ликер', 'кокос и ваниль']
+DETAILS = ['в подарочной упаковке', 'акцизная марка', 'новая партия', 'ограниченная серия',
+           'для ресторанов и баров', 'с увеличенным сроком хранения']
+PACKAGES = ['25 г', '50 г', '100 г', '200 г', '250 г', '1 кг', '72 шт', '96 шт']
+UNITS = ['шт', 'шт', 'шт', 'уп', 'кг', 'блок']
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<bookViews><workbookView activeTab="0"/></bookViews>'
+    '<sheets><sheet name="TDSheet" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/>'
+    '<Relationship Id="rId3" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Стиль 1 - денежный формат (#,##0.00) для цен и сумм
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="8"/><name val="Arial"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _SharedStringTable:
+    """Таблица общих строк: одинаковые строки хранятся один раз"""
+
+    def __init__(self):
+        self.index = {}
+        self.references = 0
+
+    def add(self, text):
+        self.references += 1
+        return self.index.setdefault(text, len(self.index))
+
+    def to_xml(self):
+        items = ''.join(f'<si><t xml:space="preserve">{escape(text)}</t></si>' for text in self.index)
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'count="{self.references}" uniqueCount="{len(self.index)}">{items}</sst>'
+        )
+
+
+def _row_xml(row_index, cells, strings):
+    """XML строки листа: cells - список (колонка, значение, стиль)"""
+    parts = [f'<row r="{row_index}">']
+    for column, value, style in sorted(cells, key=lambda cell: cell[0]):
+        reference = f'{get_column_letter(column)}{row_index}'
+        style_attr = f' s="{style}"' if style else ''
+        if isinstance(value, str):
+            parts.append(f'<c r="{reference}"{style_attr} t="s"><v>{strings.add(value)}</v></c>')
+        else:
+            parts.append(f'<c r="{reference}"{style_attr}><v>{value}</v></c>')
+    parts.append('</row>')
+    return ''.join(parts)
+
+
+def _product_name(rnd, index):
+    """Длинное наименование товара в стиле номенклатуры 1С"""
+    name = f'{rnd.choice(PRODUCTS)} {rnd.choice(BRANDS)} "{rnd.choice(FLAVORS)}" {rnd.choice(PACKAGES)}'
+    for detail in rnd.sample(DETAILS, rnd.randint(0, 3)):
+        name += f', {detail}'
+    return f'{name} (арт. {index:06d})'
+
+
+def generate_order_file(path, rows, order_number=None, seed=None, missing_quantity=0.02, merged=True):
+    """
+    Пишет файл заказа в раскладке 1С
+
+    Args:
+        path: Путь к файлу .xlsx
+        rows: Количество строк товаров
+        order_number: Номер заказа (по умолчанию зависит от seed)
+        seed: Зерно случайных данных (по умолчанию rows)
+        missing_quantity: Доля строк без количества (парсер их пропускает)
+        merged: Объединять ячейки колонок, как в печатной форме 1С
+
+    Returns:
+        dict: order_number, rows, expected_items - сколько товаров должен найти парсер
+    """
+    rnd = random.Random(rows if seed is None else seed)
+    order_number = order_number or str(rnd.randint(1000, 99999))
+    strings = _SharedStringTable()
+    merges = []
+
+    def merge(row_index, column):
+        first, last = COLUMN_SPANS.get(column, (column, column))
+        if merged and last > first:
+            merges.append(f'{get_column_letter(first)}{row_index}:{get_column_letter(last)}{row_index}')
+
+    sheet_rows = []
+    title = (f'Заказ покупателя № {order_number} от {rnd.randint(1, 28)} '
+             f'{rnd.choice(MONTHS)} {rnd.randint(2024, 2026)} г.')
+    sheet_rows.append(_row_xml(HEADER_ROW, [(HEADER_COLUMN, title, 0)], strings))
+    if merged:
+        merges.append(f'{get_column_letter(HEADER_COLUMN)}{HEADER_ROW}:{get_column_letter(LAST_COLUMN)}{HEADER_ROW}')
+    sheet_rows.append(_row_xml(5, [(HEADER_COLUMN, 'Поставщик:', 0),
+                                   (COL_NAME, 'ООО "Северный склад", ИНН 7701234567, г. Москва', 0)], strings))
+    sheet_rows.append(_row_xml(7, [(HEADER_COLUMN, 'Покупатель:', 0),
+                                   (COL_NAME, f'ИП Иванов И. И., точка {rnd.randint(1, 40)}', 0)], strings))
+    sheet_rows.append(_row_xml(COLUMNS_ROW, [(column, title, 0) for column, title in COLUMN_TITLES.items()], strings))
+    for column in COLUMN_TITLES:
+        merge(COLUMNS_ROW, column)
+
+    expected_items = 0
+    total = 0.0
+    for index in range(1, rows + 1):
+        row_index = DATA_START_ROW + index - 1
+        unit = rnd.choice(UNITS)
+        quantity = None
+        if rnd.random() >= missing_quantity:
+            quantity = round(rnd.uniform(0.5, 20), 1) if unit == 'кг' else rnd.randint(1, 120)
+            expected_items += 1
+        price = round(rnd.uniform(50, 5000), 2)
+        cells = [
+            (COL_ROW_NUMBER, index, 0),
+            (COL_NAME, _product_name(rnd, index), 0),
+            (COL_UNIT, unit, 0),
+            (COL_PRICE, price, 1),
+        ]
+        if rnd.random() > 0.05:
+            cells.append((COL_CODE, f'УТ-{rnd.randint(1, 99999999):08d}', 0))
+        if quantity is not None:
+            cells.append((COL_QUANTITY, quantity, 0))
+            cells.append((COL_SUM, round(price * quantity, 2), 1))
+            total += price * quantity
+        sheet_rows.append(_row_xml(row_index, cells, strings))
+        for column, _, _ in cells:
+            merge(row_index, column)
+
+    last_row = DATA_START_ROW + rows + 1
+    sheet_rows.append(_row_xml(last_row, [(COL_PRICE, 'Итого:', 0), (COL_SUM, round(total, 2), 1)], strings))
+    sheet_rows.append(_row_xml(last_row + 2, [
+        (HEADER_COLUMN, f'Всего наименований {rows}, на сумму {total:,.2f} руб.'.replace(',', ' '), 0)
+    ], strings))
+    last_row += 2
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', STYLES)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<dimension ref="A1:{get_column_letter(LAST_COLUMN)}{last_row}"/>'
+                '<sheetData>'
+            ).encode('utf-8'))
+            for row_xml in sheet_rows:
+                sheet.write(row_xml.encode('utf-8'))
+            sheet.write(b'</sheetData>')
+            if merges:
+                sheet.write(f'<mergeCells count="{len(merges)}">'.encode('utf-8'))
+                for reference in merges:
+                    sheet.write(f'<mergeCell ref="{reference}"/>'.encode('utf-8'))
+                sheet.write(b'</mergeCells>')
+            sheet.write(b'</worksheet>')
+        archive.writestr('xl/sharedStrings.xml', strings.to_xml())
+
+    return {'order_number': order_number, 'rows': rows, 'expected_items': expected_items}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетических заказов 1С')
+    parser.add_argument('sizes', nargs='+', type=int, help='Количество строк товаров (10 ... 100000)')
+    parser.add_argument('--out', default='orders', help='Папка для файлов')
+    parser.add_argument('--missing', type=float, default=0.02, help='Доля строк без количества')
+    parser.add_argument('--no-merge', action='store_true', help='Без объединенных ячеек')
+    parser.add_argument('--seed', type=int, help='Зерно случайных данных')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for rows in args.sizes:
+        path = os.path.join(args.out, f'order_{rows}.xlsx')
+        info = generate_order_file(path, rows, seed=args.seed, missing_quantity=args.missing,
+                                   merged=not args.no_merge)
+        size_kb = os.path.getsize(path) / 1024
+        print(f"{path}: заказ № {info['order_number']}, строк {rows}, "
+              f"товаров {info['expected_items']}, {size_kb:.0f} КБ")
+
+
+if __name__ == '__main__':
+    main()
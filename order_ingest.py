@@ -0,0 +1,562 @@
+"""
+Прием файлов заказов
+Загрузка читается в буфер в памяти (большие файлы уходят во временный файл),
+проверяется и парсится за одну загрузку книги. Оригинал сохраняется
+в папку загрузок только после того, как заказ принят.
+
+Повторная отправка того же файла отсекается по хэшу содержимого
+еще до открытия книги.
+
+Запись идет через run_write, разбор книги - вне транзакции записи.
+
+Большие файлы (от STREAMING_INGEST_MIN_BYTES) принимаются потоково: товары
+не собираются в объекты моделей, а пишутся в БД пачками по мере чтения листа,
+поэтому память не растет с числом строк. Каждая пачка - своя короткая
+транзакция: блокировка записи не держится, пока читается лист. Пока пачки
+пишутся, заказ имеет статус загружается (его нет в списке заказов); при ошибке
+заказ удаляется, а оставшиеся после падения процесса - при следующем старте.
+
+Товары привязываются к каталогу товаров при приеме: в строке товара остаются
+только отличия наименования и единицы от каталога, решение фильтра слов
+берется из товара каталога (см. product_catalog, item_filters).
+
+Пакетная загрузка (несколько файлов или ZIP архив) разбирает книги
+в пуле процессов и сохраняет все принятые заказы одной транзакцией.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+
+from config import Config
+from db_writer import end_read_transaction, run_write
+from excel_parser import FastReaderUnsupported, load_order_data, open_order_stream, order_from_data
+from models import db, Order, OrderItem
+from product_catalog import assign_products, item_overrides, resolve_products
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Символов хэша содержимого в имени сохраненного оригинала
+STORED_NAME_HASH_LENGTH = 12
+
+# Предел длины имени сохраненного оригинала: orders.filename - String(255), а имя
+# временного файла при записи длиннее на суффикс .<pid>.tmp (предел ФС - 255 байт)
+STORED_NAME_MAX_LENGTH = 200
+
+# Статус заказа, товары которого еще пишутся потоковым приемом
+LOADING_STATUS = 'загружается'
+
+# Незавершенная потоковая загрузка старше этого удаляется при старте (процесс упал)
+STALE_LOAD_AGE = timedelta(hours=1)
+
+# Результаты разбора файла в пакетной загрузке
+RESULT_ACCEPTED = 'accepted'
+RESULT_DUPLICATE = 'duplicate'
+RESULT_INVALID = 'invalid'
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def spool_upload(stream):
+    """
+    Копирует поток загрузки в буфер
+    
+    Args:
+        stream: Поток файла из запроса (FileStorage.stream)
+    
+    Returns:
+        SpooledTemporaryFile: Буфер, перемотанный в начало
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(stream, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def hash_upload(buffer):
+    """
+    sha256 содержимого загрузки
+    
+    Returns:
+        str: Хэш в hex; буфер перематывается в начало
+    """
+    digest = hashlib.sha256()
+    buffer.seek(0)
+    for chunk in iter(lambda: buffer.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    buffer.seek(0)
+    return digest.hexdigest()
+
+
+def _stored_names(filename, content_hash):
+    """Имена для оригинала: <хэш>_<имя>, затем <хэш>_<имя>_2, _3... если имя занято"""
+    stem, extension = os.path.splitext(filename)
+    prefix = f'{content_hash[:STORED_NAME_HASH_LENGTH]}_'
+    stem = stem[:STORED_NAME_MAX_LENGTH - len(prefix) - len(extension) - 8]
+    yield f'{prefix}{stem}{extension}'
+    suffix = 2
+    while True:
+        yield f'{prefix}{stem}_{suffix}{extension}'
+        suffix += 1
+
+
+def save_original(buffer, filename, content_hash):
+    """
+    Атомарно сохраняет оригинал принятого файла под уникальным именем
+    
+    Имя занимается эксклюзивным созданием файла, поэтому оригинал не перезаписывает
+    файл другого заказа (одинаковые имена в разных папках ZIP, повторная загрузка
+    файла архивного заказа), а удаление заказа не затрагивает чужие оригиналы.
+    
+    Args:
+        buffer: Буфер загрузки
+        filename: Имя загруженного файла (после secure_filename)
+        content_hash: sha256 содержимого
+    
+    Returns:
+        str: Имя сохраненного файла в папке загрузок (для Order.filename)
+    """
+    for stored_name in _stored_names(filename, content_hash):
+        filepath = os.path.join(Config.UPLOAD_FOLDER, stored_name)
+        try:
+            open(filepath, 'xb').close()
+            break
+        except FileExistsError:
+            continue
+    
+    buffer.seek(0)
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(buffer, f)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        for path in (tmp_path, filepath):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return stored_name
+
+
+def upload_size(buffer):
+    """Размер загрузки в байтах; буфер перематывается в начало"""
+    size = buffer.seek(0, os.SEEK_END)
+    buffer.seek(0)
+    return size
+
+
+def _remove_original(stored_name):
+    """Удаляет сохраненный оригинал заказа, который не удалось записать в БД"""
+    try:
+        os.remove(os.path.join(Config.UPLOAD_FOLDER, stored_name))
+    except OSError:
+        pass
+
+
+def _order_exists(order_number):
+    return db.session.query(Order.id).filter_by(order_number=order_number).first() is not None
+
+
+def _duplicate_number(order_number):
+    return RESULT_DUPLICATE, None, 0, f"Заказ № {order_number} уже существует"
+
+
+def _insert_order(data, filename, content_hash):
+    """Добавляет заказ с товарами (для run_write: модели создаются при каждой попытке)"""
+    order = order_from_data(data, filename)
+    order.content_hash = content_hash
+    assign_products(order.items)
+    db.session.add(order)
+    return order
+
+
+def ingest_upload(buffer, filename, content_hash=None):
+    """
+    Проверяет и разбирает загруженный файл, сохраняет оригинал и записывает заказ в БД
+    
+    Файлы от STREAMING_INGEST_MIN_BYTES принимаются потоково (stream_order),
+    остальные - разбором в данные заказа (load_order_data) и одной записью.
+    
+    Args:
+        buffer: Буфер загрузки
+        filename: Имя файла (после secure_filename)
+        content_hash: sha256 содержимого
+    
+    Returns:
+        tuple: (статус RESULT_*, Order или None, число товаров, сообщение об ошибке или None)
+    """
+    # Дальше разбор файла: проверки и запись пойдут уже в новой транзакции (см. end_read_transaction)
+    end_read_transaction()
+    if upload_size(buffer) >= Config.STREAMING_INGEST_MIN_BYTES:
+        return stream_order(buffer, filename, content_hash, original=buffer)
+    
+    data, error_message = load_order_data(buffer)
+    if data is None:
+        return RESULT_INVALID, None, 0, error_message
+    if _order_exists(data['order_number']):
+        return _duplicate_number(data['order_number'])
+    
+    stored_name = save_original(buffer, filename, content_hash)
+    try:
+        order = run_write(_insert_order, data, stored_name, content_hash)
+    except IntegrityError:
+        # Заказ с тем же номером только что принят другим запросом
+        _remove_original(stored_name)
+        return _duplicate_number(data['order_number'])
+    except Exception:
+        _remove_original(stored_name)
+        raise
+    return RESULT_ACCEPTED, order, len(data['items']), None
+
+
+def stream_order(source, filename, content_hash=None, batch_size=None, original=None):
+    """
+    Потоковый прием заказа: строки товаров читаются из листа кортежами
+    и вставляются в order_items пачками по batch_size (INGEST_BATCH_SIZE),
+    каждая пачка - отдельной записью (run_write). Пока пачки пишутся, заказ
+    имеет статус LOADING_STATUS; при ошибке он удаляется вместе с товарами.
+    
+    Если быстрый разбор споткнулся о ячейку в середине товаров, вставленное
+    удаляется и файл читается заново через openpyxl.
+    
+    Args:
+        source: Буфер загрузки или путь к файлу
+        filename: Имя файла для заказа
+        content_hash: sha256 содержимого
+        batch_size: Строк товаров в одной вставке
+        original: Буфер загрузки, если оригинал нужно сохранить (save_original)
+            перед тем, как заказ станет доступен
+    
+    Returns:
+        tuple: (статус RESULT_*, Order или None, число товаров, сообщение об ошибке или None)
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    try:
+        return _stream_order(source, filename, content_hash, batch_size, original)
+    except FastReaderUnsupported as e:
+        logger.info(f"Быстрый разбор {filename} прерван ({e}), повтор через openpyxl")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return _stream_order(source, filename, content_hash, batch_size, original, fast_reader=False)
+
+
+def _insert_loading_order(data, filename, content_hash):
+    """Добавляет заказ без товаров со статусом LOADING_STATUS; id заказа"""
+    order = Order(
+        order_number=data['order_number'],
+        order_date=data['order_date'],
+        filename=filename,
+        status=LOADING_STATUS,
+        content_hash=content_hash
+    )
+    db.session.add(order)
+    db.session.flush()
+    return order.id
+
+
+def _insert_items(order_id, batch):
+    """Вставляет пачку строк товаров заказа, привязанных к каталогу"""
+    products = resolve_products((name, code, unit) for _, name, _, unit, code in batch)
+    rows = []
+    for (row_number, name, quantity, unit, code), product in zip(batch, products):
+        name, unit = item_overrides(product, name, unit)
+        rows.append({
+            'order_id': order_id,
+            'row_number': row_number,
+            'name': name,
+            'quantity': quantity,
+            'unit': unit,
+            'code': code,
+            'product_id': product.id,
+            'status': 'pending',
+        })
+    db.session.execute(OrderItem.__table__.insert(), rows)
+
+
+def _finish_loading(order_id, stored_name):
+    """Заказ загружен: статус новый (и имя сохраненного оригинала)"""
+    values = {'status': 'новый'}
+    if stored_name is not None:
+        values['filename'] = stored_name
+    db.session.execute(update(Order.__table__).where(Order.id == order_id).values(**values))
+    return db.session.get(Order, order_id)
+
+
+def _discard_orders(order_ids):
+    """Удаляет заказы вместе с товарами (незавершенная загрузка)"""
+    db.session.execute(delete(OrderItem.__table__).where(OrderItem.order_id.in_(order_ids)))
+    db.session.execute(delete(Order.__table__).where(Order.id.in_(order_ids)))
+
+
+def _stream_order(source, filename, content_hash, batch_size, original, fast_reader=None):
+    """Один проход потокового приема (см. stream_order)"""
+    order_id = stored_name = None
+    try:
+        with open_order_stream(source, fast_reader) as (data, error_message):
+            if data is None:
+                return RESULT_INVALID, None, 0, error_message
+            if _order_exists(data['order_number']):
+                return _duplicate_number(data['order_number'])
+            try:
+                order_id = run_write(_insert_loading_order, data, filename, content_hash)
+            except IntegrityError:
+                return _duplicate_number(data['order_number'])
+            
+            items_count = 0
+            while True:
+                # Пачка читается из листа до начала транзакции записи
+                batch = list(islice(data['items'], batch_size))
+                if not batch:
+                    break
+                run_write(_insert_items, order_id, batch)
+                items_count += len(batch)
+        
+        if original is not None:
+            stored_name = save_original(original, filename, content_hash)
+        order = run_write(_finish_loading, order_id, stored_name)
+    except BaseException:
+        if order_id is not None:
+            try:
+                run_write(_discard_orders, [order_id])
+            except Exception as e:
+                # Заказ удалит discard_stale_loads при следующем старте
+                logger.error(f"Не удалось удалить незавершенный заказ {order_id}: {e}")
+        if stored_name is not None:
+            _remove_original(stored_name)
+        raise
+    return RESULT_ACCEPTED, order, items_count, None
+
+
+def discard_stale_loads():
+    """
+    Удаляет заказы, застрявшие в статусе LOADING_STATUS дольше STALE_LOAD_AGE
+    (процесс упал во время потокового приема)
+    
+    Returns:
+        int: Количество удаленных заказов
+    """
+    order_ids = [
+        order_id for (order_id,) in
+        db.session.query(Order.id).filter(
+            Order.status == LOADING_STATUS, Order.created_at < datetime.utcnow() - STALE_LOAD_AGE
+        )
+    ]
+    if order_ids:
+        run_write(_discard_orders, order_ids)
+    return len(order_ids)
+
+
+def get_process_pool():
+    """
+    Пул процессов для разбора книг (INGEST_PROCESS_WORKERS процессов, 0 - по числу ядер)
+    
+    Процессы запускаются через spawn: fork процесса с потоками синтеза
+    и соединениями БД может унаследовать захваченные блокировки.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.INGEST_PROCESS_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def _reset_process_pool():
+    """Сбрасывает сломанный пул (например, процесс убит OOM killer), следующий вызов создаст новый"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_payload(payload):
+    """Разбор одного файла в процессе пула: (данные, ошибка, время разбора в сек)"""
+    started = time.perf_counter()
+    data, error_message = load_order_data(io.BytesIO(payload))
+    return data, error_message, time.perf_counter() - started
+
+
+def expand_uploads(files):
+    """
+    Раскрывает файлы пакетной загрузки: .xlsx берутся как есть, из .zip - все .xlsx внутри
+    
+    Args:
+        files: Список FileStorage из запроса
+    
+    Returns:
+        list: Словари filename, payload (bytes) или filename, error для отклоненных файлов
+    """
+    entries = []
+    total_size = 0
+    for file in files:
+        filename = secure_filename(file.filename or '')
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        
+        if extension == 'xlsx':
+            payload = file.read()
+            total_size += len(payload)
+            entries.append({'filename': filename, 'payload': payload})
+        elif extension == 'zip':
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    for info in archive.infolist():
+                        name = os.path.basename(info.filename)
+                        if info.is_dir() or name.startswith(('.', '~$')) or \
+                                not name.lower().endswith('.xlsx') or info.filename.startswith('__MACOSX/'):
+                            continue
+                        # Защита от zip-бомб: размер считаем по заголовкам до распаковки
+                        total_size += info.file_size
+                        if total_size > Config.BULK_UPLOAD_MAX_BYTES:
+                            entries.append({'filename': secure_filename(name), 'error': 'Превышен общий размер пакета'})
+                            break
+                        entries.append({'filename': secure_filename(name), 'payload': archive.read(info)})
+            except zipfile.BadZipFile:
+                entries.append({'filename': filename, 'error': 'Поврежденный ZIP архив'})
+        else:
+            entries.append({'filename': filename or file.filename, 'error': 'Допустимы только файлы .xlsx и .zip'})
+        
+        if total_size > Config.BULK_UPLOAD_MAX_BYTES:
+            break
+    
+    if len(entries) > Config.BULK_UPLOAD_MAX_FILES:
+        skipped = len(entries) - Config.BULK_UPLOAD_MAX_FILES
+        entries = entries[:Config.BULK_UPLOAD_MAX_FILES]
+        entries.append({'filename': f'+{skipped}', 'error': f'Превышен лимит файлов в пакете, пропущено: {skipped}'})
+    return entries
+
+
+def ingest_bulk(files):
+    """
+    Пакетная загрузка заказов
+    
+    1. Отсев повторов по хэшу содержимого (в БД и внутри пакета) - без разбора
+    2. Разбор остальных книг в пуле процессов
+    3. Отсев повторов по номеру заказа и сохранение всех принятых заказов одной записью (run_write)
+    
+    Args:
+        files: Список FileStorage из запроса
+    
+    Returns:
+        tuple: (dict отчета, list принятых Order)
+    """
+    started = time.perf_counter()
+    entries = expand_uploads(files)
+    results = [{'filename': entry['filename'], 'status': None, 'order_number': None,
+                'items': None, 'error': entry.get('error'), 'parse_ms': None} for entry in entries]
+    
+    # Повторы по хэшу содержимого
+    hashes = [
+        hashlib.sha256(entry['payload']).hexdigest() if 'payload' in entry else None
+        for entry in entries
+    ]
+    known_hashes = dict(
+        db.session.query(Order.content_hash, Order.order_number)
+        .filter(Order.content_hash.in_({h for h in hashes if h}))
+    )
+    seen_hashes = set()
+    to_parse = []
+    for index, (entry, content_hash) in enumerate(zip(entries, hashes)):
+        result = results[index]
+        if content_hash is None:
+            result['status'] = RESULT_INVALID
+        elif content_hash in known_hashes:
+            result['status'] = RESULT_DUPLICATE
+            result['order_number'] = known_hashes[content_hash]
+            result['error'] = 'Этот файл уже загружен'
+        elif content_hash in seen_hashes:
+            result['status'] = RESULT_DUPLICATE
+            result['error'] = 'Файл повторяется в пакете'
+        else:
+            seen_hashes.add(content_hash)
+            to_parse.append(index)
+    
+    # Разбор книг в пуле процессов
+    parse_started = time.perf_counter()
+    parsed = {}
+    if to_parse:
+        try:
+            pool = get_process_pool()
+            futures = {index: pool.submit(_parse_payload, entries[index]['payload']) for index in to_parse}
+            for index, future in futures.items():
+                parsed[index] = future.result()
+        except BrokenProcessPool:
+            _reset_process_pool()
+            raise
+    parse_time = time.perf_counter() - parse_started
+    end_read_transaction()
+    
+    # Повторы по номеру заказа
+    order_numbers = {data['order_number'] for data, _, _ in parsed.values() if data}
+    existing_numbers = {
+        number for (number,) in
+        db.session.query(Order.order_number).filter(Order.order_number.in_(order_numbers))
+    }
+    accepted = []
+    for index in to_parse:
+        data, error_message, elapsed = parsed[index]
+        result = results[index]
+        result['parse_ms'] = round(elapsed * 1000, 1)
+        if data is None:
+            result['status'] = RESULT_INVALID
+            result['error'] = error_message
+            continue
+        result['order_number'] = data['order_number']
+        if data['order_number'] in existing_numbers:
+            result['status'] = RESULT_DUPLICATE
+            result['error'] = f"Заказ № {data['order_number']} уже существует"
+            continue
+        existing_numbers.add(data['order_number'])
+        
+        result['status'] = RESULT_ACCEPTED
+        result['items'] = len(data['items'])
+        accepted.append((index, data))
+    
+    # Оригиналы и заказы - вместе: при ошибке записи удаляются только файлы,
+    # созданные этим пакетом (save_original не перезаписывает существующие)
+    stored_names = []
+    try:
+        for index, _ in accepted:
+            stored_names.append(save_original(io.BytesIO(entries[index]['payload']),
+                                              entries[index]['filename'], hashes[index]))
+        orders = run_write(lambda: [
+            _insert_order(data, stored_name, hashes[index])
+            for (index, data), stored_name in zip(accepted, stored_names)
+        ]) if accepted else []
+    except Exception:
+        for stored_name in stored_names:
+            _remove_original(stored_name)
+        raise
+    
+    summary = {status: sum(1 for result in results if result['status'] == status)
+               for status in (RESULT_ACCEPTED, RESULT_DUPLICATE, RESULT_INVALID)}
+    report = {
+        'files': results,
+        **summary,
+        'parse_ms': round(parse_time * 1000, 1),
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    logger.info(
+        f"Пакетная загрузка: принято {summary[RESULT_ACCEPTED]}, повторов {summary[RESULT_DUPLICATE]}, "
+        f"ошибок {summary[RESULT_INVALID]} за {report['total_ms']} мс"
+    )
+    return report, orders
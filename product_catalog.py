@@ -0,0 +1,275 @@
+"""
+Каталог товаров
+Товары заказов ссылаются на строку products (order_items.product_id): ключ
+товара - код 1С, для товаров без кода - наименование в нижнем регистре,
+с ё -> е и одиночными пробелами. Наименование и единица хранятся в товаре
+каталога, в товаре заказа - только если в файле они записаны иначе
+(item_overrides); решение фильтра слов принимается для наименования товара
+каталога (наименования из файла проверяются при чтении, OrderItem.filter_match).
+
+При приеме заказа товары разрешаются пачкой: ключи ищутся в кэше процесса
+(ключ -> CatalogProduct), оставшиеся - одним запросом к products, новые
+вставляются с пропуском конфликтов (тот же товар мог вставить другой воркер).
+В кэш попадают только зафиксированные товары: id, вставленные в текущей
+транзакции, публикуются после commit и забываются при откате.
+
+Товары, загруженные до появления каталога, привязываются в фоне (link_products).
+"""
+import logging
+import threading
+from collections import namedtuple
+
+from sqlalchemy import bindparam, event, func, insert, or_, select, update
+
+from config import Config
+from db_writer import run_write
+from filter_matcher import get_filter_matcher
+from models import db, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+# Товар каталога в кэше процесса
+CatalogProduct = namedtuple('CatalogProduct', ['id', 'name', 'unit'])
+
+# Ключ сессии: товары, вставленные в текущей транзакции ({ключ: CatalogProduct})
+PENDING_KEY = 'pending_products'
+
+# Ключей в одном запросе IN
+LOOKUP_CHUNK_SIZE = 500
+
+_cache = {}
+_cache_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'created': 0,
+}
+
+
+def product_key(name, code):
+    """
+    Ключ товара каталога
+
+    Returns:
+        tuple: ('code', код) или ('name', нормализованное наименование)
+    """
+    code = (code or '').strip()
+    if code:
+        return 'code', code[:100]
+    name_key = ' '.join(str(name).casefold().replace('ё', 'е').split())
+    return 'name', name_key[:500]
+
+
+def _insert_ignoring_conflicts(rows):
+    """Вставляет товары; уже существующие (по code или name_key) пропускаются"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db.session.execute(insert(Product.__table__), rows)
+        return
+    db.session.execute(dialect_insert(Product.__table__).on_conflict_do_nothing(), rows)
+
+
+def item_overrides(product, name, unit):
+    """
+    Наименование и единица для строки товара заказа: None, если совпадают с каталогом
+    
+    Пустая единица при непустой в каталоге хранится как '' (None означал бы единицу каталога).
+    
+    Returns:
+        tuple: (наименование или None, единица или None)
+    """
+    name_override = None if name == product.name else name
+    unit_override = None if unit == product.unit else (unit or '')
+    return name_override, unit_override
+
+
+def _lookup(keys):
+    """Товары каталога по ключам из БД: {ключ: CatalogProduct}"""
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+        codes = [value for kind, value in chunk if kind == 'code']
+        name_keys = [value for kind, value in chunk if kind == 'name']
+        rows = db.session.execute(
+            select(Product.id, Product.code, Product.name_key, Product.name, Product.unit)
+            .where(or_(Product.code.in_(codes), Product.name_key.in_(name_keys)))
+        )
+        for product_id, code, name_key, name, unit in rows:
+            key = ('code', code) if code is not None else ('name', name_key)
+            found[key] = CatalogProduct(product_id, name, unit)
+    return found
+
+
+def resolve_products(rows):
+    """
+    Товары каталога для строк товаров; недостающие товары добавляются (без commit)
+    с решением текущего фильтра слов
+
+    Args:
+        rows: Последовательность (наименование, код, единица)
+
+    Returns:
+        list: CatalogProduct для каждой строки
+    """
+    rows = list(rows)
+    keys = [product_key(name, code) for name, code, _ in rows]
+    pending = db.session.info.setdefault(PENDING_KEY, {})
+
+    resolved = {}
+    with _cache_lock:
+        for key in set(keys):
+            product = _cache.get(key, pending.get(key))
+            if product is not None:
+                resolved[key] = product
+        _stats['hits'] += len(resolved)
+        _stats['misses'] += len(set(keys)) - len(resolved)
+
+    missing = {key for key in keys if key not in resolved}
+    if missing:
+        found = _lookup(missing)
+        new_rows = {}
+        matcher = None
+        for (name, code, unit), key in zip(rows, keys):
+            if key in missing and key not in found and key not in new_rows:
+                matcher = matcher or get_filter_matcher()
+                kind, value = key
+                new_rows[key] = {
+                    'code': value if kind == 'code' else None,
+                    'name_key': value if kind == 'name' else None,
+                    'name': name,
+                    'unit': unit,
+                    **matcher.decision(name),
+                }
+        if new_rows:
+            _insert_ignoring_conflicts(list(new_rows.values()))
+            created = _lookup(new_rows)
+            # Вставленное в этой транзакции попадет в кэш только после commit
+            pending.update(created)
+            with _cache_lock:
+                _stats['created'] += len(created)
+            found.update(created)
+
+        with _cache_lock:
+            for key, product in found.items():
+                if key not in pending:
+                    _remember(key, product)
+        resolved.update(found)
+
+    return [resolved[key] for key in keys]
+
+
+def assign_products(items):
+    """
+    Привязывает товары нового заказа к каталогу (объекты OrderItem, без commit):
+    product_id и отличия наименования и единицы от каталога
+    """
+    items = list(items)
+    products = resolve_products((item.name, item.code, item.unit) for item in items)
+    for item, product in zip(items, products):
+        item.product_id = product.id
+        item.name, item.unit = item_overrides(product, item.name, item.unit)
+
+
+def _remember(key, product):
+    """Добавляет товар в кэш процесса (вызывать под _cache_lock)"""
+    if key not in _cache and len(_cache) >= Config.PRODUCT_CACHE_SIZE:
+        # Вытесняем самый старый товар
+        del _cache[next(iter(_cache))]
+    _cache[key] = product
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_pending(session):
+    """Товары, вставленные в зафиксированной транзакции, - в кэш"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        with _cache_lock:
+            for key, product in pending.items():
+                _remember(key, product)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_pending(session):
+    """Откат: вставленных товаров больше нет"""
+    session.info.pop(PENDING_KEY, None)
+
+
+def _link_batch(batch_size, order_id=None):
+    """
+    Привязывает к каталогу пачку товаров без product_id (без commit); число привязанных
+
+    Args:
+        order_id: Только товары этого заказа
+    """
+    table = OrderItem.__table__
+    statement = (
+        select(table.c.id, table.c.name, table.c.code, table.c.unit)
+        .where(table.c.product_id.is_(None))
+        .limit(batch_size)
+    )
+    if order_id is not None:
+        statement = statement.where(table.c.order_id == order_id)
+    items = db.session.execute(statement).all()
+    if not items:
+        return 0
+    products = resolve_products((name, code, unit) for _, name, code, unit in items)
+    changes = []
+    for (item_id, name, _, unit), product in zip(items, products):
+        name_override, unit_override = item_overrides(product, name, unit)
+        changes.append({'item_id': item_id, 'product_id': product.id, 'name': name_override, 'unit': unit_override})
+    db.session.execute(update(table).where(table.c.id == bindparam('item_id')), changes)
+    return len(items)
+
+
+def link_products(batch_size=None):
+    """
+    Привязывает к каталогу товары, загруженные до его появления
+
+    Returns:
+        int: Количество привязанных товаров
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    linked = 0
+    while True:
+        batch_linked = run_write(_link_batch, batch_size)
+        linked += batch_linked
+        if batch_linked < batch_size:
+            break
+    if linked:
+        logger.info(f"К каталогу привязано товаров: {linked}")
+    return linked
+
+
+def link_order_items(order_id):
+    """Привязывает к каталогу товары заказа (открытого до фоновой привязки); число привязанных"""
+    linked = 0
+    while True:
+        batch_linked = run_write(_link_batch, Config.INGEST_BATCH_SIZE, order_id)
+        linked += batch_linked
+        if batch_linked < Config.INGEST_BATCH_SIZE:
+            return linked
+
+
+def has_unlinked_items(order_id=None):
+    """
+    Есть ли товары без product_id (по индексу product_id), только чтение
+
+    Args:
+        order_id: Только товары этого заказа
+    """
+    query = db.session.query(OrderItem.id).filter(OrderItem.product_id.is_(None))
+    if order_id is not None:
+        query = query.filter(OrderItem.order_id == order_id)
+    return query.first() is not None
+
+
+def get_catalog_stats():
+    """Размер каталога и счетчики кэша этого процесса"""
+    products = db.session.query(func.count(Product.id)).scalar()
+    with _cache_lock:
+        return {'products': products, 'cached': len(_cache), **_stats}
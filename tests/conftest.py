@@ -0,0 +1,110 @@
+"""
+Общие фикстуры тестов
+БД SQLite, загрузки и кэш аудио - во временной папке, перед каждым тестом
+таблицы создаются заново. Синтез речи не запускается.
+"""
+import io
+import os
+import tempfile
+
+import openpyxl
+import pytest
+
+WORK_DIR = tempfile.mkdtemp(prefix='order-assistant-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'orders.db')}"
+os.environ['FILTER_WORDS_STAMP'] = os.path.join(WORK_DIR, 'filter_words.stamp')
+os.environ['YANDEX_IAM_TOKEN_CACHE'] = os.path.join(WORK_DIR, 'yandex_iam_token.json')
+os.environ['TTS_CACHE_DIR'] = os.path.join(WORK_DIR, 'tts')
+os.environ['YANDEX_TTS_ENABLED'] = 'false'
+os.environ['INGEST_PROCESS_WORKERS'] = '2'
+UPLOAD_FOLDER = os.path.join(WORK_DIR, 'uploads')
+
+from excel_layout import COLUMNS_ROW, DATA_START_ROW, COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT  # noqa: E402
+
+
+def order_file(order_number, items):
+    """
+    Книга заказа в раскладке 1С
+    
+    Args:
+        order_number: Номер заказа
+        items: Список (наименование, код, количество, единица)
+    
+    Returns:
+        bytes: Содержимое .xlsx
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row_index in range(1, DATA_START_ROW):
+        row = [None] * COL_UNIT
+        if row_index == 3:
+            row[1] = f'Заказ покупателя № {order_number} от 8 декабря 2025 г.'
+        elif row_index == COLUMNS_ROW:
+            row[COL_ROW_NUMBER - 1] = '№'
+            row[COL_NAME - 1] = 'Товары (работы, услуги)'
+            row[COL_CODE - 1] = 'Код'
+            row[COL_QUANTITY - 1] = 'Кол-во'
+            row[COL_UNIT - 1] = 'Ед.'
+        ws.append(row)
+    for row_number, (name, code, quantity, unit) in enumerate(items, start=1):
+        row = [None] * COL_UNIT
+        row[COL_ROW_NUMBER - 1] = row_number
+        row[COL_NAME - 1] = name
+        row[COL_CODE - 1] = code
+        row[COL_QUANTITY - 1] = quantity
+        row[COL_UNIT - 1] = unit
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def drop_schema(db):
+    """Удаляет все таблицы, индекс поиска и его триггеры"""
+    with db.engine.begin() as connection:
+        for kind, name in connection.exec_driver_sql(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name NOT LIKE 'sqlite_%' "
+            # Служебные таблицы FTS5 удаляются вместе с индексом
+            "AND NOT (type = 'table' AND name LIKE 'order_items_fts_%') ORDER BY type DESC"
+        ).all():
+            connection.exec_driver_sql(f'DROP {kind.upper()} IF EXISTS "{name}"')
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """Приложение с пустой БД"""
+    import app as application
+    import filter_matcher
+    import product_catalog
+    from config import Config
+    from models import db
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', UPLOAD_FOLDER)
+    monkeypatch.setitem(application.app.config, 'UPLOAD_FOLDER', UPLOAD_FOLDER)
+    monkeypatch.setattr(application, 'schedule_order_prefetch', lambda *args, **kwargs: None)
+    with application.app.app_context():
+        db.session.remove()
+        drop_schema(db)
+        # Подключения открываются заново: init_database регистрирует в них функции поиска
+        db.engine.dispose()
+        product_catalog._cache.clear()
+        filter_matcher._matcher = None
+        application.init_database()
+        yield application.app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def upload(client):
+    """Загрузка файла заказа через /upload: upload(номер, товары) -> ответ"""
+    def upload(order_number, items, filename=None):
+        content = order_file(order_number, items)
+        return client.post('/upload', data={'file': (io.BytesIO(content), filename or f'{order_number}.xlsx')},
+                           content_type='multipart/form-data')
+    return upload
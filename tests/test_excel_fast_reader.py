@@ -0,0 +1,257 @@
+"""
+Быстрый разбор xlsx дает тот же результат, что и openpyxl
+Файлы с типичными и пограничными случаями раскладки 1С генерируются
+(benchmark_excel_parser.write_order_file) и правятся под каждый случай.
+"""
+import datetime
+import io
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from benchmark_excel_parser import convert_to_shared_strings, write_order_file
+from excel_parser import (
+    DATA_START_ROW, COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT,
+    FastReaderUnsupported, fast_read_order_data, read_order_data_openpyxl
+)
+
+
+def edit_workbook(path, edit):
+    """Открывает файл openpyxl, применяет edit(wb) и сохраняет"""
+    wb = openpyxl.load_workbook(path)
+    edit(wb)
+    wb.save(path)
+
+
+def edit_part(path, name, edit):
+    """Правит XML часть пакета как текст: edit(str) -> str"""
+    with zipfile.ZipFile(path) as archive:
+        parts = {info.filename: archive.read(info) for info in archive.infolist()}
+    parts[name] = edit(parts[name].decode('utf-8')).encode('utf-8')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for part_name, data in parts.items():
+            archive.writestr(part_name, data)
+
+
+def set_cell(ws, row, column, value):
+    ws.cell(row=row, column=column).value = value
+
+
+def case_text_numbers(path):
+    """Номера строк и количества текстом, дробные, нулевые и пустые значения"""
+    write_order_file(path, 0, shared_strings=False)
+
+    def edit(wb):
+        ws = wb.active
+        rows = [
+            ('1', '  Табак с пробелами  ', 'УТ-1', '5', ' уп '),
+            (2, 'Дробное количество', 12345, 2.5, None),
+            (3, 'Ноль', None, 0, 'шт'),
+            (4, 'Без количества', 'УТ-4', None, 'шт'),
+            (5, None, 'УТ-5', 3, 'шт'),
+            (6, 'Количество текстом', 'УТ-6', 'много', 'кг'),
+            (7.0, 'Номер дробью', 'УТ-7', 1.0, 'шт'),
+        ]
+        for offset, values in enumerate(rows):
+            for column, value in zip((COL_ROW_NUMBER, COL_NAME, COL_CODE, COL_QUANTITY, COL_UNIT), values):
+                set_cell(ws, DATA_START_ROW + offset, column, value)
+
+    edit_workbook(path, edit)
+
+
+def case_gaps(path):
+    """Пустые строки между товарами и после них"""
+    write_order_file(path, 0, shared_strings=False)
+
+    def edit(wb):
+        ws = wb.active
+        for offset, row in enumerate((0, 1, 5, 40)):
+            set_cell(ws, DATA_START_ROW + row, COL_ROW_NUMBER, offset + 1)
+            set_cell(ws, DATA_START_ROW + row, COL_NAME, f'Товар {offset + 1}')
+            set_cell(ws, DATA_START_ROW + row, COL_QUANTITY, offset + 1)
+        set_cell(ws, DATA_START_ROW + 60, 1, 'Итого')
+
+    edit_workbook(path, edit)
+
+
+def case_merged(path):
+    """Объединенные ячейки наименования G:Q, как в печатной форме 1С"""
+    write_order_file(path, 20, shared_strings=False)
+
+    def edit(wb):
+        ws = wb.active
+        for row in range(DATA_START_ROW, DATA_START_ROW + 20):
+            ws.merge_cells(start_row=row, start_column=COL_NAME, end_row=row, end_column=COL_CODE - 1)
+
+    edit_workbook(path, edit)
+
+
+def case_formulas(path):
+    """Формулы с сохраненными значениями (читаются значения, как data_only)"""
+    write_order_file(path, 10)
+    edit_part(path, 'xl/worksheets/sheet1.xml', lambda xml: re.sub(
+        r'<c r="(U1[0-9])" t="n"><v>([0-9]+)</v></c>',
+        r'<c r="\1"><f>\2*1</f><v>\2</v></c>',
+        xml
+    ))
+
+
+def case_rich_text(path):
+    """Общие строки с форматированием (r/t) и фонетикой (rPh)"""
+    write_order_file(path, 10)
+    edit_part(path, 'xl/sharedStrings.xml', lambda xml: xml.replace(
+        '<si><t xml:space="preserve">шт</t></si>',
+        '<si><r><rPr><b /></rPr><t>ш</t></r><r><t>т</t></r><rPh sb="0" eb="1"><t>фонетика</t></rPh></si>'
+    ))
+
+
+def case_inline_strings(path):
+    """Строки прямо в ячейках (inlineStr), без таблицы общих строк"""
+    write_order_file(path, 50, shared_strings=False)
+
+
+def case_date_quantity(path):
+    """Количество в формате даты - быстрый разбор уступает openpyxl"""
+    write_order_file(path, 10, shared_strings=False)
+
+    def edit(wb):
+        ws = wb.active
+        ws.cell(row=DATA_START_ROW, column=COL_QUANTITY).number_format = 'DD.MM.YYYY'
+        set_cell(ws, DATA_START_ROW + 1, COL_CODE, datetime.date(2025, 12, 8))
+
+    edit_workbook(path, edit)
+
+
+def case_bool_and_error(path):
+    """Логическое значение и ошибка формулы в колонке количества"""
+    write_order_file(path, 5)
+
+    def edit(xml):
+        xml = re.sub(r'<c r="U11" t="n"><v>[0-9]+</v></c>', '<c r="U11" t="b"><v>1</v></c>', xml)
+        return re.sub(r'<c r="U12" t="n"><v>[0-9]+</v></c>',
+                      '<c r="U12" t="e"><f>1/0</f><v>#DIV/0!</v></c>', xml)
+
+    edit_part(path, 'xl/worksheets/sheet1.xml', edit)
+
+
+def case_dimension_truncated(path):
+    """Размеры листа меньше фактических данных: обе реализации читают только до dimension"""
+    write_order_file(path, 30)
+    edit_part(path, 'xl/worksheets/sheet1.xml',
+               lambda xml: re.sub(r'<dimension ref="[^"]+"', '<dimension ref="A1:X25"', xml))
+
+
+def case_no_dimension(path):
+    """Нет размеров листа"""
+    write_order_file(path, 10)
+    edit_part(path, 'xl/worksheets/sheet1.xml', lambda xml: re.sub(r'<dimension ref="[^"]+" ?/>', '', xml))
+
+
+def case_second_sheet_active(path):
+    """Заказ на втором листе, который открыт активным"""
+    write_order_file(path, 15, shared_strings=False)
+
+    def edit(wb):
+        wb.move_sheet(wb.active, offset=0)
+        cover = wb.create_sheet('Обложка', 0)
+        cover['B3'] = 'Не заказ'
+        wb.active = 1
+
+    edit_workbook(path, edit)
+
+
+def write_supplier_template(path):
+    """Шаблон другой конфигурации 1С: заголовки в строке 6, нумерация колонок, другой порядок"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['A1'] = 'Поставщик: ООО "Ромашка"'
+    ws['C2'] = 'Счет-заказ № 777 от 3 марта 2026 г.'
+    for column, title in enumerate(['№ п/п', 'Артикул', 'Наименование', 'Ед. изм.', 'Количество', 'Цена'], start=1):
+        ws.cell(row=6, column=column).value = title
+    for column in range(1, 7):
+        ws.cell(row=7, column=column).value = column
+    for index in range(1, 41):
+        ws.append([index, f'A-{index:04d}', f'Товар поставщика {index}', 'уп', index % 7 + 1, 100.5])
+    wb.save(path)
+
+
+def case_supplier_template(path):
+    """Другой шаблон: колонки определяются по строке заголовков"""
+    write_supplier_template(path)
+
+
+def case_supplier_template_shared(path):
+    """Тот же шаблон с общими строками - раскладка берется из кэша по отпечатку"""
+    write_supplier_template(path)
+    convert_to_shared_strings(path)
+
+
+def case_no_header(path):
+    """Нет заголовка в B3"""
+    write_order_file(path, 10, shared_strings=False)
+    edit_workbook(path, lambda wb: set_cell(wb.active, 3, 2, None))
+
+
+def case_too_few_rows(path):
+    """Лист короче первой строки товаров"""
+    wb = openpyxl.Workbook()
+    wb.active['B3'] = 'Заказ покупателя № 1 от 1 января 2025 г.'
+    wb.save(path)
+
+
+def case_not_xlsx(path):
+    """Не zip архив"""
+    with open(path, 'wb') as f:
+        f.write(b'not an xlsx file')
+
+
+def comparable(result):
+    """Результат для сравнения: у ошибок чтения сравнивается только вид ошибки"""
+    data, error_message = result
+    if data is None:
+        return None, error_message.split(':', 1)[0]
+    return data, None
+
+
+@pytest.mark.parametrize('build', [
+    pytest.param(lambda path: write_order_file(path, 200), id='базовый, общие строки'),
+    pytest.param(case_text_numbers, id='числа текстом и пустые'),
+    pytest.param(case_gaps, id='пропуски строк'),
+    pytest.param(case_merged, id='объединенные ячейки'),
+    pytest.param(case_formulas, id='формулы'),
+    pytest.param(case_rich_text, id='форматированный текст'),
+    pytest.param(case_inline_strings, id='inline строки'),
+    pytest.param(case_bool_and_error, id='bool и ошибки'),
+    pytest.param(case_dimension_truncated, id='урезанный dimension'),
+    pytest.param(case_second_sheet_active, id='активный второй лист'),
+    pytest.param(case_no_header, id='без заголовка'),
+    pytest.param(case_too_few_rows, id='мало строк'),
+    pytest.param(case_supplier_template, id='шаблон поставщика'),
+    pytest.param(case_supplier_template_shared, id='шаблон поставщика, общие строки'),
+])
+def test_fast_reader_matches_openpyxl(tmp_path, build):
+    path = str(tmp_path / 'order.xlsx')
+    build(path)
+
+    with open(path, 'rb') as f:
+        actual = fast_read_order_data(io.BytesIO(f.read()))
+
+    assert comparable(actual) == comparable(read_order_data_openpyxl(path))
+
+
+@pytest.mark.parametrize('build, error', [
+    pytest.param(case_date_quantity, FastReaderUnsupported, id='даты в колонках'),
+    pytest.param(case_no_dimension, FastReaderUnsupported, id='без dimension'),
+    # Сломанный файл: load_order_data тоже уходит в openpyxl, который сообщает об ошибке
+    pytest.param(case_not_xlsx, zipfile.BadZipFile, id='не xlsx'),
+])
+def test_fast_reader_leaves_unsupported_files_to_openpyxl(tmp_path, build, error):
+    path = str(tmp_path / 'order.xlsx')
+    build(path)
+
+    with open(path, 'rb') as f, pytest.raises(error):
+        fast_read_order_data(io.BytesIO(f.read()))
+    if error is not FastReaderUnsupported:
+        assert read_order_data_openpyxl(path)[0] is None
@@ -0,0 +1,110 @@
+"""Фильтр слов: решение по наименованию товара заказа, запись при открытии заказа только при изменениях"""
+from sqlalchemy import text, update
+
+from db_writer import get_db_stats, run_write
+from filter_matcher import bump_filter_version, get_filter_matcher
+from item_filters import _is_stale, has_stale_products, refresh_products
+from models import db, FilterWord, Order, OrderItem, Product
+from voice_handler import build_item_speech_text, prepare_items_for_assembly
+
+CATALOG_NAME = 'Табак Адалия 50г'
+FILE_NAME = 'Табак Адалия 50г пакет'
+
+
+def add_filter(word):
+    run_write(db.session.add, FilterWord(word=word))
+    bump_filter_version()
+
+
+def order(order_number):
+    return Order.query.filter_by(order_number=order_number).one()
+
+
+def test_item_named_differently_from_catalogue_is_filtered_by_its_own_name(upload):
+    import app as application
+
+    upload('801', [(CATALOG_NAME, 'A1', 1, 'шт')])
+    upload('802', [(FILE_NAME, 'A1', 2, 'шт'), ('Уголь кокосовый', 'A2', 1, 'уп')])
+    add_filter('пакет')
+
+    texts = application.order_speech_texts(order('802'))
+    assert build_item_speech_text(FILE_NAME, 2) not in texts
+    assert build_item_speech_text('Уголь кокосовый', 1) in texts
+    assert build_item_speech_text(CATALOG_NAME, 1) in application.order_speech_texts(order('801'))
+
+    items = prepare_items_for_assembly(order('802').items, get_filter_matcher())
+    assert [(item['name'], item['should_announce'], item['filter_match']) for item in items] == [
+        (FILE_NAME, False, 'пакет'),
+        ('Уголь кокосовый', True, None),
+    ]
+
+
+def test_catalogue_decision_applies_to_items_with_catalogue_name(upload):
+    import app as application
+
+    upload('803', [(CATALOG_NAME, 'A1', 1, 'шт')])
+    upload('804', [(FILE_NAME, 'A1', 3, 'шт'), (CATALOG_NAME, 'A1', 1, 'шт')])
+    add_filter('адалия')
+
+    # Остается только номер заказа
+    assert len(application.order_speech_texts(order('804'))) == 1
+    items = prepare_items_for_assembly(order('804').items, get_filter_matcher())
+    assert [item['filter_match'] for item in items] == ['адалия', 'адалия']
+
+
+def test_search_reports_filter_match_of_item_name(client, upload):
+    upload('805', [(CATALOG_NAME, 'A1', 1, 'шт')])
+    upload('806', [(FILE_NAME, 'A1', 1, 'шт')])
+    add_filter('пакет')
+
+    found = client.get('/api/search/items?q=адалия').get_json()['items']
+
+    assert sorted((item['name'], item['filter_match']) for item in found) == [
+        (CATALOG_NAME, None),
+        (FILE_NAME, 'пакет'),
+    ]
+
+
+def writes_during(action):
+    before = get_db_stats()['writes']
+    action()
+    return get_db_stats()['writes'] - before
+
+
+def test_opening_order_does_not_write_when_nothing_changed(client, upload):
+    import app as application
+
+    upload('807', [(FILE_NAME, 'A1', 1, 'шт')])
+    order_id = order('807').id
+
+    assert writes_during(lambda: client.get(f'/order/{order_id}/assembly')) == 0
+    assert writes_during(lambda: application.order_speech_texts(order('807'))) == 0
+
+
+def test_opening_order_writes_only_pending_changes(client, upload):
+    upload('808', [(CATALOG_NAME, 'A1', 1, 'шт')])
+    order_id = order('808').id
+    run_write(lambda: db.session.execute(update(OrderItem).values(product_id=None)))
+    add_filter('адалия')
+    open_order = lambda: client.get(f'/order/{order_id}/assembly')  # noqa: E731
+
+    # Привязка к каталогу и переразметка товара - по одной транзакции, повторное открытие только читает
+    assert writes_during(open_order) == 2
+    assert writes_during(open_order) == 0
+    assert order('808').items[0].filter_match(get_filter_matcher()) == 'адалия'
+
+
+def test_refresh_finds_stale_products_by_signature_index(upload):
+    upload('809', [(f'Табак {number}', f'B{number}', 1, 'шт') for number in range(5)])
+    add_filter('табак')
+    matcher = get_filter_matcher()
+
+    statement = db.session.query(Product.id).filter(_is_stale(matcher)).limit(2).statement
+    plan = ' '.join(row[-1] for row in db.session.execute(
+        text(f'EXPLAIN QUERY PLAN {statement.compile(db.engine, compile_kwargs={"literal_binds": True})}')
+    ))
+    assert 'ix_products_filters_signature' in plan and 'SCAN products' not in plan
+
+    assert refresh_products(batch_size=2) == (5, 5)
+    assert not has_stale_products()
+    assert Product.query.filter_by(should_announce=True).count() == 0
@@ -0,0 +1,68 @@
+"""Статусы товаров: номера изменений и верхняя граница номеров сервера"""
+import pytest
+
+from item_status import apply_status_changes, parse_status_changes
+from models import OrderItem
+
+ITEMS = [('Чай черный', 'A1', 2, 'шт'), ('Уголь кокосовый', 'A2', 1, 'уп')]
+
+
+@pytest.fixture
+def item(upload):
+    upload('501', ITEMS)
+    return OrderItem.query.filter_by(row_number=1).one()
+
+
+def post_status(client, item, **data):
+    return client.post(f'/api/order/{item.order_id}/item/{item.id}/status', json=data)
+
+
+def test_newer_client_seq_wins_and_replay_is_ignored(item):
+    result = apply_status_changes(item.order_id, [{'item_id': item.id, 'status': 'completed', 'client_seq': 10}])
+    assert result['applied'] == 1
+
+    replay = apply_status_changes(item.order_id, [
+        {'item_id': item.id, 'status': 'completed', 'client_seq': 10},
+        {'item_id': item.id, 'status': 'pending', 'client_seq': 5},
+    ])
+    assert replay['applied'] == 0
+    assert replay['items'][str(item.id)] == {'status': 'completed', 'seq': 10}
+
+
+def test_single_item_api_without_client_seq_gets_server_seq(client, item):
+    apply_status_changes(item.order_id, [{'item_id': item.id, 'status': 'completed', 'client_seq': 1_700_000_000_000}])
+
+    response = post_status(client, item, status='skipped')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'skipped'
+
+    states = apply_status_changes(item.order_id, [])['items']
+    # Номер сервера - выше сохраненного, иначе изменение отбросилось бы как устаревшее
+    assert states[str(item.id)] == {'status': 'skipped', 'seq': 1_700_000_000_001}
+
+
+def test_client_seq_above_server_seq_still_applies(client, item):
+    post_status(client, item, status='completed')
+    post_status(client, item, status='skipped')
+    server_seq = apply_status_changes(item.order_id, [])['items'][str(item.id)]['seq']
+    assert server_seq == 2
+
+    result = apply_status_changes(item.order_id, [{'item_id': item.id, 'status': 'pending', 'client_seq': server_seq + 1}])
+    assert result['applied'] == 1
+    assert result['items'][str(item.id)] == {'status': 'pending', 'seq': server_seq + 1}
+
+
+def test_batch_reports_unknown_items(item):
+    result = apply_status_changes(item.order_id, [{'item_id': 999999, 'status': 'completed', 'client_seq': 1}])
+    assert result == {**result, 'applied': 0, 'unknown': 1}
+
+
+@pytest.mark.parametrize('changes', [
+    [{'item_id': 1, 'status': 'done', 'client_seq': 1}],
+    [{'item_id': 1, 'status': 'completed', 'client_seq': 0}],
+    [{'item_id': 'x', 'status': 'completed', 'client_seq': 1}],
+    {'item_id': 1},
+])
+def test_invalid_changes_are_rejected(changes):
+    with pytest.raises(ValueError):
+        parse_status_changes(changes)
@@ -0,0 +1,85 @@
+"""Архив заказов: перенос только занятых заказов, поиск без учета регистра, возврат из архива"""
+from sqlalchemy import func, select, update
+
+from db_writer import run_write
+from models import db, ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from order_archive import (
+    ARCHIVE_STATUS, RESTORED_STATUS, _move_order, archive_orders, archive_query, restore_order
+)
+
+ITEMS = [('Табак Адалия 50г', 'A1', 2, 'шт'), ('Уголь кокосовый', 'A2', 1, 'уп')]
+
+
+def set_status(order_number, status):
+    def write():
+        db.session.execute(update(Order).where(Order.order_number == order_number).values(status=status))
+    run_write(write)
+
+
+def archive_search_count(search):
+    return db.session.execute(select(func.count()).select_from(archive_query(search).subquery())).scalar()
+
+
+def test_archive_moves_order_with_items(upload):
+    upload('701', ITEMS)
+    upload('702', ITEMS)
+    set_status('701', ARCHIVE_STATUS)
+
+    assert archive_orders() == 1
+
+    assert [number for (number,) in Order.query.with_entities(Order.order_number)] == ['702']
+    assert OrderItem.query.count() == len(ITEMS)
+    archived = ArchivedOrder.query.one()
+    assert (archived.order_number, archived.items_count) == ('701', len(ITEMS))
+    assert ArchivedOrderItem.query.count() == len(ITEMS)
+
+
+def test_order_is_moved_only_by_the_transaction_that_claimed_it(upload):
+    upload('703', ITEMS)
+    set_status('703', ARCHIVE_STATUS)
+    order_id = Order.query.one().id
+
+    # Второй перенос того же заказа (другой процесс) не находит его в статусе в_архив
+    assert run_write(lambda: [_move_order(order_id), _move_order(order_id)]) == [1, 0]
+    assert archive_orders() == 0
+    assert ArchivedOrder.query.count() == 1
+    assert ArchivedOrderItem.query.count() == len(ITEMS)
+
+
+def test_order_with_changed_status_is_not_moved(upload):
+    upload('704', ITEMS)
+    set_status('704', ARCHIVE_STATUS)
+    order_id = Order.query.one().id
+    # Статус вернули после того, как архивация выбрала заказ
+    set_status('704', RESTORED_STATUS)
+
+    assert run_write(_move_order, order_id) == 0
+    assert Order.query.one().status == RESTORED_STATUS
+    assert OrderItem.query.count() == len(ITEMS)
+    assert ArchivedOrder.query.count() == 0
+
+
+def test_archive_search_ignores_case(upload):
+    upload('705', ITEMS)
+    set_status('705', ARCHIVE_STATUS)
+    archive_orders()
+
+    assert archive_search_count('ТАБАК АДАЛИЯ') == 1
+    assert archive_search_count('уголь') == 1
+    assert archive_search_count('a2') == 1
+    assert archive_search_count('70') == 1
+    assert archive_search_count('кальян') == 0
+
+
+def test_restore_returns_order_with_items(upload):
+    upload('706', ITEMS)
+    set_status('706', ARCHIVE_STATUS)
+    archive_orders()
+
+    order, error = restore_order(ArchivedOrder.query.one().id)
+
+    assert error is None
+    assert (order.order_number, order.status) == ('706', RESTORED_STATUS)
+    assert sorted(item.code for item in Order.query.one().items) == ['A1', 'A2']
+    assert ArchivedOrder.query.count() == 0
+    assert ArchivedOrderItem.query.count() == 0
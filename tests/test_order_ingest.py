@@ -0,0 +1,141 @@
+"""Прием заказов: повторы по хэшу содержимого, пакетная загрузка, сохранение оригиналов"""
+import hashlib
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import zipfile
+
+from conftest import UPLOAD_FOLDER, order_file
+from models import Order, OrderItem
+
+ITEMS = [('Чай черный', 'A1', 2, 'шт'), ('Уголь кокосовый', 'A2', 1, 'уп')]
+
+
+def bulk_upload(client, files):
+    return client.post('/upload/bulk', data={'files': [(io.BytesIO(content), name) for name, content in files]},
+                       content_type='multipart/form-data')
+
+
+def test_reupload_of_same_file_is_rejected_by_content_hash(client):
+    content = order_file('601', ITEMS)
+    for _ in range(2):
+        client.post('/upload', data={'file': (io.BytesIO(content), 'order.xlsx')},
+                    content_type='multipart/form-data')
+
+    order = Order.query.one()
+    assert order.content_hash == hashlib.sha256(content).hexdigest()
+    assert OrderItem.query.count() == len(ITEMS)
+
+
+def test_bulk_upload_skips_known_and_repeated_files(client, upload):
+    upload('602', ITEMS, filename='known.xlsx')
+    known = order_file('602', ITEMS)
+    new = order_file('603', ITEMS)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('nested/new.xlsx', new)
+
+    response = bulk_upload(client, [('known.xlsx', known), ('new.xlsx', new), ('batch.zip', archive.getvalue())])
+    report = response.get_json()
+
+    assert [entry['status'] for entry in report['files']] == ['duplicate', 'accepted', 'duplicate']
+    assert report['files'][0]['order_number'] == '602'
+    assert sorted(number for (number,) in Order.query.with_entities(Order.order_number)) == ['602', '603']
+
+
+def test_bulk_upload_rejects_same_order_number_in_other_file(client):
+    first = order_file('604', ITEMS)
+    second = order_file('604', ITEMS[:1])
+    report = bulk_upload(client, [('a.xlsx', first), ('b.xlsx', second)]).get_json()
+
+    assert [entry['status'] for entry in report['files']] == ['accepted', 'duplicate']
+    assert Order.query.count() == 1
+
+
+def test_originals_with_same_name_do_not_overwrite_each_other(client, upload):
+    upload('605', ITEMS, filename='order.xlsx')
+    upload('606', ITEMS[:1], filename='order.xlsx')
+
+    orders = Order.query.order_by(Order.id).all()
+    assert len({order.filename for order in orders}) == 2
+    for order in orders:
+        with open(os.path.join(UPLOAD_FOLDER, order.filename), 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == order.content_hash
+
+
+def test_importing_app_does_not_touch_the_database(tmp_path):
+    # Процессы пула разбора книг (spawn) заново импортируют главный модуль
+    database = tmp_path / 'untouched.db'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}', 'PYTHONPATH': root}
+    subprocess.run([sys.executable, '-c', 'import app'], check=True, env=env, cwd=tmp_path, capture_output=True)
+
+    tables = sqlite3.connect(database).execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    assert tables == []
+
+
+def many_items(count):
+    return [(f'Товар {number}', f'S{number}', number, 'шт') for number in range(1, count + 1)]
+
+
+def test_large_upload_is_written_in_short_batches(app, monkeypatch):
+    from config import Config
+    from db_writer import get_db_stats
+    from order_ingest import RESULT_ACCEPTED, ingest_upload
+    monkeypatch.setattr(Config, 'STREAMING_INGEST_MIN_BYTES', 0)
+    monkeypatch.setattr(Config, 'INGEST_BATCH_SIZE', 10)
+    writes_before = get_db_stats()['writes']
+
+    content = order_file('607', many_items(35))
+    status, order, items_count, _ = ingest_upload(io.BytesIO(content), 'big.xlsx', hashlib.sha256(content).hexdigest())
+
+    assert (status, items_count) == (RESULT_ACCEPTED, 35)
+    assert order.status == 'новый'
+    assert [item.row_number for item in order.items] == list(range(1, 36))
+    # Заказ, 4 пачки товаров и завершение - отдельные записи
+    assert get_db_stats()['writes'] - writes_before == 6
+    assert os.path.exists(os.path.join(UPLOAD_FOLDER, order.filename))
+
+
+def test_failed_streaming_upload_leaves_nothing_behind(client, monkeypatch):
+    import order_ingest
+    from config import Config
+    monkeypatch.setattr(Config, 'STREAMING_INGEST_MIN_BYTES', 0)
+    monkeypatch.setattr(Config, 'INGEST_BATCH_SIZE', 10)
+    insert_items = order_ingest._insert_items
+    calls = []
+
+    def failing_insert(order_id, batch):
+        calls.append(order_id)
+        # Пока пишутся пачки, заказа нет в списке
+        assert '608' not in client.get('/').get_data(as_text=True)
+        if len(calls) == 2:
+            raise RuntimeError('диск заполнен')
+        insert_items(order_id, batch)
+
+    monkeypatch.setattr(order_ingest, '_insert_items', failing_insert)
+    files_before = set(os.listdir(UPLOAD_FOLDER))
+    content = order_file('608', many_items(35))
+    client.post('/upload', data={'file': (io.BytesIO(content), 'broken.xlsx')}, content_type='multipart/form-data')
+
+    assert Order.query.count() == 0
+    assert OrderItem.query.count() == 0
+    assert set(os.listdir(UPLOAD_FOLDER)) == files_before
+
+
+def test_stale_loading_orders_are_discarded(app):
+    from datetime import date, datetime
+    from db_writer import run_write
+    from models import db
+    from order_ingest import LOADING_STATUS, STALE_LOAD_AGE, discard_stale_loads
+
+    def add_orders():
+        for number, age in (('609', STALE_LOAD_AGE * 2), ('610', STALE_LOAD_AGE / 2)):
+            db.session.add(Order(order_number=number, order_date=date.today(), filename=f'{number}.xlsx',
+                                 status=LOADING_STATUS, created_at=datetime.utcnow() - age))
+
+    run_write(add_orders)
+    assert discard_stale_loads() == 1
+    assert [order.order_number for order in Order.query] == ['610']
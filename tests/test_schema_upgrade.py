@@ -0,0 +1,88 @@
+"""Обновление схемы БД первого релиза и повторный запуск без изменений"""
+from sqlalchemy import event, inspect
+
+from conftest import drop_schema
+from item_search import create_search_index, search_items
+from models import db, Order, upgrade_schema
+from product_catalog import link_products
+
+# Схема первого релиза
+BASELINE_SCHEMA = (
+    "CREATE TABLE orders (id INTEGER NOT NULL PRIMARY KEY, order_number VARCHAR(100) NOT NULL UNIQUE, "
+    "order_date DATE NOT NULL, status VARCHAR(50) NOT NULL, filename VARCHAR(255) NOT NULL, "
+    "created_at DATETIME NOT NULL)",
+    "CREATE TABLE order_items (id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER NOT NULL REFERENCES orders (id), "
+    "row_number INTEGER NOT NULL, name VARCHAR(500) NOT NULL, quantity INTEGER NOT NULL, unit VARCHAR(50), "
+    "code VARCHAR(100), status VARCHAR(50) NOT NULL)",
+    "CREATE TABLE filter_words (id INTEGER NOT NULL PRIMARY KEY, word VARCHAR(200) NOT NULL UNIQUE, "
+    "created_at DATETIME NOT NULL)",
+)
+BASELINE_ROWS = (
+    "INSERT INTO orders VALUES (1, '901', '2025-12-08', 'новый', '901.xlsx', '2025-12-08 10:00:00')",
+    "INSERT INTO order_items VALUES (1, 1, 1, 'Табак Адалия 50г', 2, 'шт', 'A1', 'completed')",
+    "INSERT INTO order_items VALUES (2, 1, 2, 'Табак Адалия 50г пакет', 1, 'шт', 'A1', 'pending')",
+    "INSERT INTO order_items VALUES (3, 1, 3, 'Уголь кокосовый', 1, 'уп', NULL, 'pending')",
+)
+
+
+def create_baseline_database():
+    db.session.remove()
+    drop_schema(db)
+    db.engine.dispose()
+    with db.engine.begin() as connection:
+        for statement in BASELINE_SCHEMA + BASELINE_ROWS:
+            connection.exec_driver_sql(statement)
+
+
+def start_application():
+    """Шаги init_database, которые меняют схему, и привязка товаров к каталогу (без фоновых потоков)"""
+    db.create_all()
+    changes = upgrade_schema()
+    create_search_index(db.engine)
+    link_products()
+    return changes
+
+
+def test_database_of_first_release_is_upgraded(app):
+    create_baseline_database()
+
+    changes = start_application()
+
+    assert 'Пересоздана таблица order_items' in changes
+    assert 'Добавлена колонка orders.content_hash' in changes
+    assert 'Создан индекс ix_order_items_product_id' in changes
+    name_column = next(column for column in inspect(db.engine).get_columns('order_items') if column['name'] == 'name')
+    assert name_column['nullable']
+
+    order = Order.query.one()
+    assert [(item.name, item.unit, item.status) for item in order.items] == [
+        ('Табак Адалия 50г', 'шт', 'completed'),
+        ('Табак Адалия 50г пакет', 'шт', 'pending'),
+        ('Уголь кокосовый', 'уп', 'pending'),
+    ]
+    # Наименование, совпавшее с каталогом, берется из каталога
+    assert [item.name_override for item in order.items] == [None, 'Табак Адалия 50г пакет', None]
+    found = search_items('адалия', page=1, per_page=10)
+    assert sorted(item.id for item in found.items) == [1, 2]
+
+
+def test_restart_with_current_schema_does_not_write(app):
+    create_baseline_database()
+    start_application()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert upgrade_schema() == []
+        assert create_search_index(db.engine)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    # Только чтение: ни блокировки записи (BEGIN IMMEDIATE), ни DDL и DML
+    writes = [statement for statement in statements
+              if statement == 'BEGIN IMMEDIATE'
+              or statement.split(None, 1)[0].upper() in ('CREATE', 'DROP', 'ALTER', 'INSERT', 'UPDATE', 'DELETE')]
+    assert statements and writes == []
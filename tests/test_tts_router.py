@@ -0,0 +1,67 @@
+"""Порядок провайдеров tts_router по замерам задержки и ошибкам (без сети)"""
+import time
+
+import pytest
+
+from config import Config
+from tts_router import LATENCY_FIRST_CHUNK, LATENCY_SYNTHESIS, TtsRouter
+
+CANDIDATES = ['yandex', 'gtts']
+
+
+def record(router, name, ok, latency, kind=LATENCY_SYNTHESIS):
+    """Учитывает запрос с заданной задержкой (сек)"""
+    router.start(name)
+    router.record(name, ok, time.monotonic() - latency, kind)
+
+
+def fresh(router):
+    pass
+
+
+def primary_measured(router):
+    record(router, 'yandex', True, 0.5)
+
+
+def fallback_measured(router):
+    record(router, 'gtts', True, 0.2)
+
+
+def primary_much_slower(router):
+    record(router, 'yandex', True, 5.0)
+    record(router, 'gtts', True, 0.3)
+
+
+def primary_slightly_slower(router):
+    # Разница меньше штрафа резервного провайдера: голос не меняется
+    record(router, 'yandex', True, 0.5)
+    record(router, 'gtts', True, 0.5 / Config.TTS_ROUTER_FALLBACK_PENALTY * 1.1)
+
+
+def stream_samples_only(router):
+    # Время первого чанка не сравнивается с полным синтезом
+    record(router, 'yandex', True, 0.1, LATENCY_FIRST_CHUNK)
+    record(router, 'gtts', True, 0.05, LATENCY_FIRST_CHUNK)
+    record(router, 'yandex', True, 2.0)
+
+
+def primary_circuit_open(router):
+    for _ in range(Config.TTS_BREAKER_FAILURES):
+        record(router, 'yandex', False, 0.1)
+
+
+@pytest.mark.parametrize('prepare, kind, expected', [
+    pytest.param(fresh, LATENCY_SYNTHESIS, ['yandex', 'gtts'], id='без замеров'),
+    pytest.param(primary_measured, LATENCY_SYNTHESIS, ['yandex', 'gtts'], id='замерен только основной'),
+    pytest.param(fallback_measured, LATENCY_SYNTHESIS, ['yandex', 'gtts'], id='замерен только резервный'),
+    pytest.param(primary_much_slower, LATENCY_SYNTHESIS, ['gtts', 'yandex'], id='основной намного медленнее'),
+    pytest.param(primary_slightly_slower, LATENCY_SYNTHESIS, ['yandex', 'gtts'], id='основной чуть медленнее'),
+    pytest.param(stream_samples_only, LATENCY_SYNTHESIS, ['yandex', 'gtts'], id='синтез: замеры потока не в счет'),
+    pytest.param(stream_samples_only, LATENCY_FIRST_CHUNK, ['gtts', 'yandex'], id='поток: первый чанк'),
+    pytest.param(primary_circuit_open, LATENCY_SYNTHESIS, ['gtts'], id='circuit breaker основного'),
+])
+def test_choose_orders_providers(prepare, kind, expected):
+    router = TtsRouter()
+    prepare(router)
+
+    assert router.choose(CANDIDATES, kind) == expected
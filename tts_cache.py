@@ -0,0 +1,171 @@
+"""
+Контентно-адресуемый кэш TTS аудио
+Один и тот же текст с теми же параметрами синтеза хранится на диске один раз
+и переиспользуется всеми заказами и товарами
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from config import Config
+
+
+# Не чаще этого интервала (сек) обновляем время доступа файла при попадании в кэш
+ACCESS_TOUCH_INTERVAL = 3600
+
+_stats = {
+    'hits': 0,
+    'misses': 0,
+}
+_stats_lock = threading.Lock()
+
+# Файлы кэша, которые сейчас пишутся в этом процессе: путь -> число писателей
+_writing = {}
+_writing_lock = threading.Lock()
+
+# Подкаталог кэша с фразами задач синтеза (квота и сборка мусора аудио его не сканируют)
+JOBS_DIR = 'jobs'
+
+# Расширения файлов по формату аудио
+AUDIO_EXTENSIONS = {
+    'OGG_OPUS': 'ogg',
+    'MP3': 'mp3',
+    'WAV': 'wav',
+}
+
+
+def build_cache_key(text, provider, voice, audio_format):
+    """
+    Вычисляет ключ кэша для фразы
+
+    Args:
+        text: Уже очищенный текст (после clean_text_for_speech)
+        provider: Провайдер синтеза (yandex, gtts)
+        voice: Голос / вариант речи провайдера
+        audio_format: Формат аудио (OGG_OPUS, MP3)
+
+    Returns:
+        str: sha256 в hex
+    """
+    payload = '\x1f'.join([provider, voice or '', audio_format.upper(), text])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cache_path(cache_key, audio_format):
+    """Путь к файлу кэша для ключа"""
+    extension = AUDIO_EXTENSIONS.get(audio_format.upper(), 'bin')
+    return os.path.join(Config.TTS_CACHE_DIR, f'{cache_key}.{extension}')
+
+
+def lookup(cache_key, audio_format):
+    """
+    Ищет аудио в кэше
+
+    Returns:
+        str: Путь к файлу или None, если аудио еще не синтезировано
+    """
+    path = get_cache_path(cache_key, audio_format)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_size == 0:
+        return None
+    touch(path, stat)
+    return path
+
+
+def touch(path, stat=None):
+    """
+    Отмечает обращение к файлу для LRU вытеснения (audio_store).
+    atime обновляется явно: на томах с noatime/relatime чтение его не меняет.
+    """
+    try:
+        stat = stat or os.stat(path)
+        now = time.time()
+        if now - stat.st_atime > ACCESS_TOUCH_INTERVAL:
+            os.utime(path, (now, stat.st_mtime))
+    except OSError:
+        pass
+
+
+def record_hit():
+    """Учет выдачи аудио из кэша"""
+    with _stats_lock:
+        _stats['hits'] += 1
+
+
+def record_miss():
+    """Учет синтеза фразы, которой не было в кэше"""
+    with _stats_lock:
+        _stats['misses'] += 1
+
+
+def get_stats():
+    """Счетчики попаданий в кэш этого процесса"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
+
+
+def temp_path_for(path):
+    """
+    Временный путь для записи аудио рядом с итоговым файлом.
+    Уникален для каждой записи: воркеры и потоки одного воркера,
+    синтезирующие одну фразу, не пишут в один файл.
+    """
+    return f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+
+
+def job_text_path(job_id):
+    """Файл с фразой задачи синтеза (tts_jobs) в подкаталоге кэша"""
+    return os.path.join(Config.TTS_CACHE_DIR, JOBS_DIR, f'{job_id}.json')
+
+
+def begin_write(path, exclusive=False):
+    """
+    Отмечает, что файл кэша синтезируется в этом процессе
+
+    Args:
+        exclusive: Не отмечать, если файл уже кто-то пишет
+
+    Returns:
+        bool: True, если запись отмечена (тогда после нее вызвать end_write)
+    """
+    with _writing_lock:
+        if exclusive and path in _writing:
+            return False
+        _writing[path] = _writing.get(path, 0) + 1
+        return True
+
+
+def end_write(path):
+    """Запись файла кэша завершена (успешно или нет)"""
+    with _writing_lock:
+        if _writing.get(path, 0) > 1:
+            _writing[path] -= 1
+        else:
+            _writing.pop(path, None)
+
+
+def store(cache_key, audio_format, audio_data):
+    """
+    Атомарно сохраняет аудио в кэш
+
+    Returns:
+        str: Путь к сохраненному файлу
+    """
+    path = get_cache_path(cache_key, audio_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(audio_data)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,193 @@
+"""
+Очередь задач синтеза речи
+Обработчики запросов не ждут синтеза: задача ставится в пул потоков процесса,
+клиент сразу получает ID задачи и опрашивает ее статус.
+
+ID задачи - хэш очищенного текста фразы, поэтому одинаковые фразы склеиваются
+в одну задачу. Текст задачи сохраняется на диск (tts_cache.job_text_path):
+любой воркер gunicorn по ID находит фразу и проверяет ее аудио в кэше
+под ключом любого провайдера, в том числе резервного.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+import tts_cache
+from voice_handler import clean_text_for_speech, find_cached_speech, generate_tts
+
+logger = logging.getLogger(__name__)
+
+# Состояния задачи
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_UNKNOWN = 'unknown'
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Задачи этого процесса: job_id -> TtsJob
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class TtsJob:
+    """Задача синтеза одной фразы"""
+
+    def __init__(self, job_id, text):
+        self.job_id = job_id
+        self.text = text
+        self.state = JOB_QUEUED
+        self.audio_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        """Преобразование в словарь для JSON"""
+        return {
+            'job_id': self.job_id,
+            'status': self.state,
+            'audio_url': '/' + self.audio_path if self.audio_path else None,
+            'error': self.error,
+        }
+
+
+def get_executor():
+    """Пул потоков для задач из обработчиков запросов (TTS_JOB_WORKERS потоков)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.TTS_JOB_WORKERS,
+                thread_name_prefix='tts-job'
+            )
+        return _executor
+
+
+def make_job_id(text):
+    """ID задачи: sha256 очищенного текста фразы (не зависит от провайдера)"""
+    payload = '\x1f'.join([Config.TTS_LANGUAGE, str(Config.TTS_SLOW), clean_text_for_speech(text)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _save_job(job_id, text, error=None):
+    """Сохраняет текст и ошибку задачи на диск для других воркеров"""
+    path = tts_cache.job_text_path(job_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = tts_cache.temp_path_for(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'text': text, 'error': error}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить задачу синтеза {job_id}: {e}")
+
+
+def _load_job(job_id):
+    """Задача другого воркера с диска: (данные, возраст файла, сек) или (None, None)"""
+    path = tts_cache.job_text_path(job_id)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data, time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None, None
+
+
+def _run(job):
+    """Выполняет синтез задачи"""
+    job.state = JOB_RUNNING
+    try:
+        job.audio_path = generate_tts(job.text, lang=Config.TTS_LANGUAGE, slow=Config.TTS_SLOW)
+        if job.audio_path is None:
+            job.error = 'Ошибка генерации аудио'
+    except Exception as e:
+        logger.error(f"Ошибка задачи синтеза {job.job_id}: {e}")
+        job.error = str(e)
+    job.state = JOB_DONE if job.audio_path else JOB_FAILED
+    job.finished_at = time.time()
+    if job.state == JOB_FAILED:
+        _save_job(job.job_id, job.text, job.error)
+    return job.audio_path
+
+
+def _prune_finished(now):
+    """Забывает завершенные задачи старше TTS_JOB_TTL (вызывается под _jobs_lock)"""
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at is not None and now - job.finished_at > Config.TTS_JOB_TTL
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def enqueue(text, executor=None):
+    """
+    Ставит синтез фразы в очередь и сразу возвращает задачу
+
+    Если такая же фраза уже ждет или синтезируется, возвращается существующая задача.
+
+    Args:
+        text: Текст фразы
+        executor: Пул потоков (по умолчанию пул задач из запросов)
+
+    Returns:
+        TtsJob: Задача; job.future - Future с путем к аудио
+    """
+    job_id = make_job_id(text)
+    with _jobs_lock:
+        _prune_finished(time.time())
+        job = _jobs.get(job_id)
+        if job is not None and job.state in (JOB_QUEUED, JOB_RUNNING):
+            return job
+        job = TtsJob(job_id, text)
+        _jobs[job_id] = job
+        # Фраза на диске до постановки: статус задачи доступен из любого воркера
+        _save_job(job_id, text)
+        job.future = (executor or get_executor()).submit(_run, job)
+    return job
+
+
+def get_job_status(job_id):
+    """
+    Статус задачи по ID
+
+    Задачи других воркеров неизвестны этому процессу: фраза задачи читается
+    с диска, а готовое аудио ищется в кэше под ключами всех провайдеров.
+    Пока задача не старше TTS_JOB_TTL и не завершилась ошибкой, она считается
+    выполняющейся в другом воркере.
+
+    Returns:
+        dict: job_id, status, audio_url, error
+    """
+    if not JOB_ID_PATTERN.match(job_id):
+        return {'job_id': job_id, 'status': JOB_UNKNOWN, 'audio_url': None, 'error': 'Неверный ID задачи'}
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+
+    data, age = _load_job(job_id)
+    if data is None:
+        return {'job_id': job_id, 'status': JOB_UNKNOWN, 'audio_url': None, 'error': None}
+
+    path = find_cached_speech(data['text'], Config.TTS_LANGUAGE, Config.TTS_SLOW)
+    if path:
+        return {'job_id': job_id, 'status': JOB_DONE, 'audio_url': '/' + path, 'error': None}
+    if data.get('error'):
+        return {'job_id': job_id, 'status': JOB_FAILED, 'audio_url': None, 'error': data['error']}
+    if age > Config.TTS_JOB_TTL:
+        return {'job_id': job_id, 'status': JOB_UNKNOWN, 'audio_url': None, 'error': None}
+    return {'job_id': job_id, 'status': JOB_RUNNING, 'audio_url': None, 'error': None}
@@ -0,0 +1,146 @@
+"""
+Фоновый предварительный синтез озвучки заказа
+После загрузки заказа все фразы синтезируются в ограниченном пуле потоков,
+чтобы к началу сборки аудио уже лежало в кэше
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import Config
+import tts_jobs
+from voice_handler import find_cached_speech
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_batch_executor = None
+_executor_lock = threading.Lock()
+
+# Прогресс фоновых задач этого процесса: order_id -> счетчики
+_order_progress = {}
+_progress_lock = threading.Lock()
+
+
+def get_executor():
+    """Общий пул потоков для синтеза (создается при первом обращении)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.TTS_PREFETCH_WORKERS,
+                thread_name_prefix='tts-prefetch'
+            )
+        return _executor
+
+
+def get_batch_executor():
+    """Пул для досинтеза по запросу манифеста (TTS_BATCH_CONCURRENCY потоков)"""
+    global _batch_executor
+    with _executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=Config.TTS_BATCH_CONCURRENCY,
+                thread_name_prefix='tts-batch'
+            )
+        return _batch_executor
+
+
+def submit_speech(text, executor=None):
+    """
+    Ставит фразу в очередь синтеза (tts_jobs) в фоновом пуле; повторная постановка
+    той же фразы, пока идет синтез, возвращает уже существующую задачу
+
+    Returns:
+        Future: результат generate_tts (путь к файлу или None)
+    """
+    return tts_jobs.enqueue(text, executor or get_executor()).future
+
+
+def _on_synthesized(order_id, future):
+    """Обновляет прогресс заказа после синтеза одной фразы"""
+    try:
+        ok = future.result() is not None
+    except Exception as e:
+        logger.error(f"Ошибка фонового синтеза для заказа {order_id}: {e}")
+        ok = False
+
+    with _progress_lock:
+        progress = _order_progress.get(order_id)
+        if progress is None:
+            return
+        progress['done' if ok else 'failed'] += 1
+        if progress['done'] + progress['failed'] >= progress['scheduled']:
+            progress['finished_at'] = time.time()
+            logger.info(
+                f"Озвучка заказа {order_id} подготовлена: "
+                f"{progress['done']} готово, {progress['failed']} с ошибкой "
+                f"за {progress['finished_at'] - progress['started_at']:.1f} с"
+            )
+
+
+def schedule_order_prefetch(order_id, texts):
+    """
+    Ставит в очередь синтез всех фраз заказа, которых еще нет в кэше
+
+    Args:
+        order_id: ID заказа
+        texts: Фразы заказа (collect_order_speech_texts)
+
+    Returns:
+        int: Количество поставленных в очередь фраз
+    """
+    missing = [text for text in texts if not find_cached_speech(text, Config.TTS_LANGUAGE, Config.TTS_SLOW)]
+    if not missing:
+        return 0
+
+    with _progress_lock:
+        progress = _order_progress.get(order_id)
+        if progress and progress['finished_at'] is None:
+            # Синтез этого заказа уже идет в этом процессе
+            return 0
+        _order_progress[order_id] = {
+            'scheduled': len(missing),
+            'done': 0,
+            'failed': 0,
+            'started_at': time.time(),
+            'finished_at': None,
+        }
+
+    for text in missing:
+        future = submit_speech(text)
+        future.add_done_callback(lambda done_future: _on_synthesized(order_id, done_future))
+
+    logger.info(f"Запущен фоновый синтез для заказа {order_id}: {len(missing)} фраз")
+    return len(missing)
+
+
+def ensure_speech_ready(texts, timeout):
+    """
+    Досинтезирует недостающие фразы параллельно и ждет их не дольше timeout
+
+    Args:
+        texts: Фразы
+        timeout: Максимальное ожидание, сек (0 - не ждать)
+
+    Returns:
+        dict: text -> путь к файлу в кэше или None, если фраза еще не готова
+    """
+    paths = {}
+    futures = {}
+    for text in dict.fromkeys(texts):
+        path = find_cached_speech(text, Config.TTS_LANGUAGE, Config.TTS_SLOW)
+        if path:
+            paths[text] = path
+        else:
+            futures[text] = submit_speech(text, get_batch_executor())
+
+    if futures and timeout > 0:
+        wait(futures.values(), timeout=timeout)
+
+    for text, future in futures.items():
+        paths[text] = None
+        if future.done() and future.exception() is None:
+            paths[text] = future.result()
+    return paths
@@ -0,0 +1,173 @@
+"""
+Выбор провайдера TTS с учетом задержки и circuit breaker
+Для каждого провайдера хранится скользящее окно последних запросов
+(успех и время ответа). После серии ошибок подряд провайдер отключается
+на время остывания, затем пропускается один пробный запрос.
+
+Задержка считается отдельно для полного синтеза (generate_tts) и для первого
+чанка потока (stream_tts): провайдеры сравниваются по задержке того же вида.
+Провайдер без замеров этого вида идет по порядку настроек: основной первым,
+резервные после всех измеренных.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+# Состояния circuit breaker
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# Вес нового замера в скользящей средней задержки
+LATENCY_EWMA_ALPHA = 0.3
+
+# Виды задержки
+LATENCY_SYNTHESIS = 'synthesis'
+LATENCY_FIRST_CHUNK = 'first_chunk'
+
+
+class ProviderHealth:
+    """Статистика и состояние circuit breaker одного провайдера"""
+
+    def __init__(self, name):
+        self.name = name
+        self.window = deque(maxlen=Config.TTS_ROUTER_WINDOW)
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        # Скользящая средняя задержки по видам (LATENCY_SYNTHESIS, LATENCY_FIRST_CHUNK)
+        self.latency = {}
+
+    def success_rate(self):
+        """Доля успешных запросов в окне (None, если запросов не было)"""
+        if not self.window:
+            return None
+        return sum(1 for ok, _ in self.window if ok) / len(self.window)
+
+    def allow_request(self, now):
+        """Можно ли отправить запрос провайдеру (переводит open -> half_open после остывания)"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN and now - self.opened_at >= Config.TTS_BREAKER_COOLDOWN:
+            self.state = CIRCUIT_HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN and not self.probe_in_flight:
+            return True
+        return False
+
+    def record(self, ok, latency, now, kind=LATENCY_SYNTHESIS):
+        """Учитывает результат запроса"""
+        self.window.append((ok, latency))
+        self.probe_in_flight = False
+        if ok:
+            previous = self.latency.get(kind)
+            self.latency[kind] = latency if previous is None else \
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * previous
+            self.consecutive_failures = 0
+            self.state = CIRCUIT_CLOSED
+            self.opened_at = None
+            return
+
+        self.consecutive_failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= Config.TTS_BREAKER_FAILURES:
+            # Пробный запрос не прошел или серия ошибок - отключаем провайдера на время остывания
+            self.state = CIRCUIT_OPEN
+            self.opened_at = now
+
+    def score(self, priority, kind=LATENCY_SYNTHESIS):
+        """
+        Ожидаемая стоимость запроса: задержка с поправкой на долю ошибок (меньше - лучше)
+
+        Без замеров основной провайдер (priority 0) идет первым, резервные - последними
+        """
+        latency = self.latency.get(kind)
+        if latency is None:
+            return 0.0 if priority == 0 else math.inf
+        # Непредпочтительные провайдеры получают штраф, чтобы не менять голос без причины
+        penalty = 1.0 if priority == 0 else Config.TTS_ROUTER_FALLBACK_PENALTY
+        success_rate = self.success_rate() or 0.0
+        return latency * penalty / max(success_rate, 0.1)
+
+    def to_dict(self):
+        """Преобразование в словарь для JSON"""
+        success_rate = self.success_rate()
+        return {
+            'state': self.state,
+            'success_rate': round(success_rate, 3) if success_rate is not None else None,
+            'latency_ms': _milliseconds(self.latency.get(LATENCY_SYNTHESIS)),
+            'first_chunk_ms': _milliseconds(self.latency.get(LATENCY_FIRST_CHUNK)),
+            'requests': len(self.window),
+            'consecutive_failures': self.consecutive_failures,
+        }
+
+
+def _milliseconds(seconds):
+    """Задержка в миллисекундах для JSON (None без замеров)"""
+    return round(seconds * 1000) if seconds is not None else None
+
+
+class TtsRouter:
+    """Маршрутизатор запросов синтеза между провайдерами"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def _health(self, name):
+        health = self._providers.get(name)
+        if health is None:
+            health = self._providers[name] = ProviderHealth(name)
+        return health
+
+    def choose(self, candidates, kind=LATENCY_SYNTHESIS):
+        """
+        Порядок провайдеров для очередного запроса
+
+        Args:
+            candidates: Доступные провайдеры в порядке предпочтения настроек
+            kind: По какой задержке сравнивать (LATENCY_SYNTHESIS, LATENCY_FIRST_CHUNK)
+
+        Returns:
+            list: Исправные провайдеры, самый быстрый первым; провайдеры с открытым
+            circuit breaker пропускаются (кроме одного пробного запроса после остывания)
+        """
+        now = time.time()
+        with self._lock:
+            allowed = []
+            for priority, name in enumerate(candidates):
+                health = self._health(name)
+                if health.allow_request(now):
+                    allowed.append((health.score(priority, kind), priority, name))
+            allowed.sort()
+            return [name for _, _, name in allowed]
+
+    def start(self, name):
+        """Отмечает начало запроса (пробный запрос в half_open пропускается только один)"""
+        with self._lock:
+            health = self._health(name)
+            if health.state == CIRCUIT_HALF_OPEN:
+                health.probe_in_flight = True
+        return time.monotonic()
+
+    def record(self, name, ok, started_at, kind=LATENCY_SYNTHESIS):
+        """Учитывает результат запроса, начатого router.start(); kind - вид задержки"""
+        latency = time.monotonic() - started_at
+        with self._lock:
+            health = self._health(name)
+            previous_state = health.state
+            health.record(ok, latency, time.time(), kind)
+            state = health.state
+        if previous_state != state:
+            print(f"⚡ [TTS ROUTER] {name}: {previous_state} -> {state}")
+
+    def get_stats(self):
+        """Состояние всех провайдеров"""
+        with self._lock:
+            return {name: health.to_dict() for name, health in self._providers.items()}
+
+
+router = TtsRouter()
@@ -1,33 +1,12 @@
 import os
 import requests
 from gtts import gTTS
-from models import FilterWord
 from config import Config
-from yandex_auth import YandexAuth
+import audio_store
+import tts_cache
+from yandex_auth import get_token_manager
 from yandex_speech_service import YandexSpeechService
-
-
-def should_filter_item(item_name, filter_words):
-    """
-    Проверяет, содержит ли название товара фильтруемые слова
-    
-    Args:
-        item_name: Название товара
-        filter_words: Список объектов FilterWord из БД
-    
-    Returns:
-        bool: True если товар нужно отфильтровать (пропустить озвучивание)
-    """
-    if not filter_words:
-        return False
-    
-    item_name_lower = item_name.lower()
-    
-    for filter_word in filter_words:
-        if filter_word.word.lower() in item_name_lower:
-            return True
-    
-    return False
+from tts_router import LATENCY_FIRST_CHUNK, router
 
 
 def clean_text_for_speech(text):
@@ -90,13 +69,12 @@ def generate_tts_yandex(text, output_path='static/audio/speech.ogg', voice='jane
         # Очищаем текст
         clean_text = clean_text_for_speech(text)
         
-        # Инициализируем авторизацию и сервис
-        auth = YandexAuth(oauth_token, folder_id)
+        # Инициализируем сервис; IAM токен берем у общего менеджера процесса
         speech_service = YandexSpeechService(folder_id)
         
-        # Получаем IAM токен
-        print("🔑 [YANDEX TTS] Получение IAM токена из OAuth токена...")
-        iam_token = auth.get_iam_token()
+        # Получаем IAM токен (из памяти/общего файла, в IAM идем только при истечении)
+        print("🔑 [YANDEX TTS] Получение IAM токена...")
+        iam_token = get_token_manager(oauth_token, folder_id).get_token()
         
         if not iam_token:
             print("❌ [YANDEX TTS] Не удалось получить IAM токен")
@@ -111,9 +89,11 @@ def generate_tts_yandex(text, output_path='static/audio/speech.ogg', voice='jane
             print("❌ [YANDEX TTS] Не удалось синтезировать речь")
             return None
         
-        # Сохраняем аудио
-        with open(output_path, 'wb') as f:
+        # Сохраняем аудио (атомарно, чтобы параллельный запрос не прочитал недописанный файл)
+        tmp_path = tts_cache.temp_path_for(output_path)
+        with open(tmp_path, 'wb') as f:
             f.write(audio_data)
+        os.replace(tmp_path, output_path)
         
         file_size = len(audio_data)
         print(f"✅ [YANDEX TTS v3] УСПЕХ! Аудио сохранено: {output_path} ({file_size} байт)")
@@ -128,24 +108,76 @@ def generate_tts_yandex(text, output_path='static/audio/speech.ogg', voice='jane
         return None
 
 
-def generate_tts(text, output_path='static/audio/speech.mp3', lang='ru', slow=False):
+def gtts_voice(lang, slow):
+    """Вариант речи gTTS для ключа кэша (язык и скорость)"""
+    return f"{lang}-slow" if slow else lang
+
+
+def generate_tts_gtts(text, output_path, lang='ru', slow=False):
+    """
+    Генерирует аудио файл из текста с помощью Google TTS (gTTS)
+    
+    Args:
+        text: Очищенный текст для озвучивания
+        output_path: Путь к выходному файлу (MP3 формат)
+        lang: Язык
+        slow: Медленная речь
+    
+    Returns:
+        str: Путь к созданному файлу или None в случае ошибки
+    """
+    print("🔄 [TTS] Использование Google TTS (gTTS)")
+    try:
+        # Создаем директорию если не существует
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        print(f"📝 [TTS] Очищенный текст: {text[:50]}...")
+        
+        # Генерируем аудио через gTTS
+        print("📡 [TTS] Отправка запроса в Google TTS...")
+        tts = gTTS(text=text, lang=lang, slow=slow)
+        tmp_path = tts_cache.temp_path_for(output_path)
+        tts.save(tmp_path)
+        os.replace(tmp_path, output_path)
+        
+        file_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        print(f"✅ [TTS] Аудио сгенерировано через gTTS: {output_path} ({file_size} байт)")
+        return output_path
+    
+    except Exception as e:
+        print(f"❌ [TTS] ОШИБКА генерации через gTTS: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def tts_providers():
+    """Доступные провайдеры TTS в порядке предпочтения настроек"""
+    if Config.YANDEX_TTS_ENABLED:
+        return ['yandex', 'gtts']
+    return ['gtts']
+
+
+def generate_tts(text, lang='ru', slow=False):
     """
     Генерирует аудио файл из текста.
     Использует Yandex SpeechKit если настроен, иначе Google TTS (gTTS).
+    Перед обращением к сети ищет готовое аудио в кэше (tts_cache):
+    одна и та же фраза синтезируется один раз для всех заказов.
+    Порядок провайдеров выбирает tts_router: самый быстрый исправный первым,
+    провайдер с открытым circuit breaker не вызывается вовсе.
     
     Args:
         text: Текст для озвучивания
-        output_path: Путь к выходному файлу
         lang: Язык (по умолчанию 'ru')
         slow: Медленная речь (по умолчанию False, игнорируется для Yandex)
     
     Returns:
-        str: Путь к созданному файлу или None в случае ошибки
+        str: Путь к файлу в кэше или None в случае ошибки
     """
     print("\n" + "=" * 60)
     print("🎤 [TTS] Начало генерации речи")
     print(f"   Текст: {text[:50]}...")
-    print(f"   Путь: {output_path}")
     print("=" * 60)
     
     # Проверяем настройки Yandex
@@ -159,98 +191,250 @@ def generate_tts(text, output_path='static/audio/speech.mp3', lang='ru', slow=Fa
     print(f"🔧 [TTS] YANDEX_TTS_FOLDER_ID: {'✅ Есть' if folder_id else '❌ НЕТ'} ({len(folder_id) if folder_id else 0} символов)")
     print(f"🔧 [TTS] YANDEX_TTS_VOICE: {voice}")
     
-    # Пробуем Yandex SpeechKit если включен
-    if yandex_enabled:
-        print("✅ [TTS] Yandex TTS ВКЛЮЧЕН - пробуем использовать")
-        # Меняем расширение на .ogg для Yandex
-        yandex_path = output_path.replace('.mp3', '.ogg')
-        result = generate_tts_yandex(text, yandex_path, voice)
+    # Очищаем текст: ключ кэша строится по нормализованному тексту
+    clean_text = clean_text_for_speech(text)
+    
+    # Готовое аудио любого включенного провайдера лучше нового синтеза
+    cached_path = find_cached_speech(clean_text, lang, slow)
+    if cached_path:
+        print(f"💾 [TTS] Аудио найдено в кэше: {cached_path}")
+        tts_cache.record_hit()
+        return cached_path
+    tts_cache.record_miss()
+    
+    providers = router.choose(tts_providers())
+    print(f"🔀 [TTS] Порядок провайдеров: {providers or 'нет доступных (circuit breaker открыт)'}")
+    
+    for provider in providers:
+        if provider == 'yandex':
+            cache_key = tts_cache.build_cache_key(clean_text, 'yandex', voice, 'OGG_OPUS')
+            output_path = tts_cache.get_cache_path(cache_key, 'OGG_OPUS')
+        else:
+            cache_key = tts_cache.build_cache_key(clean_text, 'gtts', gtts_voice(lang, slow), 'MP3')
+            output_path = tts_cache.get_cache_path(cache_key, 'MP3')
+        
+        # Потоковый ответ этой же фразы не станет параллельно писать кэш (см. _tee_to_cache)
+        tts_cache.begin_write(output_path)
+        try:
+            started_at = router.start(provider)
+            if provider == 'yandex':
+                result = generate_tts_yandex(clean_text, output_path, voice)
+            else:
+                result = generate_tts_gtts(clean_text, output_path, lang, slow)
+            router.record(provider, result is not None, started_at)
+        finally:
+            tts_cache.end_write(output_path)
+        
         if result:
-            print("✅ [TTS] Использован Yandex TTS")
+            print(f"✅ [TTS] Использован провайдер {provider}")
+            print("=" * 60 + "\n")
+            audio_store.maybe_enforce_quota()
             return result
-        # Если Yandex не сработал, fallback на gTTS
-        print("⚠️  [TTS] Yandex TTS не сработал, используем gTTS (fallback)")
-    else:
-        print("ℹ️  [TTS] Yandex TTS ОТКЛЮЧЕН - используем gTTS")
+        print(f"⚠️  [TTS] Провайдер {provider} не сработал, пробуем следующий")
     
-    # Fallback на Google TTS
-    print("🔄 [TTS] Использование Google TTS (gTTS)")
+    print("❌ [TTS] Ни один провайдер не смог синтезировать речь")
+    print("=" * 60 + "\n")
+    return None
+
+
+# MIME типы аудио по расширению файла кэша
+AUDIO_MIMETYPES = {
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+}
+
+
+def _tee_to_cache(first_chunk, chunks, output_path):
+    """
+    Отдает чанки аудио дальше и параллельно пишет их во временный файл.
+    Файл попадает в кэш только если поток дошел до конца: оборванный
+    клиентом или сетью синтез не оставляет в кэше обрезанное аудио.
+    Если эту фразу уже синтезирует другой поток процесса (задача tts_jobs,
+    фоновый синтез), поток отдается клиенту без записи в кэш.
+    """
+    if not tts_cache.begin_write(output_path, exclusive=True):
+        yield first_chunk
+        yield from chunks
+        return
+    
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = tts_cache.temp_path_for(output_path)
+    completed = False
     try:
-        # Создаем директорию если не существует
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # Очищаем текст
-        clean_text = clean_text_for_speech(text)
-        print(f"📝 [TTS] Очищенный текст: {clean_text[:50]}...")
-        
-        # Генерируем аудио через gTTS
-        print("📡 [TTS] Отправка запроса в Google TTS...")
-        tts = gTTS(text=clean_text, lang=lang, slow=slow)
-        tts.save(output_path)
-        
-        file_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
-        print(f"✅ [TTS] Аудио сгенерировано через gTTS: {output_path} ({file_size} байт)")
-        print("=" * 60 + "\n")
-        return output_path
+        with open(tmp_path, 'wb') as f:
+            f.write(first_chunk)
+            yield first_chunk
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, output_path)
+        completed = True
+        print(f"💾 [TTS STREAM] Аудио сохранено в кэш: {output_path}")
+        audio_store.maybe_enforce_quota()
+    finally:
+        tts_cache.end_write(output_path)
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _first_chunk(chunks):
+    """Первый чанк потока или None, если поток пуст или оборвался сразу"""
+    try:
+        return next(iter(chunks))
+    except StopIteration:
+        return None
+    except Exception as e:
+        print(f"❌ [TTS STREAM] Ошибка получения первого чанка: {e}")
+        return None
+
+
+def stream_tts(text, lang='ru', slow=False):
+    """
+    Потоковый синтез: аудио отдается клиенту по мере синтеза
+    
+    Провайдер выбирается до начала ответа (порядок - tts_router): если провайдер
+    не вернул ни одного чанка, пробуется следующий. Поток одновременно сохраняется в кэш.
+    
+    Returns:
+        tuple: (mimetype, итератор байтов) или None в случае ошибки
+    """
+    clean_text = clean_text_for_speech(text)
+    print(f"🎤 [TTS STREAM] Потоковый синтез: {clean_text[:50]}...")
+    tts_cache.record_miss()
+    
+    for provider in router.choose(tts_providers(), LATENCY_FIRST_CHUNK):
+        started_at = router.start(provider)
+        if provider == 'yandex':
+            stream = _open_yandex_stream(clean_text)
+        else:
+            stream = _open_gtts_stream(clean_text, lang, slow)
+        # Задержка провайдера для потока - время до первого чанка
+        router.record(provider, stream is not None, started_at, LATENCY_FIRST_CHUNK)
+        if stream is not None:
+            return stream
+        print(f"⚠️  [TTS STREAM] Провайдер {provider} не сработал, пробуем следующий")
+    
+    return None
+
+
+def _open_yandex_stream(clean_text):
+    """Потоковый синтез Yandex: (mimetype, итератор) или None"""
+    oauth_token = Config.YANDEX_TTS_OAUTH_TOKEN
+    folder_id = Config.YANDEX_TTS_FOLDER_ID
+    if not oauth_token or not folder_id:
+        print("❌ [TTS STREAM] Yandex TTS не настроен (OAUTH_TOKEN / FOLDER_ID)")
+        return None
+    
+    voice = Config.YANDEX_TTS_VOICE
+    iam_token = get_token_manager(oauth_token, folder_id).get_token()
+    if not iam_token:
+        return None
     
+    speech_service = YandexSpeechService(folder_id)
+    chunks = speech_service.synthesize_stream(clean_text, iam_token, voice=voice, format="OGG_OPUS")
+    first_chunk = _first_chunk(chunks) if chunks is not None else None
+    if not first_chunk:
+        return None
+    
+    cache_key = tts_cache.build_cache_key(clean_text, 'yandex', voice, 'OGG_OPUS')
+    output_path = tts_cache.get_cache_path(cache_key, 'OGG_OPUS')
+    return AUDIO_MIMETYPES['ogg'], _tee_to_cache(first_chunk, chunks, output_path)
+
+
+def _open_gtts_stream(clean_text, lang, slow):
+    """Потоковый синтез gTTS: (mimetype, итератор) или None"""
+    try:
+        chunks = gTTS(text=clean_text, lang=lang, slow=slow).stream()
+        first_chunk = _first_chunk(chunks)
     except Exception as e:
-        print(f"❌ [TTS] ОШИБКА генерации через gTTS: {e}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 60 + "\n")
+        print(f"❌ [TTS STREAM] ОШИБКА потокового синтеза через gTTS: {e}")
         return None
+    if not first_chunk:
+        return None
+    
+    cache_key = tts_cache.build_cache_key(clean_text, 'gtts', gtts_voice(lang, slow), 'MP3')
+    output_path = tts_cache.get_cache_path(cache_key, 'MP3')
+    return AUDIO_MIMETYPES['mp3'], _tee_to_cache(first_chunk, chunks, output_path)
+
 
+def get_audio_mimetype(path):
+    """MIME тип аудио файла по расширению"""
+    extension = path.rsplit('.', 1)[-1].lower()
+    return AUDIO_MIMETYPES.get(extension, 'application/octet-stream')
 
-def generate_order_speech(order_number):
+
+def build_order_speech_text(order_number):
+    """Текст объявления номера заказа"""
+    return f"Заказ номер {order_number}"
+
+
+def build_item_speech_text(item_name, quantity):
+    """Текст объявления товара с количеством"""
+    if quantity == 1:
+        return f"{item_name}"
+    return f"{item_name}, {quantity} штук"
+
+
+def collect_order_speech_texts(order_number, prepared_items):
     """
-    Генерирует речь для объявления номера заказа
+    Собирает все фразы, которые прозвучат при сборке заказа
     
     Args:
         order_number: Номер заказа
+        prepared_items: Результат prepare_items_for_assembly
     
     Returns:
-        str: Путь к аудио файлу
+        list: Уникальные тексты (номер заказа + озвучиваемые товары)
     """
-    text = f"Заказ номер {order_number}"
-    # Используем правильное расширение в зависимости от TTS провайдера
-    if Config.YANDEX_TTS_ENABLED:
-        return generate_tts(text, output_path=f'static/audio/order_{order_number}.ogg')
-    else:
-        return generate_tts(text, output_path=f'static/audio/order_{order_number}.mp3')
+    texts = [build_order_speech_text(order_number)]
+    for item in prepared_items:
+        if item['should_announce']:
+            texts.append(build_item_speech_text(item['name'], item['quantity']))
+    # Убираем повторы, сохраняя порядок озвучивания
+    return list(dict.fromkeys(texts))
 
 
-def generate_item_speech(item_name, quantity, item_id):
+def speech_cache_keys(text, lang='ru', slow=False, all_providers=False):
     """
-    Генерирует речь для объявления товара
+    Ключи кэша фразы в порядке предпочтения провайдеров
     
     Args:
-        item_name: Название товара
-        quantity: Количество
-        item_id: ID товара (для уникального имени файла)
+        all_providers: Вернуть ключи всех провайдеров, а не только включенных
     
     Returns:
-        str: Путь к аудио файлу
+        list: Пары (ключ, формат аудио)
     """
-    # Формируем текст с количеством
-    if quantity == 1:
-        text = f"{item_name}"
-    else:
-        text = f"{item_name}, {quantity} штук"
+    clean_text = clean_text_for_speech(text)
+    keys = []
+    if Config.YANDEX_TTS_ENABLED or all_providers:
+        keys.append((tts_cache.build_cache_key(clean_text, 'yandex', Config.YANDEX_TTS_VOICE, 'OGG_OPUS'), 'OGG_OPUS'))
+    keys.append((tts_cache.build_cache_key(clean_text, 'gtts', gtts_voice(lang, slow), 'MP3'), 'MP3'))
+    return keys
+
+
+def find_cached_speech(text, lang='ru', slow=False):
+    """
+    Ищет уже синтезированное аудио для текста без обращения к сети
     
-    # Используем правильное расширение в зависимости от TTS провайдера
-    if Config.YANDEX_TTS_ENABLED:
-        return generate_tts(text, output_path=f'static/audio/item_{item_id}.ogg')
-    else:
-        return generate_tts(text, output_path=f'static/audio/item_{item_id}.mp3')
+    Returns:
+        str: Путь к файлу в кэше или None
+    """
+    for cache_key, audio_format in speech_cache_keys(text, lang, slow):
+        cached_path = tts_cache.lookup(cache_key, audio_format)
+        if cached_path:
+            return cached_path
+    return None
 
 
-def prepare_items_for_assembly(items, filter_words):
+def prepare_items_for_assembly(items, matcher):
     """
     Подготавливает список товаров для сборки с учетом фильтров
     
     Args:
-        items: Список объектов OrderItem
-        filter_words: Список объектов FilterWord
+        items: Список объектов OrderItem (решение фильтра слов сохранено
+            в товарах каталога, см. item_filters.ensure_order_filters)
+        matcher: FilterMatcher для наименований, записанных в файле иначе, чем в каталоге
     
     Returns:
         list: Список словарей с информацией о товарах для озвучивания
@@ -258,7 +442,7 @@ def prepare_items_for_assembly(items, filter_words):
     prepared_items = []
     
     for item in items:
-        should_announce = not should_filter_item(item.name, filter_words)
+        filter_match = item.filter_match(matcher)
         
         prepared_items.append({
             'id': item.id,
@@ -267,8 +451,10 @@ def prepare_items_for_assembly(items, filter_words):
             'quantity': item.quantity,
             'unit': item.unit,
             'status': item.status,
-            'should_announce': should_announce,
-            'filtered_reason': 'Содержит фильтруемое слово' if not should_announce else None
+            'status_seq': item.status_seq or 0,
+            'should_announce': filter_match is None,
+            'filter_match': filter_match,
+            'filtered_reason': f'Содержит фильтруемое слово «{filter_match}»' if filter_match else None
         })
     
     return prepared_items
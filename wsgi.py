@@ -2,7 +2,9 @@
 WSGI entrypoint для развертывания на продакшене
 Использование с Gunicorn: gunicorn wsgi:app
 """
-from app import app
+from app import app, init_database
+
+init_database()
 
 if __name__ == "__main__":
     app.run()
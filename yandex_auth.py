@@ -2,12 +2,19 @@
 Yandex Cloud авторизация (синхронная версия)
 Адаптировано из infrastructure/auth_handler.py
 """
+import hashlib
 import json
 import os
-import time
-from datetime import datetime, timezone
+import threading
+from datetime import datetime, timedelta, timezone
 
-import requests
+from config import Config
+from http_session import get_session, get_timeout
+
+try:
+    import fcntl
+except ImportError:  # Windows: общий файл без блокировки
+    fcntl = None
 
 
 class YandexAuth:
@@ -27,10 +34,10 @@ class YandexAuth:
             return self.iam_token
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://iam.api.cloud.yandex.net/iam/v1/tokens",
                 json={"yandexPassportOauthToken": self.oauth_token},
-                timeout=10
+                timeout=get_timeout()
             )
             
             if response.status_code != 200:
@@ -43,22 +50,7 @@ class YandexAuth:
             
             data = response.json()
             self.iam_token = data["iamToken"]
-            # Парсим expiresAt (формат: "2024-01-01T12:00:00.000000000Z")
-            expires_at_str = data["expiresAt"]
-            try:
-                # Упрощенный парсинг: убираем наносекунды и Z, добавляем timezone
-                if "." in expires_at_str:
-                    expires_at_str = expires_at_str.split(".")[0]
-                if expires_at_str.endswith("Z"):
-                    expires_at_str = expires_at_str[:-1]
-                if not expires_at_str.endswith("+00:00") and not expires_at_str.endswith("-00:00"):
-                    expires_at_str += "+00:00"
-                self.iam_token_expiration = datetime.fromisoformat(expires_at_str)
-            except Exception as e:
-                # Если не удалось распарсить, устанавливаем время истечения через 12 часов
-                print(f"⚠️  [YANDEX AUTH] Не удалось распарсить expiresAt, устанавливаем 12 часов: {e}")
-                from datetime import timedelta
-                self.iam_token_expiration = datetime.now(tz=timezone.utc) + timedelta(hours=12)
+            self.iam_token_expiration = parse_expires_at(data["expiresAt"])
             
             print(f"✅ [YANDEX AUTH] IAM токен получен (истекает: {self.iam_token_expiration})")
             return self.iam_token
@@ -69,3 +61,185 @@ class YandexAuth:
             traceback.print_exc()
             return None
 
+
+def parse_expires_at(expires_at_str: str) -> datetime:
+    """Парсит expiresAt (формат: "2024-01-01T12:00:00.000000000Z")"""
+    try:
+        # Упрощенный парсинг: убираем наносекунды и Z, добавляем timezone
+        if "." in expires_at_str:
+            expires_at_str = expires_at_str.split(".")[0]
+        if expires_at_str.endswith("Z"):
+            expires_at_str = expires_at_str[:-1]
+        if not expires_at_str.endswith("+00:00") and not expires_at_str.endswith("-00:00"):
+            expires_at_str += "+00:00"
+        return datetime.fromisoformat(expires_at_str)
+    except Exception as e:
+        # Если не удалось распарсить, устанавливаем время истечения через 12 часов
+        print(f"⚠️  [YANDEX AUTH] Не удалось распарсить expiresAt, устанавливаем 12 часов: {e}")
+        return datetime.now(tz=timezone.utc) + timedelta(hours=12)
+
+
+class IamTokenManager:
+    """
+    Менеджер IAM токена на процесс
+    
+    - держит токен в памяти и обновляет его в фоне заранее, до истечения;
+    - делит токен между воркерами gunicorn через файл на диске под файловой
+      блокировкой: обновляет токен только один воркер, остальные читают файл.
+    """
+
+    # Запас до истечения, с которым токен еще отдается без обновления
+    EXPIRY_SKEW = timedelta(seconds=60)
+
+    def __init__(self, oauth_token: str, folder_id: str, cache_path: str, refresh_margin: int = 3600):
+        self.auth = YandexAuth(oauth_token, folder_id)
+        self.cache_path = cache_path
+        self.lock_path = f"{cache_path}.lock"
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        # Токен в файле привязан к OAuth токену: при смене OAuth токена кэш не используется
+        self.oauth_fingerprint = hashlib.sha256(oauth_token.encode("utf-8")).hexdigest()[:16]
+        self._lock = threading.Lock()
+        # Текущий токен (token, expiration): публикуется одним присваиванием, читается без блокировки
+        self._current = (None, None)
+        self._refresh_thread = None
+        self._refresh_pid = None
+        self._stop = threading.Event()
+
+    def get_token(self) -> str | None:
+        """
+        IAM токен без ожидания, пока текущий не истек
+        
+        Заблаговременное обновление (за refresh_margin) делает фоновый поток;
+        запрос ждет обновления, только если токена нет или он уже истек.
+        """
+        self._ensure_refresh_thread()
+        token, expiration = self._current
+        if self._is_valid(expiration):
+            return token
+        with self._lock:
+            token, expiration = self._current
+            if self._is_valid(expiration):
+                return token
+            return self._refresh()
+
+    def _is_valid(self, expiration: datetime | None) -> bool:
+        """Токен еще действует (с запасом EXPIRY_SKEW на запрос к SpeechKit)"""
+        return expiration is not None and expiration - self.EXPIRY_SKEW > datetime.now(tz=timezone.utc)
+
+    def _is_fresh(self, expiration: datetime | None) -> bool:
+        """Токен считается свежим, пока до истечения больше refresh_margin"""
+        return expiration is not None and expiration - self.refresh_margin > datetime.now(tz=timezone.utc)
+
+    def _refresh(self) -> str | None:
+        """
+        Обновляет токен под файловой блокировкой
+        
+        Сначала перечитывает файл: пока мы ждали блокировку, токен мог обновить другой воркер.
+        """
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cached = self._read_cache()
+                if cached and self._is_fresh(cached[1]):
+                    self.auth.iam_token, self.auth.iam_token_expiration = cached
+                    self._current = cached
+                    return self.auth.iam_token
+
+                # Сбрасываем кэш в памяти, чтобы YandexAuth сходил в IAM
+                previous = (self.auth.iam_token, self.auth.iam_token_expiration)
+                self.auth.iam_token = None
+                self.auth.iam_token_expiration = None
+                token = self.auth.get_iam_token()
+                if token:
+                    self._write_cache(token, self.auth.iam_token_expiration)
+                    self._current = (token, self.auth.iam_token_expiration)
+                    return token
+
+                # IAM недоступен: пока старый токен не истек, продолжаем им пользоваться
+                for candidate in (previous, cached):
+                    if candidate and candidate[0] and candidate[1] and candidate[1] > datetime.now(tz=timezone.utc):
+                        self.auth.iam_token, self.auth.iam_token_expiration = candidate
+                        self._current = candidate
+                        return candidate[0]
+                return None
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_cache(self):
+        """Читает токен из общего файла: (token, expiration) или None"""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("oauth_fingerprint") != self.oauth_fingerprint:
+                return None
+            return data["iam_token"], datetime.fromisoformat(data["expires_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, token: str, expiration: datetime):
+        """Атомарно записывает токен в общий файл (доступ только владельцу)"""
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "iam_token": token,
+                "expires_at": expiration.isoformat(),
+                "oauth_fingerprint": self.oauth_fingerprint,
+            }, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _ensure_refresh_thread(self):
+        """Запускает фоновое обновление (заново после fork воркера gunicorn)"""
+        if self._refresh_thread is not None and self._refresh_pid == os.getpid() and self._refresh_thread.is_alive():
+            return
+        self._refresh_pid = os.getpid()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="yandex-iam-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        """Обновляет токен за refresh_margin до истечения"""
+        while not self._stop.is_set():
+            expiration = self._current[1]
+            if expiration is None:
+                delay = 60
+            else:
+                refresh_at = expiration - self.refresh_margin
+                delay = max((refresh_at - datetime.now(tz=timezone.utc)).total_seconds(), 0)
+            if self._stop.wait(delay):
+                return
+            try:
+                with self._lock:
+                    if not self._is_fresh(self._current[1]):
+                        self._refresh()
+            except Exception as e:
+                print(f"⚠️  [YANDEX AUTH] Ошибка фонового обновления IAM токена: {e}")
+            if not self._is_fresh(self._current[1]):
+                # IAM недоступен - повторим попытку через минуту
+                self._stop.wait(60)
+
+
+_token_manager: IamTokenManager | None = None
+_token_manager_lock = threading.Lock()
+
+
+def get_token_manager(oauth_token: str, folder_id: str) -> IamTokenManager:
+    """Единый менеджер IAM токена процесса"""
+    global _token_manager
+    with _token_manager_lock:
+        manager = _token_manager
+        if manager is None or manager.auth.oauth_token != oauth_token or manager.auth.folder_id != folder_id:
+            if manager is not None:
+                manager._stop.set()
+            manager = IamTokenManager(
+                oauth_token,
+                folder_id,
+                Config.YANDEX_IAM_TOKEN_CACHE,
+                refresh_margin=Config.YANDEX_IAM_REFRESH_MARGIN,
+            )
+            _token_manager = manager
+        return manager
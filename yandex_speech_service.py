@@ -6,7 +6,7 @@ Yandex SpeechKit TTS сервис (синхронная версия)
 import base64
 import json
 
-import requests
+from http_session import get_session, get_timeout
 
 
 class YandexSpeechService:
@@ -26,6 +26,37 @@ class YandexSpeechService:
         Returns:
             bytes: Аудио данные или None в случае ошибки
         """
+        chunks = self.synthesize_stream(text, iam_token, voice=voice, format=format)
+        if chunks is None:
+            return None
+        
+        try:
+            all_audio = bytearray()
+            for chunk in chunks:
+                all_audio.extend(chunk)
+        except Exception as e:
+            print(f"❌ [YANDEX TTS v3] Ошибка синтеза речи: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+        
+        if not all_audio:
+            print("❌ [YANDEX TTS v3] Нет аудио данных в ответе")
+            return None
+        
+        print(f"✅ [YANDEX TTS v3] Аудио синтезировано: {len(all_audio)} байт")
+        return bytes(all_audio)
+
+    def synthesize_stream(self, text: str, iam_token: str, voice: str = "jane", format: str = "OGG_OPUS"):
+        """
+        Потоковый синтез речи через API v3
+        
+        Запрос отправляется сразу, а аудио отдается по мере прихода чанков
+        audioChunk, без ожидания конца синтеза.
+        
+        Returns:
+            Итератор байтовых чанков или None, если запрос не удался
+        """
         print(f"🎤 [YANDEX TTS v3] Синтез речи: {text[:50]}...")
         
         try:
@@ -55,19 +86,29 @@ class YandexSpeechService:
             print(f"   Headers: Authorization=Bearer {iam_token[:20]}..., x-folder-id={self.folder_id}")
             print(f"   Payload: text={text[:30]}..., voice={voice}, format={format}")
             
-            response = requests.post(url, headers=headers, json=payload, timeout=30, stream=True)
+            response = get_session().post(url, headers=headers, json=payload, timeout=get_timeout(), stream=True)
             
             print(f"📥 [YANDEX TTS v3] Ответ: статус {response.status_code}")
             
             if response.status_code != 200:
                 error_text = response.text
                 print(f"❌ [YANDEX TTS v3] Ошибка синтеза: {error_text}")
+                response.close()
                 return None
             
+            return self._iter_audio_chunks(response)
+            
+        except Exception as e:
+            print(f"❌ [YANDEX TTS v3] Ошибка синтеза речи: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def _iter_audio_chunks(self, response):
+        """Декодирует чанки аудио из потока NDJSON по одному"""
+        try:
             # API v3 возвращает поток JSON строк (NDJSON формат)
             # Каждая строка содержит чанк аудио в base64
-            all_audio = bytearray()
-            
             for line in response.iter_lines():
                 if not line:
                     continue
@@ -81,26 +122,13 @@ class YandexSpeechService:
                     audio_data = result.get("result", {}).get("audioChunk", {}).get("data")
                     
                     if audio_data:
-                        chunk = base64.b64decode(audio_data)
-                        all_audio.extend(chunk)
+                        yield base64.b64decode(audio_data)
                         
                 except json.JSONDecodeError as e:
                     print(f"⚠️  [YANDEX TTS v3] Ошибка парсинга JSON строки: {e}")
                     continue
-                except Exception as e:
+                except (ValueError, UnicodeDecodeError) as e:
                     print(f"⚠️  [YANDEX TTS v3] Ошибка обработки чанка: {e}")
                     continue
-            
-            if not all_audio:
-                print("❌ [YANDEX TTS v3] Нет аудио данных в ответе")
-                return None
-            
-            print(f"✅ [YANDEX TTS v3] Аудио синтезировано: {len(all_audio)} байт")
-            return bytes(all_audio)
-            
-        except Exception as e:
-            print(f"❌ [YANDEX TTS v3] Ошибка синтеза речи: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-
+        finally:
+            response.close()